@@ -0,0 +1,39 @@
+"""add_laptop_change_version
+
+Revision ID: e5f6g7h8i9j0
+Revises: d4e5f6g7h8i9
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6g7h8i9j0'
+down_revision: Union[str, None] = 'd4e5f6g7h8i9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('laptops', sa.Column('change_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_laptops_change_version'), 'laptops', ['change_version'], unique=False)
+    op.create_index(op.f('ix_laptops_last_api_contact'), 'laptops', ['last_api_contact'], unique=False)
+    fleet_state = op.create_table('fleet_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('change_version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(fleet_state, [{'id': 1, 'change_version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('fleet_state')
+    op.drop_index(op.f('ix_laptops_last_api_contact'), table_name='laptops')
+    op.drop_index(op.f('ix_laptops_change_version'), table_name='laptops')
+    op.drop_column('laptops', 'change_version')
@@ -0,0 +1,175 @@
+"""add_scan_classification_columns
+
+Revision ID: f6g7h8i9j0k1
+Revises: e5f6g7h8i9j0
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+import re
+from typing import Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6g7h8i9j0k1'
+down_revision: Union[str, None] = 'e5f6g7h8i9j0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+scan_status_enum = sa.Enum('ok', 'error', 'threat', name='scanstatus', native_enum=False, length=16)
+
+# Einordnung wie in app/scan_classification.py zum Zeitpunkt dieser Migration. Bewusst kopiert:
+# spätere Änderungen der Regeln dürfen das Ergebnis dieser Migration nicht verändern.
+ERROR_MARKERS = ("Event 1002", "FEHLER:", "stopped", "Fehler")
+CANCELLED_SCAN_MARKER = "Event 1002"
+_NEWLINE_TOKEN = re.compile(r'%[nиñńηйNИÑŃΗЙ]')
+_TAB_TOKEN = re.compile(r'%[tтŧťτTТŦŤΤ]')
+_BACKSPACE_TOKEN = re.compile(r'%[bьвβBЬВΒ]')
+
+
+def _clean_scan_message(message: Optional[str]) -> Optional[str]:
+    if not message:
+        return message
+    message = _NEWLINE_TOKEN.sub('\n', message)
+    message = _TAB_TOKEN.sub('    ', message)
+    return _BACKSPACE_TOKEN.sub('', message)
+
+
+def _classify_scan_result(message: Optional[str], threats_found: Optional[bool]) -> Tuple[Optional[str], bool, bool, str]:
+    """(bereinigte Meldung, is_error, is_real_threat, scan_status)"""
+    is_real_threat = bool(threats_found)
+    is_error = False
+    if message and any(marker in message for marker in ERROR_MARKERS):
+        if CANCELLED_SCAN_MARKER in message:
+            is_real_threat = False
+        is_error = True
+
+    if is_real_threat:
+        status = 'threat'
+    elif is_error:
+        status = 'error'
+    else:
+        status = 'ok'
+    return _clean_scan_message(message), is_error, is_real_threat, status
+
+
+def _backfill_scan_reports(connection) -> None:
+    """Ordnet alle vorhandenen Berichte blockweise ein (gleiche Logik wie beim Eingang neuer Berichte)."""
+    scan_reports = sa.table('scan_reports',
+        sa.column('id', sa.Integer()),
+        sa.column('scan_result_message', sa.Text()),
+        sa.column('threats_found', sa.Boolean()),
+        sa.column('clean_result_message', sa.Text()),
+        sa.column('is_error', sa.Boolean()),
+        sa.column('is_real_threat', sa.Boolean()),
+        sa.column('scan_status', sa.String()),
+    )
+    update_stmt = sa.update(scan_reports).where(scan_reports.c.id == sa.bindparam('b_id')).values(
+        clean_result_message=sa.bindparam('b_clean'),
+        is_error=sa.bindparam('b_is_error'),
+        is_real_threat=sa.bindparam('b_is_real_threat'),
+        scan_status=sa.bindparam('b_status'),
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(scan_reports.c.id, scan_reports.c.scan_result_message, scan_reports.c.threats_found)
+            .where(scan_reports.c.id > last_id)
+            .order_by(scan_reports.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for report_id, message, threats_found in rows:
+            clean_message, is_error, is_real_threat, scan_status = _classify_scan_result(message, threats_found)
+            params.append({
+                'b_id': report_id,
+                'b_clean': clean_message,
+                'b_is_error': is_error,
+                'b_is_real_threat': is_real_threat,
+                'b_status': scan_status,
+            })
+        connection.execute(update_stmt, params)
+        last_id = rows[-1][0]
+
+
+def _backfill_laptops(connection) -> None:
+    """Überträgt die Einordnung auf die last_scan_*-Spalten der Laptops (nur Laptops mit Scan)."""
+    laptops = sa.table('laptops',
+        sa.column('id', sa.Integer()),
+        sa.column('last_scan_time', sa.DateTime()),
+        sa.column('last_scan_result_message', sa.Text()),
+        sa.column('last_scan_threats_found', sa.Boolean()),
+        sa.column('last_scan_clean_message', sa.Text()),
+        sa.column('last_scan_is_error', sa.Boolean()),
+        sa.column('last_scan_is_real_threat', sa.Boolean()),
+        sa.column('last_scan_status', sa.String()),
+    )
+    rows = connection.execute(
+        sa.select(laptops.c.id, laptops.c.last_scan_result_message, laptops.c.last_scan_threats_found)
+        .where(laptops.c.last_scan_time.is_not(None))
+    ).all()
+    if not rows:
+        return
+    params = []
+    for laptop_id, message, threats_found in rows:
+        clean_message, is_error, is_real_threat, scan_status = _classify_scan_result(message, threats_found)
+        params.append({
+            'b_id': laptop_id,
+            'b_clean': clean_message,
+            'b_is_error': is_error,
+            'b_is_real_threat': is_real_threat,
+            'b_status': scan_status,
+        })
+    connection.execute(
+        sa.update(laptops).where(laptops.c.id == sa.bindparam('b_id')).values(
+            last_scan_clean_message=sa.bindparam('b_clean'),
+            last_scan_is_error=sa.bindparam('b_is_error'),
+            last_scan_is_real_threat=sa.bindparam('b_is_real_threat'),
+            last_scan_status=sa.bindparam('b_status'),
+        ),
+        params
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scan_reports', sa.Column('clean_result_message', sa.Text(), nullable=True))
+    op.add_column('scan_reports', sa.Column('is_error', sa.Boolean(), server_default='0', nullable=False))
+    op.add_column('scan_reports', sa.Column('is_real_threat', sa.Boolean(), server_default='0', nullable=False))
+    op.add_column('scan_reports', sa.Column('scan_status', scan_status_enum, nullable=True))
+    op.create_index(op.f('ix_scan_reports_is_error'), 'scan_reports', ['is_error'], unique=False)
+    op.create_index(op.f('ix_scan_reports_is_real_threat'), 'scan_reports', ['is_real_threat'], unique=False)
+    op.create_index(op.f('ix_scan_reports_scan_status'), 'scan_reports', ['scan_status'], unique=False)
+
+    op.add_column('laptops', sa.Column('last_scan_clean_message', sa.Text(), nullable=True))
+    op.add_column('laptops', sa.Column('last_scan_is_error', sa.Boolean(), nullable=True))
+    op.add_column('laptops', sa.Column('last_scan_is_real_threat', sa.Boolean(), nullable=True))
+    op.add_column('laptops', sa.Column('last_scan_status', scan_status_enum, nullable=True))
+    op.create_index(op.f('ix_laptops_last_scan_status'), 'laptops', ['last_scan_status'], unique=False)
+
+    connection = op.get_bind()
+    _backfill_scan_reports(connection)
+    _backfill_laptops(connection)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_laptops_last_scan_status'), table_name='laptops')
+    op.drop_column('laptops', 'last_scan_status')
+    op.drop_column('laptops', 'last_scan_is_real_threat')
+    op.drop_column('laptops', 'last_scan_is_error')
+    op.drop_column('laptops', 'last_scan_clean_message')
+
+    op.drop_index(op.f('ix_scan_reports_scan_status'), table_name='scan_reports')
+    op.drop_index(op.f('ix_scan_reports_is_real_threat'), table_name='scan_reports')
+    op.drop_index(op.f('ix_scan_reports_is_error'), table_name='scan_reports')
+    op.drop_column('scan_reports', 'scan_status')
+    op.drop_column('scan_reports', 'is_real_threat')
+    op.drop_column('scan_reports', 'is_error')
+    op.drop_column('scan_reports', 'clean_result_message')
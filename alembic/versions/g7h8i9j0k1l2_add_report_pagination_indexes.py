@@ -0,0 +1,34 @@
+"""add_report_pagination_indexes
+
+Revision ID: g7h8i9j0k1l2
+Revises: f6g7h8i9j0k1
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'g7h8i9j0k1l2'
+down_revision: Union[str, None] = 'f6g7h8i9j0k1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # server_default (CURRENT_TIMESTAMP) speichert ohne Mikrosekunden, SQLAlchemy mit.
+        # Für korrekte Cursor-Vergleiche (Textvergleich in SQLite) alle Werte auf ein Format bringen.
+        op.execute("UPDATE scan_reports SET report_time_on_server = report_time_on_server || '.000000' WHERE length(report_time_on_server) = 19")
+    op.create_index('ix_scan_reports_report_time_on_server_id', 'scan_reports', ['report_time_on_server', 'id'], unique=False)
+    op.create_index('ix_scan_reports_scan_status_report_time_on_server_id', 'scan_reports', ['scan_status', 'report_time_on_server', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scan_reports_scan_status_report_time_on_server_id', table_name='scan_reports')
+    op.drop_index('ix_scan_reports_report_time_on_server_id', table_name='scan_reports')
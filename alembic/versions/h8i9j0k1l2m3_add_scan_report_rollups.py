@@ -0,0 +1,56 @@
+"""add_scan_report_rollups
+
+Revision ID: h8i9j0k1l2m3
+Revises: g7h8i9j0k1l2
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h8i9j0k1l2m3'
+down_revision: Union[str, None] = 'g7h8i9j0k1l2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+scan_status_enum = sa.Enum('ok', 'error', 'threat', name='scanstatus', native_enum=False, length=16)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scan_report_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('laptop_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('error_count', sa.Integer(), nullable=False),
+    sa.Column('threat_count', sa.Integer(), nullable=False),
+    sa.Column('max_duration_minutes', sa.Integer(), nullable=True),
+    sa.Column('client_scan_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('scan_type', sa.String(), nullable=False),
+    sa.Column('scan_result_message', sa.Text(), nullable=False),
+    sa.Column('threats_found', sa.Boolean(), nullable=False),
+    sa.Column('threat_details', sa.Text(), nullable=True),
+    sa.Column('clean_result_message', sa.Text(), nullable=True),
+    sa.Column('is_error', sa.Boolean(), nullable=False),
+    sa.Column('is_real_threat', sa.Boolean(), nullable=False),
+    sa.Column('scan_status', scan_status_enum, nullable=True),
+    sa.ForeignKeyConstraint(['laptop_id'], ['laptops.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('laptop_id', 'day', name='uq_scan_report_rollups_laptop_id_day')
+    )
+    op.create_index(op.f('ix_scan_report_rollups_id'), 'scan_report_rollups', ['id'], unique=False)
+    op.create_index(op.f('ix_scan_report_rollups_day'), 'scan_report_rollups', ['day'], unique=False)
+    op.create_index('ix_scan_reports_client_scan_time_id', 'scan_reports', ['client_scan_time', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scan_reports_client_scan_time_id', table_name='scan_reports')
+    op.drop_index(op.f('ix_scan_report_rollups_day'), table_name='scan_report_rollups')
+    op.drop_index(op.f('ix_scan_report_rollups_id'), table_name='scan_report_rollups')
+    op.drop_table('scan_report_rollups')
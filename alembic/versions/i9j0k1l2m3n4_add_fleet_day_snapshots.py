@@ -0,0 +1,57 @@
+"""add_fleet_day_snapshots
+
+Revision ID: i9j0k1l2m3n4
+Revises: h8i9j0k1l2m3
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i9j0k1l2m3n4'
+down_revision: Union[str, None] = 'h8i9j0k1l2m3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+scan_status_enum = sa.Enum('ok', 'error', 'threat', name='scanstatus', native_enum=False, length=16)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Die Snapshots selbst baut der Hintergrund-Task beim nächsten Start (app/snapshots.py)
+    op.create_table('fleet_day_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('laptop_id', sa.Integer(), nullable=False),
+    sa.Column('client_scan_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('scan_type', sa.String(), nullable=False),
+    sa.Column('scan_result_message', sa.Text(), nullable=False),
+    sa.Column('threats_found', sa.Boolean(), nullable=False),
+    sa.Column('threat_details', sa.Text(), nullable=True),
+    sa.Column('clean_result_message', sa.Text(), nullable=True),
+    sa.Column('is_error', sa.Boolean(), nullable=False),
+    sa.Column('is_real_threat', sa.Boolean(), nullable=False),
+    sa.Column('scan_status', scan_status_enum, nullable=True),
+    sa.ForeignKeyConstraint(['laptop_id'], ['laptops.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'laptop_id', name='uq_fleet_day_snapshots_day_laptop_id')
+    )
+    op.create_index(op.f('ix_fleet_day_snapshots_id'), 'fleet_day_snapshots', ['id'], unique=False)
+    op.create_index('ix_fleet_day_snapshots_laptop_id_day', 'fleet_day_snapshots', ['laptop_id', 'day'], unique=False)
+    op.create_table('fleet_snapshot_days',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('built_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('fleet_snapshot_days')
+    op.drop_index('ix_fleet_day_snapshots_laptop_id_day', table_name='fleet_day_snapshots')
+    op.drop_index(op.f('ix_fleet_day_snapshots_id'), table_name='fleet_day_snapshots')
+    op.drop_table('fleet_day_snapshots')
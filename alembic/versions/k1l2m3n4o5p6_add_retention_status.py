@@ -0,0 +1,43 @@
+"""add_retention_status
+
+Revision ID: k1l2m3n4o5p6
+Revises: j0k1l2m3n4o5
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k1l2m3n4o5p6'
+down_revision: Union[str, None] = 'j0k1l2m3n4o5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('retention_status',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('running', sa.Boolean(), nullable=False),
+    sa.Column('runs', sa.Integer(), nullable=False),
+    sa.Column('last_run_started', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_run_finished', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_run_duration_seconds', sa.Float(), nullable=True),
+    sa.Column('last_cutoff', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('pending_reports', sa.Integer(), nullable=False),
+    sa.Column('run_reports_processed', sa.Integer(), nullable=False),
+    sa.Column('reports_rolled_up_total', sa.Integer(), nullable=False),
+    sa.Column('rollups_written_total', sa.Integer(), nullable=False),
+    sa.Column('batches_total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('retention_status')
@@ -1,15 +1,22 @@
 # app/api/endpoints/commands.py
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import cast
 import urllib.request
 import json
+import asyncio
+import logging
 
 from app import crud, schemas, models 
-from app.database import get_db
+from app.database import get_write_db, SessionLocal
 from app.security import get_api_key
 from app.auth import get_current_user_or_none 
+from app.heartbeat import heartbeat_buffer
+from app.notifications import command_notifier, dashboard_events
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/clientcommands",
@@ -20,20 +27,10 @@ router = APIRouter(
 # bevor sie in den Funktionssignaturen verwendet wird.
 class TriggerScanPayload(BaseModel):
     scan_type: str = "FullScan"
+    target: schemas.CommandTargetFilter | None = None # Nur für "all": schränkt die Ziel-Laptops ein
 
 
-# ====================================================================
-# DIESE ROUTE IST FÜR DAS CLIENT-SKRIPT -> API-KEY ERFORDERLICH
-# ====================================================================
-@router.get("/{laptop_identifier:path}", response_model=schemas.ClientCommandResponse, dependencies=[Depends(get_api_key)])
-def get_client_command(laptop_identifier: str, version: str | None = None, db: Session = Depends(get_db)):
-    db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
-    if not db_laptop: 
-        print(f"WARNUNG: Client mit Kennung '{laptop_identifier}' nicht gefunden (404).")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht registriert oder Kennung unbekannt.")
-
-    crud.update_laptop_contact(db=db, laptop_identifier=laptop_identifier, client_version=version)
-
+def _build_command_response(db_laptop: models.Laptop) -> schemas.ClientCommandResponse:
     command_to_send = schemas.ClientCommandResponse()
     
     pending_command_val: str | None = db_laptop.pending_command # type: ignore[assignment]
@@ -49,6 +46,88 @@ def get_client_command(laptop_identifier: str, version: str | None = None, db: S
     return command_to_send
 
 
+def _load_command_response(laptop_identifier: str) -> schemas.ClientCommandResponse | None:
+    """Liest den aktuellen Befehl mit einer kurzlebigen Session (Long-Poll hält keine DB-Verbindung offen)."""
+    db = SessionLocal()
+    try:
+        db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
+        if not db_laptop:
+            return None
+        return _build_command_response(db_laptop)
+    finally:
+        db.close()
+
+
+def _resolve_laptop_id(laptop_identifier: str) -> int | None:
+    db = SessionLocal()
+    try:
+        return crud.resolve_laptop_id(db, laptop_identifier)
+    finally:
+        db.close()
+
+
+# ====================================================================
+# DIESE ROUTE IST FÜR DAS CLIENT-SKRIPT -> API-KEY ERFORDERLICH
+# Long-Poll: hält die Anfrage bis zu `timeout` Sekunden offen, bis ein Befehl vorliegt.
+# Muss vor der allgemeinen /{laptop_identifier:path}-Route registriert sein.
+# ====================================================================
+@router.get("/wait/{laptop_identifier:path}", response_model=schemas.ClientCommandResponse, dependencies=[Depends(get_api_key)])
+async def wait_for_client_command(laptop_identifier: str, version: str | None = None, timeout: float = Query(55.0, ge=0)):
+    timeout = min(timeout, settings.long_poll_max_timeout_seconds)
+
+    laptop_id = await run_in_threadpool(_resolve_laptop_id, laptop_identifier)
+    if laptop_id is None:
+        logger.warning("Client mit Kennung '%s' nicht gefunden (404).", laptop_identifier, extra={"identifier": laptop_identifier})
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht registriert oder Kennung unbekannt.")
+    heartbeat_buffer.record(laptop_id, client_version=version)
+
+    # Erst registrieren, dann prüfen: so geht kein Befehl zwischen Prüfung und Warten verloren
+    wake_event = command_notifier.subscribe(laptop_id)
+    try:
+        command_to_send = await run_in_threadpool(_load_command_response, laptop_identifier)
+        if command_to_send is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht registriert oder Kennung unbekannt.")
+        if command_to_send.command is not None or timeout <= 0:
+            return command_to_send
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(wake_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            wake_event.clear()
+            command_to_send = await run_in_threadpool(_load_command_response, laptop_identifier)
+            if command_to_send is None or command_to_send.command is not None:
+                break
+    finally:
+        command_notifier.unsubscribe(laptop_id, wake_event)
+
+    heartbeat_buffer.record(laptop_id, client_version=version)
+    return command_to_send or schemas.ClientCommandResponse()
+
+
+# ====================================================================
+# DIESE ROUTE IST FÜR DAS CLIENT-SKRIPT -> API-KEY ERFORDERLICH
+# ====================================================================
+@router.get("/{laptop_identifier:path}", response_model=schemas.ClientCommandResponse, dependencies=[Depends(get_api_key)])
+def get_client_command(laptop_identifier: str, version: str | None = None, db: Session = Depends(get_write_db)):
+    # Schreib-Session: ein gerade ausgelöster Befehl muss beim nächsten Poll sichtbar sein (kein Replikat-Verzug)
+    db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
+    if not db_laptop: 
+        logger.warning("Client mit Kennung '%s' nicht gefunden (404).", laptop_identifier, extra={"identifier": laptop_identifier})
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht registriert oder Kennung unbekannt.")
+
+    # Kontakt nur im Speicher vermerken, wird gebündelt in die DB geschrieben (kein Commit pro Poll)
+    heartbeat_buffer.record(db_laptop.id, client_version=version)
+
+    return _build_command_response(db_laptop)
+
+
 # ====================================================================
 # DIESE ROUTE IST FÜR DAS CLIENT-SKRIPT -> API-KEY ERFORDERLICH
 # ====================================================================
@@ -56,14 +135,15 @@ class ClearCommandPayload(BaseModel):
     client_version: str | None = None
 
 @router.post("/{laptop_identifier:path}/clear", response_model=schemas.Laptop, dependencies=[Depends(get_api_key)])
-def clear_client_command(laptop_identifier: str, payload: ClearCommandPayload = Body(default_factory=ClearCommandPayload), db: Session = Depends(get_db)):
+def clear_client_command(laptop_identifier: str, payload: ClearCommandPayload = Body(default_factory=ClearCommandPayload), db: Session = Depends(get_write_db)):
     db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
     if not db_laptop:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden.")
     
     crud.clear_laptop_command(db=db, laptop_identifier=laptop_identifier)
     if payload.client_version:
-        crud.update_laptop_contact(db=db, laptop_identifier=laptop_identifier, client_version=payload.client_version)
+        heartbeat_buffer.record(db_laptop.id, client_version=payload.client_version)
+    dashboard_events.publish("command", [db_laptop.id])
     
     return db_laptop
 
@@ -75,24 +155,22 @@ def clear_client_command(laptop_identifier: str, payload: ClearCommandPayload =
 def trigger_scan_for_client(
     laptop_identifier_or_all: str,
     payload: TriggerScanPayload = Body(default_factory=TriggerScanPayload),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     command_to_set = "START_SCAN"
     scan_type_to_set = payload.scan_type
 
     if laptop_identifier_or_all.lower() == "all":
-        laptops_to_update: list[models.Laptop] = crud.get_laptops(db, limit=10000)
-        if not laptops_to_update:
+        count = crud.dispatch_laptop_command(
+            db=db,
+            command=command_to_set,
+            scan_type=scan_type_to_set,
+            target=payload.target
+        )
+        command_notifier.notify() # wartende Long-Polls aller Laptops prüfen ihren Befehl
+        dashboard_events.publish("command")
+        if not count:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Keine Laptops zum Triggern gefunden.")
-        count = 0
-        for laptop_item in laptops_to_update:
-            crud.update_laptop_command(
-                db=db,
-                laptop_identifier=cast(str, laptop_item.alias_name),
-                command=command_to_set,
-                scan_type=scan_type_to_set
-            )
-            count += 1
         return {"message": f"Scan-Befehl '{command_to_set}' (Typ: {scan_type_to_set}) für {count} Laptops gesetzt."}
     else:
         updated_laptop = crud.update_laptop_command(
@@ -103,6 +181,8 @@ def trigger_scan_for_client(
         )
         if not updated_laptop:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden.")
+        command_notifier.notify(updated_laptop.id)
+        dashboard_events.publish("command", [updated_laptop.id])
         return {"message": f"Scan-Befehl '{command_to_set}' (Typ: {scan_type_to_set}) für Laptop '{laptop_identifier_or_all}' gesetzt."}
 
 
@@ -113,7 +193,7 @@ def trigger_scan_for_client(
 def trigger_update_for_client(
     laptop_identifier_or_all: str,
     payload: schemas.TriggerUpdatePayload = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     command_to_set = "UPDATE_CLIENT"
 
@@ -128,28 +208,26 @@ def trigger_update_for_client(
                     release_data = json.loads(response.read().decode())
                     payload.version = release_data.get("tag_name", "main")
             except Exception as e:
-                print(f"WARNUNG: Konnte 'latest' Release nicht auflösen: {e}")
+                logger.warning("Konnte 'latest' Release nicht auflösen: %s", e)
                 payload.version = "latest" # Fallback to latest, let the client handle it
         elif v_stripped.lower() != "main" and v_stripped and v_stripped[0].isdigit():
             payload.version = f"v{v_stripped}"
         else:
             payload.version = v_stripped
 
-    payload_json = payload.model_dump_json()
+    payload_json = payload.model_dump_json(exclude={"target"})
 
     if laptop_identifier_or_all.lower() == "all":
-        laptops_to_update: list[models.Laptop] = crud.get_laptops(db, limit=10000)
-        if not laptops_to_update:
+        count = crud.dispatch_laptop_command(
+            db=db,
+            command=command_to_set,
+            payload=payload_json,
+            target=payload.target
+        )
+        command_notifier.notify() # wartende Long-Polls aller Laptops prüfen ihren Befehl
+        dashboard_events.publish("command")
+        if not count:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Keine Laptops zum Triggern gefunden.")
-        count = 0
-        for laptop_item in laptops_to_update:
-            crud.update_laptop_command(
-                db=db,
-                laptop_identifier=cast(str, laptop_item.alias_name),
-                command=command_to_set,
-                payload=payload_json
-            )
-            count += 1
         return {"message": f"Update-Befehl für {count} Laptops gesetzt."}
     else:
         updated_laptop = crud.update_laptop_command(
@@ -160,6 +238,8 @@ def trigger_update_for_client(
         )
         if not updated_laptop:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Laptop '{laptop_identifier_or_all}' nicht gefunden.")
+        command_notifier.notify(updated_laptop.id)
+        dashboard_events.publish("command", [updated_laptop.id])
         return {"message": f"Update-Befehl für Laptop '{laptop_identifier_or_all}' gesetzt."}
 
 
@@ -169,22 +249,15 @@ def trigger_update_for_client(
 @router.post("/cancel_command/{laptop_identifier_or_all}", status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_user_or_none)])
 def cancel_pending_command(
     laptop_identifier_or_all: str,
-    db: Session = Depends(get_db)
+    target: schemas.CommandTargetFilter | None = Body(default=None),
+    db: Session = Depends(get_write_db)
 ):
-    """Bricht den ausstehenden Befehl für einen oder alle Laptops ab."""
+    """Bricht den ausstehenden Befehl für einen oder alle (optional gefilterten) Laptops ab."""
     if laptop_identifier_or_all.lower() == "all":
-        laptops_to_cancel: list[models.Laptop] = crud.get_laptops(db, limit=10000)
-        if not laptops_to_cancel:
+        count = crud.dispatch_laptop_command(db=db, command=None, target=target)
+        dashboard_events.publish("command")
+        if not count:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Keine Laptops gefunden, um Befehle abzubrechen.")
-        count = 0
-        for laptop_item in laptops_to_cancel:
-            crud.update_laptop_command(
-                db=db, 
-                laptop_identifier=cast(str, laptop_item.alias_name),
-                command=None, 
-                scan_type=None
-            )
-            count += 1
         return {"message": f"Ausstehende Befehle für {count} Laptops abgebrochen/gelöscht."}
     else:
         updated_laptop = crud.update_laptop_command(
@@ -195,4 +268,5 @@ def cancel_pending_command(
         )
         if not updated_laptop:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden.")
+        dashboard_events.publish("command", [updated_laptop.id])
         return {"message": f"Ausstehender Befehl für Laptop '{laptop_identifier_or_all}' abgebrochen/gelöscht."}
\ No newline at end of file
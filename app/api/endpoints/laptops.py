@@ -4,10 +4,13 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app import crud, models, schemas
-from app.database import get_db
+from app.database import get_read_db, get_write_db
 # NEU: Wir importieren BEIDE Sicherheitsmechanismen
 from app.security import get_api_key
 from app.auth import get_current_user_or_none
+from app.heartbeat import heartbeat_buffer
+from app.notifications import dashboard_events
+from app.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(
     prefix="/laptops",
@@ -20,7 +23,7 @@ router = APIRouter(
 # Diese Route ist für das Installations-Skript -> Benötigt API-Schlüssel
 # =======================================================================================
 @router.post("", response_model=schemas.Laptop, status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
-def create_new_laptop(laptop: schemas.LaptopCreate, db: Session = Depends(get_db)):
+def create_new_laptop(laptop: schemas.LaptopCreate, db: Session = Depends(get_write_db)):
     db_laptop_hostname = crud.get_laptop_by_hostname(db, hostname=laptop.hostname)
     if db_laptop_hostname:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Laptop mit Hostname '{laptop.hostname}' existiert bereits.")
@@ -28,7 +31,9 @@ def create_new_laptop(laptop: schemas.LaptopCreate, db: Session = Depends(get_db
     if db_laptop_alias:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Laptop mit Alias '{laptop.alias_name}' existiert bereits.")
     
-    return crud.create_laptop(db=db, laptop=laptop)
+    db_laptop = crud.create_laptop(db=db, laptop=laptop)
+    dashboard_events.publish("laptop", [db_laptop.id])
+    return db_laptop
 
 
 # =======================================================================================
@@ -36,8 +41,11 @@ def create_new_laptop(laptop: schemas.LaptopCreate, db: Session = Depends(get_db
 # mit dem API-Schlüssel.
 # =======================================================================================
 @router.get("", response_model=List[schemas.Laptop], dependencies=[Depends(get_api_key)])
-def read_laptops_list(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    laptops = crud.get_laptops(db, skip=skip, limit=limit)
+def read_laptops_list(response: Response, skip: int = 0, limit: int = 100, cursor: str | None = None, db: Session = Depends(get_read_db)):
+    """Laptops nach ID. Für die nächste Seite den Header X-Next-Cursor als ?cursor= übergeben."""
+    after_id = decode_cursor(cursor, int)[0] if cursor else None
+    laptops = crud.get_laptops(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, laptops, limit, "id")
     return laptops
 
 
@@ -45,7 +53,8 @@ def read_laptops_list(skip: int = 0, limit: int = 100, db: Session = Depends(get
 # Diese Route ist für das Installations-Skript (Prüfung) -> Benötigt API-Schlüssel
 # =======================================================================================
 @router.get("/{laptop_identifier:path}", response_model=schemas.Laptop, dependencies=[Depends(get_api_key)])
-def read_laptop_details(laptop_identifier: str, db: Session = Depends(get_db)):
+def read_laptop_details(laptop_identifier: str, db: Session = Depends(get_write_db)):
+    # Schreib-Session: das Installations-Skript prüft direkt nach der Registrierung (kein Replikat-Verzug)
     db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
     if db_laptop is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden")
@@ -56,9 +65,11 @@ def read_laptop_details(laptop_identifier: str, db: Session = Depends(get_db)):
 # DIESE ROUTE IST FÜR DAS WEBINTERFACE -> Benötigt Login-Session
 # =======================================================================================
 @router.delete("/{laptop_identifier:path}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user_or_none)])
-def delete_laptop(laptop_identifier: str, db: Session = Depends(get_db)):
+def delete_laptop(laptop_identifier: str, db: Session = Depends(get_write_db)):
     """Löscht einen Laptop und alle zugehörigen Scan-Berichte."""
     deleted_laptop = crud.delete_laptop_by_identifier(db=db, laptop_identifier=laptop_identifier)
     if deleted_laptop is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden")
+    heartbeat_buffer.forget(deleted_laptop.id)
+    dashboard_events.publish("laptop", [deleted_laptop.id])
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
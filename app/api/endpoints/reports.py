@@ -1,16 +1,25 @@
 # app/api/endpoints/reports.py
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-import json 
-import pprint 
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Tuple, AsyncIterator, Union
 from pydantic import ValidationError
-from datetime import timezone
+from datetime import datetime, timezone
 
-from app import crud, models, schemas
-from app.database import get_db
+from app import crud, crud_async, models, schemas
+from app.database import get_read_db, get_async_read_db, get_async_write_db
 from app.security import get_api_key
+from app.ingest import report_ingest_queue, IngestQueueFull
+from app.config import settings
+from app.notifications import dashboard_events
+from app.compression import read_request_body, iter_request_body
+from app.pagination import decode_cursor, set_next_cursor
+from app.retention import retention_status
+from app.response_cache import dashboard_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/scanreports",
@@ -19,6 +28,8 @@ router = APIRouter(
     # dependencies=[Depends(get_api_key)]
 )
 
+REPORT_BATCH_CHUNK_SIZE = 500 # Zeilen pro INSERT/Commit bei POST /batch
+
 # =======================================================================================
 # Diese Routen sind für die Client-Skripte und benötigen einen API-Schlüssel
 # =======================================================================================
@@ -26,37 +37,40 @@ router = APIRouter(
 @router.post("/", response_model=schemas.ScanReport, status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
 async def submit_scan_report(
     request: Request, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ):
+    # Direkt auf den Rohdaten validieren (ohne Umweg über decode + json.loads + dict)
+    raw_body_bytes = await read_request_body(request, settings.request_max_decompressed_bytes)
     try:
-        raw_body_bytes = await request.body()
-        raw_body_str = raw_body_bytes.decode('utf-8')
-        print(f"--- RAW REQUEST BODY (reports.py, Länge: {len(raw_body_bytes)}) ---")
-        # print(raw_body_str) # Optional: Bei Bedarf für Debugging einkommentieren
-        print(f"--- END RAW REQUEST BODY ---")
-        
-        parsed_json_data = json.loads(raw_body_str)
-        report_payload = schemas.ScanReportCreate(**parsed_json_data)
-
-    except json.JSONDecodeError as e:
-        # Detailliertes Logging für JSON-Fehler
-        print(f"!!! JSONDecodeError: {e} !!!")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ungültiges JSON-Format: {e.msg}")
+        report_payload = schemas.ScanReportCreate.model_validate_json(raw_body_bytes)
     except ValidationError as e:
-        print(f"!!! Pydantic ValidationError: {e} !!!")
+        json_errors = [error for error in e.errors() if error["type"] == "json_invalid"]
+        if json_errors:
+            logger.warning("Ungültiges JSON im Scan-Bericht (Länge: %d): %s", len(raw_body_bytes), json_errors[0]["msg"])
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ungültiges JSON-Format: {json_errors[0]['msg']}")
+        logger.warning("Scan-Bericht ungültig: %s", e.errors(include_url=False, include_input=False))
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors())
-    except Exception as e: 
-        print(f"!!! Allgemeiner Fehler bei der Body-Verarbeitung: {type(e).__name__} - {e} !!!")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fehler bei der Verarbeitung der Anfrage.")
 
-    db_laptop_check = crud.get_laptop_by_identifier(db, identifier=report_payload.laptop_identifier)
-    if not db_laptop_check:
+    laptop_id = await crud_async.resolve_laptop_id(db, report_payload.laptop_identifier)
+    if laptop_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Laptop mit Kennung '{report_payload.laptop_identifier}' für Report nicht gefunden."
         )
-    
-    created_report = crud.create_scan_report(db=db, report_payload=report_payload)
+    # Session freigeben, bevor auf den Batch-Commit gewartet wird
+    await db.close()
+
+    try:
+        created_report = await report_ingest_queue.submit(laptop_id, report_payload)
+    except IngestQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server ausgelastet, Bericht bitte später erneut senden.",
+            headers={"Retry-After": str(settings.ingest_retry_after_seconds)}
+        )
+    except Exception:
+        logger.exception("Fehler beim Speichern des Reports für Laptop %s", laptop_id, extra={"laptop_id": laptop_id})
+        created_report = None
     if created_report is None: 
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -65,30 +79,147 @@ async def submit_scan_report(
     return created_report
 
 
+async def _iter_ndjson_lines(request: Request, max_line_bytes: int) -> AsyncIterator[Tuple[int, Union[bytes, None]]]:
+    """
+    Liefert die Zeilen des (ggf. gzip-komprimierten) Request-Bodys mit Zeilennummer, während er noch empfangen wird.
+    Zeilen länger als max_line_bytes werden nicht gepuffert, sondern bis zum Zeilenende verworfen und als None geliefert.
+    """
+    pending: List[bytes] = [] # Anfang der aktuellen Zeile aus vorherigen Blöcken
+    pending_size = 0
+    too_long = False
+    line_no = 0
+    async for chunk in iter_request_body(request, settings.request_max_decompressed_bytes):
+        # Nur den neuen Block zerlegen, nicht den bisherigen Zeilenanfang
+        *complete, rest = chunk.split(b"\n")
+        for part in complete:
+            line_no += 1
+            if too_long or pending_size + len(part) > max_line_bytes:
+                yield line_no, None
+            else:
+                yield line_no, b"".join(pending) + part
+            pending, pending_size, too_long = [], 0, False
+        if not too_long:
+            pending.append(rest)
+            pending_size += len(rest)
+            if pending_size > max_line_bytes:
+                pending, pending_size, too_long = [], 0, True
+    if too_long:
+        yield line_no + 1, None
+    elif pending_size:
+        yield line_no + 1, b"".join(pending)
+
+async def _store_report_chunk(db: AsyncSession, chunk: List[Tuple[int, schemas.ScanReportCreate]], results: List[dict]) -> None:
+    """Speichert einen Block validierter Zeilen mit einem INSERT und trägt das Ergebnis je Zeile ein."""
+    laptop_ids = await crud_async.resolve_laptop_ids(db, [payload.laptop_identifier for _, payload in chunk])
+    to_insert = []
+    for line_no, payload in chunk:
+        laptop_id = laptop_ids.get(payload.laptop_identifier)
+        if laptop_id is None:
+            results.append({"line": line_no, "status": status.HTTP_404_NOT_FOUND, "detail": f"Laptop mit Kennung '{payload.laptop_identifier}' nicht gefunden."})
+        else:
+            to_insert.append((line_no, laptop_id, payload))
+    if not to_insert:
+        return
+    try:
+        report_ids = await crud_async.insert_scan_reports_bulk(db, [(laptop_id, payload) for _, laptop_id, payload in to_insert], datetime.now(timezone.utc))
+    except Exception:
+        await db.rollback()
+        logger.exception("Fehler beim Speichern eines Report-Blocks (%d Zeilen)", len(to_insert))
+        for line_no, _, _ in to_insert:
+            results.append({"line": line_no, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": "Fehler beim Speichern des Reports."})
+        return
+    for (line_no, _, _), report_id in zip(to_insert, report_ids):
+        results.append({"line": line_no, "status": status.HTTP_201_CREATED, "id": report_id})
+    dashboard_events.publish("report", {laptop_id for _, laptop_id, _ in to_insert})
+
+@router.post("/batch", dependencies=[Depends(get_api_key)])
+async def submit_scan_reports_batch(request: Request, db: AsyncSession = Depends(get_async_write_db)):
+    """
+    Nimmt nachgereichte Berichte (z.B. nach längerer Offline-Zeit) als NDJSON entgegen:
+    ein ScanReportCreate-Objekt pro Zeile, gern auch für verschiedene Laptops.
+    Zeilen werden beim Empfang validiert und blockweise gespeichert; die Antwort enthält
+    ein Ergebnis pro Zeile (status 201 mit id, sonst 400/404/413/422/500 mit detail).
+    """
+    results: List[dict] = []
+    chunk: List[Tuple[int, schemas.ScanReportCreate]] = []
+    last_line_no = 0
+    try:
+        async for line_no, line in _iter_ndjson_lines(request, settings.report_batch_max_line_bytes):
+            last_line_no = line_no
+            if line is not None and not line.strip():
+                continue
+            if line_no > settings.report_batch_max_lines:
+                # Ab hier nicht mehr verarbeitet; der Client sendet den Rest in einem weiteren Aufruf
+                results.append({"line": line_no, "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "detail": f"Maximal {settings.report_batch_max_lines} Zeilen pro Aufruf, diese und alle folgenden Zeilen wurden nicht verarbeitet."})
+                break
+            if line is None:
+                results.append({"line": line_no, "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "detail": f"Zeile länger als {settings.report_batch_max_line_bytes} Bytes, wurde nicht verarbeitet."})
+                continue
+            try:
+                chunk.append((line_no, schemas.ScanReportCreate.model_validate_json(line)))
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_context=False, include_input=False)
+                if any(error["type"] == "json_invalid" for error in errors):
+                    results.append({"line": line_no, "status": status.HTTP_400_BAD_REQUEST, "detail": f"Ungültiges JSON-Format: {errors[0]['msg']}"})
+                else:
+                    results.append({"line": line_no, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "detail": errors})
+            if len(chunk) >= REPORT_BATCH_CHUNK_SIZE:
+                await _store_report_chunk(db, chunk, results)
+                chunk = []
+    except HTTPException as e:
+        # Fehler im Body selbst (z.B. gzip-Größenlimit): bereits verarbeitete Zeilen bleiben gültig
+        if last_line_no == 0:
+            raise
+        results.append({"line": last_line_no + 1, "status": e.status_code, "detail": f"{e.detail} Diese und alle folgenden Zeilen wurden nicht verarbeitet."})
+    if chunk:
+        await _store_report_chunk(db, chunk, results)
+
+    results.sort(key=lambda result: result["line"])
+    accepted = sum(1 for result in results if result["status"] == status.HTTP_201_CREATED)
+    return JSONResponse({"accepted": accepted, "rejected": len(results) - accepted, "results": results})
+
+
 @router.get("/laptop/{laptop_identifier:path}", response_model=List[schemas.ScanReport], dependencies=[Depends(get_api_key)])
-def read_reports_for_laptop(laptop_identifier: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_reports_for_laptop(laptop_identifier: str, response: Response, skip: int = 0, limit: int = 100, cursor: str | None = None, db: Session = Depends(get_read_db)):
+    """Berichte eines Laptops, neueste zuerst. Für die nächste Seite den Header X-Next-Cursor als ?cursor= übergeben."""
+    after = decode_cursor(cursor, datetime, int) if cursor else None
     db_laptop = crud.get_laptop_by_identifier(db, identifier=laptop_identifier)
     if db_laptop is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laptop nicht gefunden")
     
     # Pylance wird hier möglicherweise meckern, aber der Code ist zur Laufzeit korrekt.
     # `db_laptop.id` ist ein Integer.
-    reports = crud.get_scan_reports_for_laptop(db, laptop_id=db_laptop.id, skip=skip, limit=limit) # type: ignore
+    reports = crud.get_scan_reports_for_laptop(db, laptop_id=db_laptop.id, skip=skip, limit=limit, after=after) # type: ignore
+    set_next_cursor(response, reports, limit, "client_scan_time", "id")
     return reports
 
 
 @router.get("/", response_model=List[schemas.ScanReport], dependencies=[Depends(get_api_key)])
-def read_all_reports(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
-    reports = crud.get_all_scan_reports(db, skip=skip, limit=limit)
+def read_all_reports(response: Response, skip: int = 0, limit: int = 1000, scan_status: models.ScanStatus | None = None, cursor: str | None = None, db: Session = Depends(get_read_db)):
+    """Alle Berichte, zuletzt eingegangene zuerst. Für die nächste Seite den Header X-Next-Cursor als ?cursor= übergeben."""
+    after = decode_cursor(cursor, datetime, int) if cursor else None
+    reports = crud.get_all_scan_reports(db, skip=skip, limit=limit, scan_status=scan_status, after=after)
+    set_next_cursor(response, reports, limit, "report_time_on_server", "id")
     return reports
 
 
+@router.get("/retention", dependencies=[Depends(get_api_key)])
+def read_retention_status(db: Session = Depends(get_read_db)):
+    """Fortschritt der Verdichtung alter Berichte zu Tageszusammenfassungen (siehe retention.py)."""
+    return retention_status(db)
+
+
 # =======================================================================================
 # Diese Route ist für das Web-Frontend und benötigt KEINEN API-Schlüssel
 # =======================================================================================
 @router.get("/last_update_timestamp", include_in_schema=False)
-async def get_last_report_timestamp(db: Session = Depends(get_db)):
-    last_report_time_db = db.query(func.max(models.ScanReport.report_time_on_server)).scalar()
+async def get_last_report_timestamp(db: AsyncSession = Depends(get_async_read_db)):
+    # Jeder neue Bericht erhöht die Änderungsversion; bis dahin kommt das Ergebnis aus dem Cache
+    fleet_version = await crud_async.get_fleet_version(db)
+    return await dashboard_cache.get_or_build("last_update_timestamp", None, fleet_version, lambda: _build_last_report_timestamp(db))
+
+async def _build_last_report_timestamp(db: AsyncSession) -> dict:
+    last_report_time_db = await crud_async.get_last_report_time(db)
     
     if last_report_time_db is not None:
         # Sicherstellen, dass die Zeit als UTC-aware behandelt wird
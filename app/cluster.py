@@ -0,0 +1,207 @@
+# app/cluster.py
+"""
+Betrieb mit mehreren Worker-Prozessen (uvicorn --workers bzw. WEB_CONCURRENCY) ohne externen Broker.
+
+Prozesslokale Zustände – wartende Long-Polls, Dashboard-Events (SSE) und der Identifier-Cache –
+werden über die Tabelle cluster_events abgeglichen: Jeder Worker sammelt seine Ereignisse im Speicher,
+schreibt sie gebündelt und liest im Abstand von cluster_sync_interval_seconds die neuen Einträge der
+anderen Worker. Die Hintergrund-Jobs (Verdichtung, Tages-Snapshots) laufen nur in dem Worker, der
+die Zuständigkeit (cluster_leases) hält; fällt er aus, übernimmt nach Ablauf ein anderer.
+Mit einem Worker ist der Kanal inaktiv und alles bleibt prozesslokal.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Union
+
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+from app.heartbeat import heartbeat_buffer
+from app.identity_cache import identifier_cache
+from app.notifications import command_notifier, dashboard_events
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_JOBS_LEASE = "background_jobs"
+LEADER_CHECK_INTERVAL_SECONDS = 1.0
+
+
+class ClusterChannel:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outbox: List[Tuple[str, str]] = []
+        self._last_event_id = 0
+        self.worker_id = ""
+        self.enabled = False
+        # Ein einzelner Worker ist immer zuständig; mehrere erst nach Übernahme der Zuständigkeit
+        self.is_leader = settings.web_concurrency <= 1
+        self.events_sent = 0
+        self.events_received = 0
+
+    def publish(self, kind: str, payload: Dict[str, Any]) -> None:
+        """Merkt ein Ereignis für die anderen Worker vor (wird im nächsten Abgleich geschrieben)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._outbox.append((kind, json.dumps(payload)))
+
+    def _install_forwarding(self) -> None:
+        command_notifier.forward = lambda laptop_id: self.publish("command", {"laptop_id": laptop_id})
+        dashboard_events.forward = lambda event_type, laptop_ids: self.publish("dashboard", {"type": event_type, "laptop_ids": laptop_ids})
+        identifier_cache.forward = lambda identifiers, laptop_id: self.publish("identifiers", {"identifiers": identifiers, "laptop_id": laptop_id})
+
+    def _remove_forwarding(self) -> None:
+        command_notifier.forward = None
+        dashboard_events.forward = None
+        identifier_cache.forward = None
+
+    def _apply(self, kind: str, payload: Dict[str, Any]) -> None:
+        """Wendet ein Ereignis eines anderen Workers lokal an (ohne es erneut weiterzureichen)."""
+        if kind == "command":
+            command_notifier.notify(payload["laptop_id"], local_only=True)
+        elif kind == "dashboard":
+            dashboard_events.publish(payload["type"], payload["laptop_ids"], local_only=True)
+        elif kind == "identifiers":
+            identifier_cache.invalidate(*payload["identifiers"], local_only=True)
+            if payload["laptop_id"] is not None:
+                identifier_cache.invalidate_laptop(payload["laptop_id"], local_only=True)
+                heartbeat_buffer.forget(payload["laptop_id"])
+
+    def _load_last_event_id(self) -> int:
+        db = SessionLocal()
+        try:
+            return crud.get_last_cluster_event_id(db)
+        finally:
+            db.close()
+
+    def sync_once(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Schreibt die eigenen Ereignisse und liefert die neuen der anderen Worker (im Threadpool)."""
+        with self._lock:
+            outgoing, self._outbox = self._outbox, []
+        db = SessionLocal()
+        try:
+            if outgoing:
+                crud.add_cluster_events(db, self.worker_id, outgoing)
+                self.events_sent += len(outgoing)
+            rows = [(event.id, event.origin, event.kind, event.payload) for event in crud.get_cluster_events_after(db, self._last_event_id)]
+        except Exception as e:
+            db.rollback()
+            # Nicht verlieren: beim nächsten Abgleich erneut versuchen
+            with self._lock:
+                self._outbox[:0] = outgoing
+            logger.warning("Abgleich mit den anderen Workern fehlgeschlagen: %s", e)
+            return []
+        finally:
+            db.close()
+        if rows:
+            self._last_event_id = rows[-1][0]
+        received = []
+        for event_id, origin, kind, payload in rows:
+            if origin == self.worker_id:
+                continue
+            try:
+                received.append((kind, json.loads(payload or "{}")))
+            except ValueError as e:
+                logger.warning("Ungültiges Ereignis %d von %s übersprungen: %s", event_id, origin, e)
+        self.events_received += len(received)
+        return received
+
+    def renew_lease(self) -> bool:
+        """Übernimmt bzw. verlängert die Zuständigkeit für die Hintergrund-Jobs; räumt als Zuständiger alte Ereignisse auf."""
+        db = SessionLocal()
+        try:
+            is_leader = crud.acquire_cluster_lease(db, BACKGROUND_JOBS_LEASE, self.worker_id, timedelta(seconds=settings.cluster_lease_ttl_seconds))
+            if is_leader:
+                crud.delete_cluster_events_before(db, datetime.now(timezone.utc) - timedelta(seconds=settings.cluster_event_retention_seconds))
+            return is_leader
+        except Exception as e:
+            db.rollback()
+            logger.warning("Zuständigkeit für Hintergrund-Jobs konnte nicht erneuert werden: %s", e)
+            return False
+        finally:
+            db.close()
+
+    def release_lease(self) -> None:
+        db = SessionLocal()
+        try:
+            crud.release_cluster_lease(db, BACKGROUND_JOBS_LEASE, self.worker_id)
+        finally:
+            db.close()
+
+    async def run(self) -> None:
+        """Hintergrund-Task jedes Workers: Ereignisse abgleichen und die Zuständigkeit verlängern."""
+        if settings.web_concurrency <= 1:
+            return
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._last_event_id = await asyncio.to_thread(self._load_last_event_id)
+        self.enabled = True
+        self._install_forwarding()
+        loop = asyncio.get_running_loop()
+        next_lease_renewal = loop.time()
+        try:
+            while True:
+                for kind, payload in await asyncio.to_thread(self.sync_once):
+                    try:
+                        self._apply(kind, payload)
+                    except Exception:
+                        # z.B. anderes Ereignisformat während eines Updates: nur dieses Ereignis auslassen
+                        logger.exception("Ereignis '%s' eines anderen Workers konnte nicht angewendet werden", kind)
+                if loop.time() >= next_lease_renewal:
+                    self.is_leader = await asyncio.to_thread(self.renew_lease)
+                    next_lease_renewal = loop.time() + settings.cluster_lease_ttl_seconds / 3
+                await asyncio.sleep(settings.cluster_sync_interval_seconds)
+        finally:
+            self._remove_forwarding()
+            self.enabled = False
+            # Ausstehende Ereignisse noch schreiben und die Zuständigkeit sofort freigeben
+            await asyncio.to_thread(self.sync_once)
+            if self.is_leader:
+                self.is_leader = False
+                await asyncio.to_thread(self.release_lease)
+
+    async def run_as_leader(self, job: Callable[[], Awaitable[None]]) -> None:
+        """
+        Führt einen Hintergrund-Job nur im zuständigen Worker aus. Geht die Zuständigkeit
+        verloren (z.B. abgelaufen), wird der Job hier beendet und im neuen Zuständigen gestartet.
+        Ein mit einer Exception beendeter Job wird neu gestartet.
+        """
+        task: Union[asyncio.Task, None] = None
+        try:
+            while True:
+                if task is not None and task.done() and not task.cancelled() and task.exception() is not None:
+                    logger.error("Hintergrund-Job %s abgebrochen, wird neu gestartet", getattr(job, "__name__", job), exc_info=task.exception())
+                    task = None
+                if self.is_leader and task is None:
+                    task = asyncio.create_task(job())
+                elif not self.is_leader and task is not None:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    task = None
+                await asyncio.sleep(LEADER_CHECK_INTERVAL_SECONDS)
+        finally:
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._outbox)
+        return {
+            "workers": settings.web_concurrency,
+            "enabled": self.enabled,
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "last_event_id": self._last_event_id,
+            "events_pending": pending,
+            "events_sent": self.events_sent,
+            "events_received": self.events_received,
+        }
+
+
+cluster_channel = ClusterChannel()
@@ -0,0 +1,170 @@
+# app/compression.py
+"""
+Komprimierung von Antworten (gzip, optional zstd/brotli, falls die Pakete installiert sind)
+und Dekomprimierung gzip-komprimierter Request-Bodys für die Berichts-Endpunkte.
+"""
+import zlib
+from typing import AsyncIterator, Dict
+
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Nur Textformate komprimieren (HTML, JSON, CSV, JS/CSS); Bilder sind bereits komprimiert,
+# Server-Sent Events dürfen nicht gepuffert werden
+COMPRESSIBLE_CONTENT_TYPES = ("text/html", "text/csv", "text/plain", "text/css", "application/json", "application/javascript", "text/javascript", "image/svg+xml")
+
+DECOMPRESS_BLOCK_SIZE = 64 * 1024
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_CONTENT_TYPES) and not content_type.startswith("text/event-stream")
+
+
+class _SelectiveMixin:
+    """Wendet die Komprimierung nur auf COMPRESSIBLE_CONTENT_TYPES an."""
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            await super().send_with_compression(message)
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.content_type_is_excluded = not _is_compressible(content_type)
+            return
+        await super().send_with_compression(message)
+
+
+class _GZipResponder(_SelectiveMixin, GZipResponder):
+    pass
+
+
+class _BrotliResponder(_SelectiveMixin, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=5)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class _ZstdResponder(_SelectiveMixin, IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.compress(body)
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK if more_body else zstandard.COMPRESSOBJ_FLUSH_FINISH
+        return data + self.compressor.flush(flush_mode)
+
+
+class _IdentityResponder(_SelectiveMixin, IdentityResponder):
+    pass
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parst Accept-Encoding in {Kodierung: q-Wert}; Kodierungen mit q=0 werden ausgelassen."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Wie Starlettes GZipMiddleware, bevorzugt aber zstd bzw. brotli, wenn der Browser es
+    anbietet und das Paket installiert ist. Antworten unter minimum_size bleiben unkomprimiert.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        responder: ASGIApp
+        if zstandard is not None and "zstd" in accepted:
+            responder = _ZstdResponder(self.app, self.minimum_size)
+        elif brotli is not None and "br" in accepted:
+            responder = _BrotliResponder(self.app, self.minimum_size)
+        elif "gzip" in accepted:
+            responder = _GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = _IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+# === Request-Bodys ===
+
+async def iter_request_body(request: Request, max_size: int) -> AsyncIterator[bytes]:
+    """
+    Liefert den Request-Body blockweise; bei `Content-Encoding: gzip` bereits entpackt.
+    Übersteigt der (entpackte) Inhalt max_size, wird mit 413 abgebrochen (Schutz vor gzip-Bomben).
+    """
+    content_encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if content_encoding in ("", "identity"):
+        total_size = 0
+        async for chunk in request.stream():
+            total_size += len(chunk)
+            if total_size > max_size:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Inhalt größer als {max_size} Bytes.")
+            yield chunk
+        return
+    if content_encoding not in ("gzip", "x-gzip"):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Content-Encoding '{content_encoding}' wird nicht unterstützt.")
+
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    total_size = 0
+    try:
+        async for chunk in request.stream():
+            pending = chunk
+            while not decompressor.eof:
+                # In begrenzten Blöcken entpacken, damit auch große Eingabeblöcke schrittweise weitergereicht werden
+                max_length = min(max_size - total_size + 1, DECOMPRESS_BLOCK_SIZE)
+                data = decompressor.decompress(pending, max_length)
+                total_size += len(data)
+                if total_size > max_size:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Entpackter Inhalt größer als {max_size} Bytes.")
+                if data:
+                    yield data
+                pending = decompressor.unconsumed_tail
+                if not pending and len(data) < max_length:
+                    break
+    except zlib.error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ungültige gzip-Daten: {e}")
+    if not decompressor.eof:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unvollständige gzip-Daten.")
+
+
+async def read_request_body(request: Request, max_size: int) -> bytes:
+    """Wie iter_request_body, aber als ein Block."""
+    return b"".join([chunk async for chunk in iter_request_body(request, max_size)])
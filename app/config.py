@@ -1,5 +1,6 @@
 # app/config.py
 from pathlib import Path
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -7,12 +8,102 @@ DOTENV_PATH = PROJECT_ROOT / ".env"
 
 class Settings(BaseSettings):
     database_url: str
+    # Optional: eigene URL für den Async-Treiber (Standard: aus database_url abgeleitet, z.B. sqlite+aiosqlite)
+    async_database_url: Optional[str] = None
+    # Optional: Lesereplikat für Dashboards, CSV-Export und Listen-APIs (Standard: database_url, eigener Verbindungspool)
+    read_database_url: Optional[str] = None
     secret_key: str
     app_username: str
     app_password: str
 
     server_api_key: str
 
+    # SQLite-Profil, wird bei jeder neuen Verbindung per PRAGMA gesetzt (leer = SQLite-Standard beibehalten).
+    # WAL: Leser blockieren Schreiber nicht; synchronous=NORMAL ist mit WAL absturzsicher, fsync nur beim Checkpoint
+    db_sqlite_journal_mode: str = "WAL"
+    db_sqlite_synchronous: str = "NORMAL"
+    # Wartezeit auf eine Schreibsperre, bevor "database is locked" gemeldet wird
+    db_sqlite_busy_timeout_ms: int = 5000
+    db_sqlite_mmap_size_bytes: int = 256 * 1024 * 1024
+    # Seiten-Cache je Verbindung in KiB
+    db_sqlite_cache_size_kib: int = 64 * 1024
+    db_sqlite_temp_store: str = "MEMORY"
+    # Verbindungspool für Server-Datenbanken (PostgreSQL, MySQL); bei SQLite gelten die SQLAlchemy-Standards
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # Anzahl Worker-Prozesse (dieselbe Variable wie uvicorn --workers). Ab 2 Workern gleichen sich die
+    # Prozesse über die Tabelle cluster_events ab; Hintergrund-Jobs laufen nur im zuständigen Worker
+    web_concurrency: int = 1
+    cluster_sync_interval_seconds: float = 0.25
+    cluster_lease_ttl_seconds: float = 30.0
+    cluster_event_retention_seconds: float = 300.0
+
+    # Client-Polls werden im Speicher gesammelt und in diesem Intervall gebündelt in die DB geschrieben
+    heartbeat_flush_interval_seconds: float = 5.0
+    # Max. Anzahl zwischengespeicherter Zuordnungen Hostname/Alias -> Laptop-ID (0 = deaktiviert)
+    identifier_cache_size: int = 20000
+    # Gerenderte Tabellenzeilen der Dashboards: Speichergrenze (Zeichen, 0 = deaktiviert) und Zeitfenster,
+    # innerhalb dessen zeitabhängige Werte ("OK (3h)", "Offline (12m)") aus dem Cache kommen dürfen
+    fragment_cache_max_chars: int = 16 * 1024 * 1024
+    fragment_cache_time_bucket_seconds: int = 60
+    # Fertige Antworten von /dashboard/laptops, /dashboard/updates und last_update_timestamp gelten bis zur
+    # nächsten Änderung der Flotte, höchstens aber so lange (0 = deaktiviert)
+    dashboard_cache_ttl_seconds: float = 2.0
+    # Maximale Wartezeit eines Long-Poll-Requests auf einen neuen Befehl
+    long_poll_max_timeout_seconds: float = 120.0
+    # Eingehende Berichte werden gesammelt und gebündelt geschrieben (ein Commit pro Batch)
+    ingest_queue_size: int = 2000
+    ingest_batch_size: int = 200
+    ingest_batch_max_wait_seconds: float = 0.05
+    # Bei voller Warteschlange: 503 mit diesem Retry-After
+    ingest_retry_after_seconds: int = 10
+    # Max. Anzahl Zeilen pro Aufruf von POST /scanreports/batch (NDJSON)
+    report_batch_max_lines: int = 10000
+    # Max. Länge einer einzelnen NDJSON-Zeile (Bytes); längere Zeilen werden mit 413 übersprungen
+    report_batch_max_line_bytes: int = 1024 * 1024
+
+    # Antworten ab dieser Größe (Bytes) werden komprimiert (gzip, bzw. zstd/brotli falls installiert)
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    # Max. Größe eines (ggf. entpackten) Request-Bodys der Berichts-Endpunkte
+    request_max_decompressed_bytes: int = 32 * 1024 * 1024
+
+    # Aufbewahrung: Berichte älter als so viele Tage werden zu Tageszusammenfassungen verdichtet (0 = deaktiviert)
+    report_retention_days: int = 0
+    retention_interval_seconds: float = 3600.0
+    retention_batch_size: int = 1000
+    # Pause zwischen zwei Batches, damit eingehende Berichte nicht auf die Schreibsperre warten
+    retention_batch_pause_seconds: float = 0.1
+
+    # Tages-Snapshots der Flotte für historische Tagesberichte: so viele Tage rückwirkend aufbauen und aufbewahren,
+    # ältere werden gelöscht (0 = deaktiviert). Speicherbedarf: eine Zeile je Laptop und Tag inkl. Scan-Meldung,
+    # bei 10.000 Laptops und 400 Tagen also rund 4 Mio. Zeilen
+    fleet_snapshot_max_days: int = 400
+    fleet_snapshot_interval_seconds: float = 900.0
+
+    # Prometheus-Metriken unter GET /metrics (Middleware, SQL-Zeiten)
+    metrics_enabled: bool = True
+    # Zugriff mit X-API-Key oder, falls gesetzt, mit "Authorization: Bearer <metrics_token>" (für Prometheus)
+    metrics_token: Optional[str] = None
+
+    # SQL-Instrumentierung: Server-Timing-Header je Request, Warnung bei langsamen Abfragen (ms, 0 = aus)
+    # und wenn ein Request dasselbe Statement öfter als N-mal ausführt (0 = aus)
+    db_server_timing: bool = True
+    db_slow_query_ms: float = 250.0
+    db_repeated_query_threshold: int = 10
+
+    # Logging (JSON-Zeilen auf stdout): Standard-Level und Levels je Logger als JSON,
+    # z.B. LOG_LEVELS='{"app.database": "DEBUG", "uvicorn.access": "WARNING"}'
+    log_level: str = "INFO"
+    log_levels: Dict[str, str] = {}
+    # Gleiche Warnungen (z.B. unbekannter Client) höchstens so oft je Intervall, der Rest wird gezählt (0 = alle)
+    log_sample_burst: int = 5
+    log_sample_interval_seconds: float = 60.0
+
     model_config = SettingsConfigDict(
         env_file=DOTENV_PATH,
         env_file_encoding='utf-8',
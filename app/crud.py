@@ -1,11 +1,61 @@
 # app/crud.py
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from datetime import datetime, timezone
-from typing import Union, List # WICHTIG: Union und List importieren
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_, func, update, insert, case, bindparam, select, exists, Select, tuple_, union_all, literal, true, false
+from datetime import datetime, timezone, timedelta, date
+from typing import Union, List, Dict, Optional, Iterable, Iterator, Tuple # WICHTIG: Union und List importieren
 
 from . import models
 from . import schemas
+from .identity_cache import identifier_cache
+from .scan_classification import classify_scan_result, ScanClassification
+from .metrics import record_ingested_reports
+
+# === Änderungsversion (inkrementelle Dashboard-Aktualisierung) ===
+
+def bump_fleet_version(db: Session) -> int:
+    """
+    Erhöht die globale Änderungsversion innerhalb der laufenden Transaktion (ohne Commit)
+    und gibt den neuen Wert zurück. Jeder Schreibpfad auf Laptops ruft dies vor dem Commit auf
+    und setzt `change_version` der geänderten Laptops auf den neuen Wert.
+    """
+    result = db.execute(
+        update(models.FleetState).where(models.FleetState.id == 1).values(change_version=models.FleetState.change_version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(models.FleetState(id=1, change_version=1))
+        db.flush()
+        return 1
+    return db.query(models.FleetState.change_version).filter(models.FleetState.id == 1).scalar()
+
+def get_fleet_version(db: Session) -> int:
+    version = db.query(models.FleetState.change_version).filter(models.FleetState.id == 1).scalar()
+    return version or 0
+
+def get_laptops_changed_since(db: Session, since_version: int, offline_window: Union[Tuple[datetime, datetime], None] = None) -> List[models.Laptop]:
+    """
+    Laptops mit change_version > since_version sowie – falls offline_window gesetzt ist – Laptops,
+    deren letzter Kontakt in dieses Fenster fällt (also seitdem offline gegangen sind).
+    Beide Teile laufen über eigene Indizes.
+    """
+    laptops = {
+        laptop.id: laptop
+        for laptop in db.query(models.Laptop).filter(models.Laptop.change_version > since_version).all()
+    }
+    if offline_window is not None:
+        window_start, window_end = offline_window
+        for laptop in db.query(models.Laptop).filter(
+            models.Laptop.last_api_contact > window_start,
+            models.Laptop.last_api_contact <= window_end
+        ).all():
+            laptops.setdefault(laptop.id, laptop)
+    return list(laptops.values())
+
+def count_pending_commands(db: Session) -> int:
+    return db.query(func.count(models.Laptop.id)).filter(models.Laptop.pending_command.is_not(None)).scalar() or 0
+
+def count_laptops(db: Session) -> int:
+    return db.query(func.count(models.Laptop.id)).scalar() or 0
 
 # === Laptop CRUD Funktionen ===
 
@@ -20,13 +70,49 @@ def get_laptop_by_alias(db: Session, alias_name: str) -> Union[models.Laptop, No
     return db.query(models.Laptop).filter(models.Laptop.alias_name == alias_name).first()
 
 def get_laptop_by_identifier(db: Session, identifier: str) -> Union[models.Laptop, None]:
-    """Sucht einen Laptop anhand von Hostname ODER Alias."""
-    return db.query(models.Laptop).filter(
+    """
+    Sucht einen Laptop anhand von Hostname ODER Alias.
+    Die Kennung wird über den Identifier-Cache zur ID aufgelöst; danach genügt ein Primärschlüssel-Zugriff,
+    der innerhalb derselben Session aus der Identity-Map bedient wird.
+    """
+    cached_id = identifier_cache.get(identifier)
+    if cached_id is not None:
+        db_laptop = db.get(models.Laptop, cached_id)
+        if db_laptop is not None:
+            return db_laptop
+        identifier_cache.invalidate(identifier, local_only=True) # Laptop existiert nicht mehr (jeder Worker bemerkt das selbst)
+
+    db_laptop = db.query(models.Laptop).filter(
         or_(models.Laptop.hostname == identifier, models.Laptop.alias_name == identifier)
     ).first()
+    if db_laptop is not None:
+        identifier_cache.put(identifier, db_laptop.id)
+    return db_laptop
 
-def get_laptops(db: Session, skip: int = 0, limit: int = 100) -> List[models.Laptop]:
-    return db.query(models.Laptop).offset(skip).limit(limit).all()
+def resolve_laptop_id(db: Session, identifier: str) -> Union[int, None]:
+    """Löst Hostname/Alias zur Laptop-ID auf, bei einem Cache-Treffer ohne Datenbankzugriff."""
+    cached_id = identifier_cache.get(identifier)
+    if cached_id is not None:
+        return cached_id
+    db_laptop = get_laptop_by_identifier(db, identifier)
+    return db_laptop.id if db_laptop is not None else None
+
+def get_laptops(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Laptop]:
+    """Laptops nach ID; mit after_id (Keyset-Cursor) wird direkt hinter dieser ID fortgesetzt statt per offset."""
+    query = db.query(models.Laptop).order_by(models.Laptop.id)
+    if after_id is not None:
+        query = query.filter(models.Laptop.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def get_laptops_by_ids(db: Session, laptop_ids: Iterable[int]) -> List[models.Laptop]:
+    return db.query(models.Laptop).filter(models.Laptop.id.in_(list(laptop_ids))).all()
+
+def get_laptop_ids_contacted_since(db: Session, since: datetime) -> set:
+    """IDs aller Laptops mit last_api_contact nach `since` (für die Online-Erkennung)."""
+    rows = db.query(models.Laptop.id).filter(models.Laptop.last_api_contact >= since).all()
+    return {row[0] for row in rows}
 
 def create_laptop(db: Session, laptop: schemas.LaptopCreate) -> models.Laptop:
     db_laptop = models.Laptop(
@@ -34,17 +120,23 @@ def create_laptop(db: Session, laptop: schemas.LaptopCreate) -> models.Laptop:
         alias_name=laptop.alias_name,
         last_api_contact=datetime.now(timezone.utc)
     )
+    db_laptop.change_version = bump_fleet_version(db)
     db.add(db_laptop)
     db.commit()
     db.refresh(db_laptop)
+    identifier_cache.invalidate(db_laptop.hostname, db_laptop.alias_name)
     return db_laptop
 
 def delete_laptop_by_identifier(db: Session, laptop_identifier: str) -> Union[models.Laptop, None]:
     """Löscht einen Laptop anhand seines Identifiers (Hostname oder Alias)."""
     db_laptop = get_laptop_by_identifier(db, identifier=laptop_identifier)
     if db_laptop:
+        laptop_id, hostname, alias_name = db_laptop.id, db_laptop.hostname, db_laptop.alias_name
+        bump_fleet_version(db)
         db.delete(db_laptop)
         db.commit()
+        identifier_cache.invalidate(laptop_identifier, hostname, alias_name)
+        identifier_cache.invalidate_laptop(laptop_id)
     return db_laptop
 
 
@@ -54,10 +146,59 @@ def update_laptop_contact(db: Session, laptop_identifier: str, client_version: U
         db_laptop.last_api_contact = datetime.now(timezone.utc)
         if client_version:
             db_laptop.client_version = client_version
+        db_laptop.change_version = bump_fleet_version(db)
         db.commit()
         db.refresh(db_laptop)
     return db_laptop
 
+def flush_laptop_contacts(db: Session, contacts: Dict[int, Tuple[datetime, Union[str, None]]], online_timeout: timedelta = timedelta(minutes=5)) -> int:
+    """
+    Schreibt gesammelte Client-Kontakte {laptop_id: (Zeitpunkt, client_version)} mit einem
+    einzigen UPDATE-Statement (executemany). Ein bereits neuerer last_api_contact (z.B. durch
+    einen zwischenzeitlich eingegangenen Report) wird dabei nicht überschrieben.
+    Nur Laptops, die dadurch von offline auf online wechseln oder eine neue Version melden,
+    erhalten eine neue change_version.
+    """
+    if not contacts:
+        return 0
+    online_cutoff = datetime.now(timezone.utc) - online_timeout
+    changed_ids = [
+        row[0] for row in db.query(models.Laptop.id).filter(
+            models.Laptop.id.in_(list(contacts.keys())),
+            or_(models.Laptop.last_api_contact.is_(None), models.Laptop.last_api_contact < online_cutoff)
+        ).all()
+    ]
+    changed_ids += [
+        row[0] for row in db.query(models.Laptop.id, models.Laptop.client_version).filter(
+            models.Laptop.id.in_([laptop_id for laptop_id, (_, version) in contacts.items() if version])
+        ).all()
+        if row[1] != contacts[row[0]][1]
+    ]
+    if changed_ids:
+        new_version = bump_fleet_version(db)
+        # last_api_contact explizit setzen, sonst greift onupdate=func.now() der Spalte
+        db.query(models.Laptop).filter(models.Laptop.id.in_(changed_ids)).update(
+            {models.Laptop.change_version: new_version, models.Laptop.last_api_contact: models.Laptop.last_api_contact},
+            synchronize_session=False
+        )
+    # Core-Tabelle statt ORM-Klasse, damit SQLAlchemy ein einfaches executemany ausführt
+    laptops_table = models.Laptop.__table__
+    contact_param = bindparam("b_contact", type_=laptops_table.c.last_api_contact.type)
+    stmt = update(laptops_table).where(laptops_table.c.id == bindparam("b_laptop_id")).values(
+        last_api_contact=case(
+            (or_(laptops_table.c.last_api_contact.is_(None), laptops_table.c.last_api_contact < contact_param), contact_param),
+            else_=laptops_table.c.last_api_contact
+        ),
+        client_version=func.coalesce(bindparam("b_version", type_=laptops_table.c.client_version.type), laptops_table.c.client_version)
+    )
+    params = [
+        {"b_laptop_id": laptop_id, "b_contact": contact_time, "b_version": client_version}
+        for laptop_id, (contact_time, client_version) in contacts.items()
+    ]
+    db.execute(stmt, params)
+    db.commit()
+    return len(params)
+
 def update_laptop_command(db: Session, laptop_identifier: str, command: Union[str, None], scan_type: Union[str, None] = None, payload: Union[str, None] = None) -> Union[models.Laptop, None]:
     db_laptop = get_laptop_by_identifier(db=db, identifier=laptop_identifier)
     if db_laptop:
@@ -70,6 +211,7 @@ def update_laptop_command(db: Session, laptop_identifier: str, command: Union[st
             db_laptop.command_issue_time = None
             db_laptop.pending_scan_type = None
             db_laptop.pending_command_payload = None
+        db_laptop.change_version = bump_fleet_version(db)
         db.commit()
         db.refresh(db_laptop)
     return db_laptop
@@ -78,32 +220,113 @@ def clear_laptop_command(db: Session, laptop_identifier: str) -> Union[models.La
     """Löscht einen pending_command und pending_scan_type von einem Laptop."""
     return update_laptop_command(db=db, laptop_identifier=laptop_identifier, command=None, scan_type=None)
 
+BULK_COMMAND_BATCH_SIZE = 500 # Max. IDs pro UPDATE ... WHERE id IN (...), bleibt unter dem SQLite-Variablenlimit
 
-# === ScanReport CRUD Funktionen ===
-
-def create_scan_report(db: Session, report_payload: schemas.ScanReportCreate) -> Union[models.ScanReport, None]:
+def dispatch_laptop_command(
+    db: Session,
+    command: Union[str, None],
+    scan_type: Union[str, None] = None,
+    payload: Union[str, None] = None,
+    target: Union[schemas.CommandTargetFilter, None] = None
+) -> int:
     """
-    Erstellt einen neuen Scan-Bericht für einen Laptop.
-    Der Laptop wird anhand des laptop_identifier (Hostname oder Alias) gesucht.
+    Setzt (oder löscht bei command=None) einen Befehl für alle Laptops, die dem Filter entsprechen,
+    mit einem einzigen UPDATE statt Lookup + Commit pro Laptop. Gibt die Anzahl betroffener Laptops zurück.
     """
-    db_laptop = get_laptop_by_identifier(db=db, identifier=report_payload.laptop_identifier)
-    if not db_laptop:
-        return None 
+    now_utc = datetime.now(timezone.utc)
+    conditions = []
+    target_ids: Union[List[int], None] = None
+    if target is not None:
+        if target.laptop_ids is not None:
+            target_ids = list(dict.fromkeys(target.laptop_ids))
+        if target.offline_longer_than_hours is not None:
+            cutoff = now_utc - timedelta(hours=target.offline_longer_than_hours)
+            conditions.append(or_(models.Laptop.last_api_contact.is_(None), models.Laptop.last_api_contact < cutoff))
+        if target.last_scan_older_than_hours is not None:
+            cutoff = now_utc - timedelta(hours=target.last_scan_older_than_hours)
+            conditions.append(or_(models.Laptop.last_scan_time.is_(None), models.Laptop.last_scan_time < cutoff))
 
-    db_report = models.ScanReport(
-        laptop_id=db_laptop.id,
-        client_scan_time=report_payload.client_scan_time,
-        scan_type=report_payload.scan_type,
-        scan_result_message=report_payload.scan_result_message,
-        threats_found=report_payload.threats_found,
-        threat_details=report_payload.threat_details
-    )
-    db.add(db_report)
-    
+    if command:
+        values = {
+            "pending_command": command,
+            "command_issue_time": now_utc,
+            "pending_scan_type": scan_type,
+            "pending_command_payload": payload,
+        }
+    else:
+        values = {
+            "pending_command": None,
+            "command_issue_time": None,
+            "pending_scan_type": None,
+            "pending_command_payload": None,
+        }
+
+    # Versionsvergleich ist in SQL nicht zuverlässig möglich -> passende IDs vorab in Python bestimmen
+    if target is not None and target.client_version_below:
+        max_version = schemas.version_key(target.client_version_below)
+        if max_version is None:
+            return 0 # nie auf "alle" ausweichen (wird bereits von CommandTargetFilter abgewiesen)
+        candidates_query = db.query(models.Laptop.id, models.Laptop.client_version).filter(*conditions)
+        target_id_set = set(target_ids) if target_ids is not None else None
+        matching_ids = []
+        for laptop_id, client_version in candidates_query:
+            if target_id_set is not None and laptop_id not in target_id_set:
+                continue
+            version = schemas.version_key(client_version)
+            if version is None or version < max_version:
+                matching_ids.append(laptop_id)
+        target_ids = matching_ids
+
+    # Ohne ID-Liste genügt ein einziges UPDATE, sonst eines pro Block von IDs
+    id_batches: List[Union[List[int], None]] = [None]
+    if target_ids is not None:
+        if not target_ids:
+            return 0
+        id_batches = [target_ids[i:i + BULK_COMMAND_BATCH_SIZE] for i in range(0, len(target_ids), BULK_COMMAND_BATCH_SIZE)]
+
+    values["change_version"] = bump_fleet_version(db)
+
+    affected = 0
+    for id_batch in id_batches:
+        stmt = update(models.Laptop).where(*conditions).values(**values)
+        if id_batch is not None:
+            stmt = stmt.where(models.Laptop.id.in_(id_batch))
+        result = db.execute(stmt.execution_options(synchronize_session=False))
+        affected += result.rowcount
+    db.commit()
+    return affected
+
+
+# === ScanReport CRUD Funktionen ===
+
+def as_utc(value: datetime) -> datetime:
+    # Naive Zeitstempel (z.B. aus SQLite) gelten wie in den Dashboards als UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def scan_report_values(report_payload: schemas.ScanReportCreate, classification: ScanClassification) -> dict:
+    """Spaltenwerte eines ScanReport (ohne laptop_id) inkl. der beim Eingang bestimmten Einordnung."""
+    return {
+        "client_scan_time": report_payload.client_scan_time,
+        "scan_type": report_payload.scan_type,
+        "scan_result_message": report_payload.scan_result_message,
+        "threats_found": report_payload.threats_found,
+        "threat_details": report_payload.threat_details,
+        "clean_result_message": classification.clean_message,
+        "is_error": classification.is_error,
+        "is_real_threat": classification.is_real_threat,
+        "scan_status": classification.status,
+    }
+
+def apply_last_scan(db_laptop: models.Laptop, report_payload: schemas.ScanReportCreate, classification: ScanClassification) -> None:
+    """Überträgt einen Bericht auf die last_scan_*-Felder des Laptops und beendet den ausstehenden Befehl."""
     db_laptop.last_scan_time = report_payload.client_scan_time
     db_laptop.last_scan_type = report_payload.scan_type
     db_laptop.last_scan_result_message = report_payload.scan_result_message
     db_laptop.last_scan_threats_found = report_payload.threats_found
+    db_laptop.last_scan_clean_message = classification.clean_message
+    db_laptop.last_scan_is_error = classification.is_error
+    db_laptop.last_scan_is_real_threat = classification.is_real_threat
+    db_laptop.last_scan_status = classification.status
     
     # Dauer berechnen
     client_time_aware = report_payload.client_scan_time
@@ -116,13 +339,50 @@ def create_scan_report(db: Session, report_payload: schemas.ScanReportCreate) ->
     db_laptop.pending_command = None
     db_laptop.command_issue_time = None
 
+def build_scan_report(db_laptop: models.Laptop, report_payload: schemas.ScanReportCreate) -> models.ScanReport:
+    """
+    Erzeugt das ScanReport-Objekt und überträgt das Ergebnis auf die last_scan_*-Felder des Laptops
+    (ohne Session-Zugriff, damit sync und async Variante dieselbe Logik nutzen).
+    """
+    # Einmalig beim Eingang einordnen, die Dashboards lesen nur noch die gespeicherten Spalten
+    classification = classify_scan_result(report_payload.scan_result_message, report_payload.threats_found)
+    db_report = models.ScanReport(
+        laptop_id=db_laptop.id,
+        report_time_on_server=datetime.now(timezone.utc), # explizit statt server_default, einheitliches Format für Cursor-Vergleiche
+        **scan_report_values(report_payload, classification)
+    )
+    apply_last_scan(db_laptop, report_payload, classification)
+    return db_report
+
+def create_scan_report(db: Session, report_payload: schemas.ScanReportCreate) -> Union[models.ScanReport, None]:
+    """
+    Erstellt einen neuen Scan-Bericht für einen Laptop.
+    Der Laptop wird anhand des laptop_identifier (Hostname oder Alias) gesucht.
+    """
+    db_laptop = get_laptop_by_identifier(db=db, identifier=report_payload.laptop_identifier)
+    if not db_laptop:
+        return None 
+
+    db_report = build_scan_report(db_laptop, report_payload)
+    db.add(db_report)
+    for statement in snapshot_update_statements([(db_laptop.id, snapshot_values(db_report))], datetime.now(timezone.utc).date()):
+        db.execute(statement)
+    db_laptop.change_version = bump_fleet_version(db)
+
     db.commit()
+    record_ingested_reports([db_report.scan_status])
     db.refresh(db_report)
     db.refresh(db_laptop) 
     return db_report
 
-def get_scan_reports_for_laptop(db: Session, laptop_id: int, skip: int = 0, limit: int = 100) -> List[models.ScanReport]:
-    return db.query(models.ScanReport).filter(models.ScanReport.laptop_id == laptop_id).order_by(models.ScanReport.client_scan_time.desc()).offset(skip).limit(limit).all()
+def get_scan_reports_for_laptop(db: Session, laptop_id: int, skip: int = 0, limit: int = 100, after: Optional[Tuple[datetime, int]] = None) -> List[models.ScanReport]:
+    """Berichte eines Laptops, neueste zuerst; after = (client_scan_time, id) des letzten Eintrags der Vorseite."""
+    query = db.query(models.ScanReport).filter(models.ScanReport.laptop_id == laptop_id).order_by(models.ScanReport.client_scan_time.desc(), models.ScanReport.id.desc())
+    if after is not None:
+        query = query.filter(tuple_(models.ScanReport.client_scan_time, models.ScanReport.id) < tuple_(*after))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def get_latest_scan_report_before(db: Session, laptop_id: int, target_dt: datetime) -> Union[models.ScanReport, None]:
     return db.query(models.ScanReport).filter(
@@ -130,5 +390,405 @@ def get_latest_scan_report_before(db: Session, laptop_id: int, target_dt: dateti
         models.ScanReport.client_scan_time <= target_dt
     ).order_by(models.ScanReport.client_scan_time.desc()).first()
 
-def get_all_scan_reports(db: Session, skip: int = 0, limit: int = 1000) -> List[models.ScanReport]:
-    return db.query(models.ScanReport).order_by(models.ScanReport.report_time_on_server.desc()).offset(skip).limit(limit).all()
\ No newline at end of file
+def latest_scan_reports_before_query(target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None, since: Optional[datetime] = None) -> Select:
+    """
+    SELECT für den jeweils letzten Scan-Bericht je Laptop bis einschließlich target_dt
+    (mit since nur Berichte ab diesem Zeitpunkt).
+    Nutzt eine Window-Funktion über den Index (laptop_id, client_scan_time).
+    """
+    ranked = select(
+        models.ScanReport.id.label("report_id"),
+        func.row_number().over(
+            partition_by=models.ScanReport.laptop_id,
+            order_by=(models.ScanReport.client_scan_time.desc(), models.ScanReport.id.desc())
+        ).label("rn")
+    ).where(models.ScanReport.client_scan_time <= target_dt)
+    if since is not None:
+        ranked = ranked.where(models.ScanReport.client_scan_time >= since)
+    if laptop_ids is not None:
+        ranked = ranked.where(models.ScanReport.laptop_id.in_(list(laptop_ids)))
+    ranked_sq = ranked.subquery()
+
+    return select(models.ScanReport).join(
+        ranked_sq, models.ScanReport.id == ranked_sq.c.report_id
+    ).where(ranked_sq.c.rn == 1)
+
+def get_latest_scan_reports_before(db: Session, target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None, since: Optional[datetime] = None) -> Dict[int, models.ScanReport]:
+    """
+    Liefert für jeden Laptop den letzten Scan-Bericht bis einschließlich target_dt
+    als Dict {laptop_id: ScanReport} – in EINER Abfrage statt einer pro Laptop.
+    """
+    reports = db.execute(latest_scan_reports_before_query(target_dt, laptop_ids, since)).scalars().all()
+    return {report.laptop_id: report for report in reports}
+
+def latest_rollups_before_query(target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None, since: Optional[datetime] = None) -> Select:
+    """Wie latest_scan_reports_before_query, aber über die Tageszusammenfassungen (letzter Bericht des Tages)."""
+    ranked = select(
+        models.ScanReportRollup.id.label("rollup_id"),
+        func.row_number().over(
+            partition_by=models.ScanReportRollup.laptop_id,
+            order_by=models.ScanReportRollup.client_scan_time.desc()
+        ).label("rn")
+    ).where(models.ScanReportRollup.client_scan_time <= target_dt)
+    if since is not None:
+        ranked = ranked.where(models.ScanReportRollup.day >= as_utc(since).date(), models.ScanReportRollup.client_scan_time >= since)
+    if laptop_ids is not None:
+        ranked = ranked.where(models.ScanReportRollup.laptop_id.in_(list(laptop_ids)))
+    ranked_sq = ranked.subquery()
+
+    return select(models.ScanReportRollup).join(
+        ranked_sq, models.ScanReportRollup.id == ranked_sq.c.rollup_id
+    ).where(ranked_sq.c.rn == 1)
+
+def merge_latest_scan_results(reports: Dict[int, models.ScanReport], rollups: Iterable[models.ScanReportRollup]) -> Dict[int, Union[models.ScanReport, models.ScanReportRollup]]:
+    """Ergänzt die Rohberichte um Tageszusammenfassungen; je Laptop gewinnt der neuere Scan."""
+    results: Dict[int, Union[models.ScanReport, models.ScanReportRollup]] = dict(reports)
+    for rollup in rollups:
+        current = results.get(rollup.laptop_id)
+        if current is None or as_utc(rollup.client_scan_time) > as_utc(current.client_scan_time):
+            results[rollup.laptop_id] = rollup
+    return results
+
+def get_latest_scan_results_before(db: Session, target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None, since: Optional[datetime] = None) -> Dict[int, Union[models.ScanReport, models.ScanReportRollup]]:
+    """
+    Wie get_latest_scan_reports_before, berücksichtigt aber auch bereits verdichtete Berichte
+    (Tageszusammenfassungen jenseits der Aufbewahrungsfrist). Die Rollup-Objekte haben dieselben
+    Ergebnis-Attribute wie ScanReport (client_scan_time, scan_type, scan_status, ...).
+    """
+    if laptop_ids is not None:
+        laptop_ids = list(laptop_ids)
+    reports = get_latest_scan_reports_before(db, target_dt, laptop_ids, since)
+    rollups = db.execute(latest_rollups_before_query(target_dt, laptop_ids, since)).scalars().all()
+    return merge_latest_scan_results(reports, rollups)
+
+def get_fleet_state_at(db: Session, target_dt: datetime) -> Dict[int, Union[models.ScanReport, models.ScanReportRollup, models.FleetDaySnapshot]]:
+    """
+    Letzter Scan je Laptop bis target_dt (Tagesbericht, CSV-Export). Für abgeschlossene Tage
+    kommt das Ergebnis aus dem Tages-Snapshot, sonst aus den Berichten (get_latest_scan_results_before).
+    """
+    snapshot_day = usable_snapshot_day(target_dt)
+    if snapshot_day is not None and db.execute(snapshot_usable_query(snapshot_day, target_dt)).scalar():
+        return {snapshot.laptop_id: snapshot for snapshot in db.execute(fleet_snapshot_query(snapshot_day)).scalars()}
+    return get_latest_scan_results_before(db, target_dt)
+
+def iter_scan_results_in_range(db: Session, start_dt: datetime, end_dt: datetime, laptop_ids: Optional[Iterable[int]] = None, chunk_size: int = 1000) -> Iterator:
+    """
+    Liefert alle Berichte mit start_dt <= client_scan_time <= end_dt, sortiert nach Alias und Scan-Zeit.
+    Für bereits verdichtete Tage kommt stattdessen eine Zeile je Laptop und Tag aus den
+    Tageszusammenfassungen (is_rollup=True, report_count = Anzahl Berichte des Tages).
+    Jede Zeile hat die Attribute alias_name, hostname, scan_type, client_scan_time, scan_result_message,
+    clean_result_message, threat_details, scan_status, is_rollup und report_count.
+    Die Zeilen werden über einen serverseitigen Cursor in Blöcken von chunk_size geholt,
+    damit auch Monats-Exporte nicht komplett im Speicher landen.
+    """
+    if laptop_ids is not None:
+        laptop_ids = list(laptop_ids)
+
+    def _result_columns(source):
+        return (
+            models.Laptop.alias_name, models.Laptop.hostname, source.id, source.scan_type, source.client_scan_time,
+            source.scan_result_message, source.clean_result_message, source.threat_details, source.scan_status,
+        )
+
+    raw_select = select(
+        *_result_columns(models.ScanReport), false().label("is_rollup"), literal(1).label("report_count")
+    ).join(models.Laptop, models.ScanReport.laptop_id == models.Laptop.id).where(
+        models.ScanReport.client_scan_time >= start_dt,
+        models.ScanReport.client_scan_time <= end_dt
+    )
+    rollup_select = select(
+        *_result_columns(models.ScanReportRollup), true().label("is_rollup"), models.ScanReportRollup.report_count
+    ).join(models.Laptop, models.ScanReportRollup.laptop_id == models.Laptop.id).where(
+        # day grenzt über den Index ein, client_scan_time ist der eigentliche Filter
+        models.ScanReportRollup.day >= as_utc(start_dt).date(),
+        models.ScanReportRollup.day <= as_utc(end_dt).date(),
+        models.ScanReportRollup.client_scan_time >= start_dt,
+        models.ScanReportRollup.client_scan_time <= end_dt
+    )
+    if laptop_ids is not None:
+        raw_select = raw_select.where(models.ScanReport.laptop_id.in_(laptop_ids))
+        rollup_select = rollup_select.where(models.ScanReportRollup.laptop_id.in_(laptop_ids))
+
+    combined = union_all(raw_select, rollup_select).subquery()
+    query = select(combined).order_by(
+        func.lower(combined.c.alias_name), combined.c.client_scan_time, combined.c.id
+    )
+    yield from db.execute(query, execution_options={"stream_results": True, "yield_per": chunk_size})
+
+def get_all_scan_reports(db: Session, skip: int = 0, limit: int = 1000, scan_status: Optional[models.ScanStatus] = None, after: Optional[Tuple[datetime, int]] = None) -> List[models.ScanReport]:
+    """
+    Alle Berichte, zuletzt eingegangene zuerst. after = (report_time_on_server, id) des letzten
+    Eintrags der Vorseite; läuft über den Index (report_time_on_server, id) bzw. (scan_status, ...).
+    """
+    query = db.query(models.ScanReport).order_by(models.ScanReport.report_time_on_server.desc(), models.ScanReport.id.desc())
+    if scan_status is not None:
+        query = query.filter(models.ScanReport.scan_status == scan_status)
+    if after is not None:
+        query = query.filter(tuple_(models.ScanReport.report_time_on_server, models.ScanReport.id) < tuple_(*after))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+# === Aufbewahrung (Tageszusammenfassungen, siehe retention.py) ===
+
+def get_retention_status(db: Session) -> Union[models.RetentionStatus, None]:
+    return db.query(models.RetentionStatus).filter(models.RetentionStatus.id == 1).first()
+
+def save_retention_status(db: Session, values: dict) -> None:
+    """Schreibt den Fortschritt der Verdichtung in die Einzeilen-Tabelle retention_status (mit Commit)."""
+    result = db.execute(update(models.RetentionStatus).where(models.RetentionStatus.id == 1).values(**values))
+    if result.rowcount == 0:
+        db.add(models.RetentionStatus(id=1, **values))
+    db.commit()
+
+def count_scan_reports_before(db: Session, cutoff: datetime) -> int:
+    return db.query(func.count(models.ScanReport.id)).filter(models.ScanReport.client_scan_time < cutoff).scalar() or 0
+
+def _report_duration_minutes(report: models.ScanReport) -> Union[int, None]:
+    """Zeitspanne Scan auf dem Client -> Eingang beim Server (wie last_scan_duration_minutes)."""
+    if report.report_time_on_server is None:
+        return None
+    return int((as_utc(report.report_time_on_server) - as_utc(report.client_scan_time)).total_seconds() / 60)
+
+def merge_reports_into_rollups(db: Session, reports: List[models.ScanReport]) -> int:
+    """
+    Addiert Berichte in die Tageszusammenfassung (laptop_id, UTC-Tag) und übernimmt den jeweils
+    neuesten Bericht als Ergebnis des Tages. Bestehende Zusammenfassungen werden fortgeschrieben,
+    damit auch nachträglich eingegangene alte Berichte korrekt einfließen. Rückgabe: Anzahl Rollups.
+    """
+    grouped: Dict[Tuple[int, date], List[models.ScanReport]] = {}
+    for report in reports:
+        grouped.setdefault((report.laptop_id, as_utc(report.client_scan_time).date()), []).append(report)
+
+    existing = {
+        (rollup.laptop_id, rollup.day): rollup
+        for rollup in db.query(models.ScanReportRollup).filter(
+            models.ScanReportRollup.laptop_id.in_({laptop_id for laptop_id, _ in grouped}),
+            models.ScanReportRollup.day.in_({day for _, day in grouped})
+        )
+    }
+    for (laptop_id, day), day_reports in grouped.items():
+        rollup = existing.get((laptop_id, day))
+        if rollup is None:
+            rollup = models.ScanReportRollup(laptop_id=laptop_id, day=day, report_count=0, error_count=0, threat_count=0)
+            db.add(rollup)
+        for report in sorted(day_reports, key=lambda r: (as_utc(r.client_scan_time), r.id)):
+            rollup.report_count += 1
+            rollup.error_count += 1 if report.is_error else 0
+            rollup.threat_count += 1 if report.is_real_threat else 0
+            duration = _report_duration_minutes(report)
+            if duration is not None and (rollup.max_duration_minutes is None or duration > rollup.max_duration_minutes):
+                rollup.max_duration_minutes = duration
+            if rollup.client_scan_time is None or as_utc(report.client_scan_time) >= as_utc(rollup.client_scan_time):
+                rollup.client_scan_time = report.client_scan_time
+                rollup.scan_type = report.scan_type
+                rollup.scan_result_message = report.scan_result_message
+                rollup.threats_found = report.threats_found
+                rollup.threat_details = report.threat_details
+                rollup.clean_result_message = report.clean_result_message
+                rollup.is_error = report.is_error
+                rollup.is_real_threat = report.is_real_threat
+                rollup.scan_status = report.scan_status
+    return len(grouped)
+
+def rollup_scan_reports_before(db: Session, cutoff: datetime, batch_size: int) -> Tuple[int, int]:
+    """
+    Verdichtet die ältesten (max. batch_size) Berichte mit client_scan_time < cutoff in die
+    Tageszusammenfassungen und löscht sie – beides in EINER Transaktion, damit kein Bericht
+    doppelt gezählt wird oder verloren geht. Rückgabe: (verdichtete Berichte, geschriebene Rollups).
+    """
+    reports = db.query(models.ScanReport).filter(
+        models.ScanReport.client_scan_time < cutoff
+    ).order_by(models.ScanReport.client_scan_time, models.ScanReport.id).limit(batch_size).all()
+    if not reports:
+        return 0, 0
+    rollup_count = merge_reports_into_rollups(db, reports)
+    db.query(models.ScanReport).filter(
+        models.ScanReport.id.in_([report.id for report in reports])
+    ).delete(synchronize_session=False)
+    db.commit()
+    db.expunge_all()
+    return len(reports), rollup_count
+
+# === Tages-Snapshots der Flotte (siehe snapshots.py) ===
+
+# Ergebnis-Spalten, die ScanReport, ScanReportRollup und FleetDaySnapshot gemeinsam haben
+SNAPSHOT_RESULT_FIELDS = (
+    "client_scan_time", "scan_type", "scan_result_message", "threats_found", "threat_details",
+    "clean_result_message", "is_error", "is_real_threat", "scan_status",
+)
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Beginn und Ende (exklusiv) eines UTC-Tages."""
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+def snapshot_values(source) -> dict:
+    """Ergebnis-Spalten eines Berichts, einer Tageszusammenfassung oder eines Snapshots als Dict."""
+    return {field: getattr(source, field) for field in SNAPSHOT_RESULT_FIELDS}
+
+def usable_snapshot_day(target_dt: datetime) -> Union[date, None]:
+    """UTC-Tag von target_dt, falls er abgeschlossen ist (nur dafür gibt es Snapshots)."""
+    day = as_utc(target_dt).date()
+    return day if day < datetime.now(timezone.utc).date() else None
+
+def snapshot_usable_query(day: date, target_dt: datetime) -> Select:
+    """
+    SELECT (bool): Snapshot des Tages ist aufgebaut und nach target_dt kam bis Tagesende kein Scan
+    mehr – dann entspricht der Snapshot genau dem Zustand zu target_dt.
+    """
+    target_utc = as_utc(target_dt)
+    day_end = day_bounds(day)[1]
+    return select(
+        exists().where(models.FleetSnapshotDay.day == day)
+        & ~exists().where(models.ScanReport.client_scan_time > target_utc, models.ScanReport.client_scan_time < day_end)
+        & ~exists().where(models.ScanReportRollup.day == day, models.ScanReportRollup.client_scan_time > target_utc)
+    )
+
+def fleet_snapshot_query(day: date) -> Select:
+    return select(models.FleetDaySnapshot).where(models.FleetDaySnapshot.day == day)
+
+def get_first_scan_day(db: Session) -> Union[date, None]:
+    """Tag des ältesten Scans (Berichte oder Tageszusammenfassungen)."""
+    first_report = db.query(func.min(models.ScanReport.client_scan_time)).scalar()
+    first_rollup_day = db.query(func.min(models.ScanReportRollup.day)).scalar()
+    candidates = [value for value in (first_report and as_utc(first_report).date(), first_rollup_day) if value is not None]
+    return min(candidates) if candidates else None
+
+def get_built_snapshot_days(db: Session, first_day: date, last_day: date) -> set:
+    return {row[0] for row in db.query(models.FleetSnapshotDay.day).filter(
+        models.FleetSnapshotDay.day >= first_day, models.FleetSnapshotDay.day <= last_day
+    )}
+
+def delete_fleet_snapshots_before(db: Session, cutoff_day: date) -> int:
+    """
+    Löscht die Snapshots aller Tage vor cutoff_day, tageweise mit je einem Commit. Zuerst wird der
+    Tag aus fleet_snapshot_days entfernt, damit Tagesberichte ihn nicht mehr lesen (sie berechnen
+    den Zustand dann wieder aus Berichten und Tageszusammenfassungen). Rückgabe: gelöschte Tage.
+    """
+    days = [row[0] for row in db.query(models.FleetSnapshotDay.day).filter(models.FleetSnapshotDay.day < cutoff_day).order_by(models.FleetSnapshotDay.day)]
+    # Zeilen ohne Eintrag in fleet_snapshot_days (z.B. abgebrochener Aufbau)
+    orphan_days = [row[0] for row in db.query(models.FleetDaySnapshot.day).filter(models.FleetDaySnapshot.day < cutoff_day).distinct()]
+    for day in sorted(set(days) | set(orphan_days)):
+        db.query(models.FleetSnapshotDay).filter(models.FleetSnapshotDay.day == day).delete(synchronize_session=False)
+        db.query(models.FleetDaySnapshot).filter(models.FleetDaySnapshot.day == day).delete(synchronize_session=False)
+        db.commit()
+    return len(days)
+
+def build_fleet_snapshot(db: Session, day: date) -> int:
+    """
+    Baut den Snapshot eines abgeschlossenen Tages: ist der Vortag vorhanden, wird er mit den Scans
+    dieses Tages fortgeschrieben, sonst einmalig aus allen Berichten bis Tagesende berechnet.
+    Rückgabe: Anzahl Laptops im Snapshot.
+    """
+    day_start, day_end = day_bounds(day)
+    last_moment = day_end - timedelta(microseconds=1)
+    previous_day = day - timedelta(days=1)
+    states: Dict[int, dict] = {}
+    if db.get(models.FleetSnapshotDay, previous_day) is not None:
+        states = {snapshot.laptop_id: snapshot_values(snapshot) for snapshot in db.execute(fleet_snapshot_query(previous_day)).scalars()}
+        changes = get_latest_scan_results_before(db, last_moment, since=day_start)
+    else:
+        changes = get_latest_scan_results_before(db, last_moment)
+    for laptop_id, result in changes.items():
+        current = states.get(laptop_id)
+        if current is None or as_utc(result.client_scan_time) >= as_utc(current["client_scan_time"]):
+            states[laptop_id] = snapshot_values(result)
+
+    db.query(models.FleetDaySnapshot).filter(models.FleetDaySnapshot.day == day).delete(synchronize_session=False)
+    if states:
+        db.execute(insert(models.FleetDaySnapshot), [{"day": day, "laptop_id": laptop_id, **values} for laptop_id, values in states.items()])
+    db.merge(models.FleetSnapshotDay(day=day, built_at=datetime.now(timezone.utc)))
+    db.commit()
+    db.expunge_all()
+    return len(states)
+
+def snapshot_update_statements(reports: Iterable[Tuple[int, dict]], today: date) -> list:
+    """
+    Statements, die nachträglich eingegangene Berichte (laptop_id, snapshot_values) mit Scan-Tag
+    vor heute in bereits aufgebaute Snapshots übernehmen: ab dem Scan-Tag wird jede ältere Zeile
+    des Laptops ersetzt und für Tage ohne Zeile (erster Scan des Laptops) eine angelegt.
+    Berichte von heute betreffen keine Snapshots, dann ist die Liste leer.
+    """
+    latest: Dict[Tuple[int, date], dict] = {}
+    for laptop_id, values in reports:
+        scan_time = as_utc(values["client_scan_time"])
+        if scan_time.date() >= today:
+            continue
+        # Innerhalb eines Tages genügt der neueste Bericht je Laptop
+        current = latest.get((laptop_id, scan_time.date()))
+        if current is None or scan_time > as_utc(current["client_scan_time"]):
+            latest[(laptop_id, scan_time.date())] = values
+
+    snapshots = models.FleetDaySnapshot.__table__
+    built_days = models.FleetSnapshotDay.__table__
+    statements = []
+    for (laptop_id, day), values in sorted(latest.items(), key=lambda item: as_utc(item[1]["client_scan_time"])):
+        result_values = {field: values[field] for field in SNAPSHOT_RESULT_FIELDS}
+        statements.append(update(snapshots).where(
+            snapshots.c.laptop_id == laptop_id,
+            snapshots.c.day >= day,
+            snapshots.c.client_scan_time < result_values["client_scan_time"]
+        ).values(**result_values))
+        statements.append(insert(snapshots).from_select(
+            ["day", "laptop_id", *SNAPSHOT_RESULT_FIELDS],
+            select(
+                built_days.c.day, literal(laptop_id),
+                *(literal(result_values[field], snapshots.c[field].type) for field in SNAPSHOT_RESULT_FIELDS)
+            ).where(
+                built_days.c.day >= day,
+                ~exists().where(snapshots.c.day == built_days.c.day, snapshots.c.laptop_id == laptop_id)
+            )
+        ))
+    return statements
+
+
+# === Mehrere Worker (app/cluster.py) ===
+
+def add_cluster_events(db: Session, origin: str, events: List[Tuple[str, Optional[str]]]) -> None:
+    """Schreibt Ereignisse (kind, payload-JSON) eines Workers mit einem Statement."""
+    now_utc = datetime.now(timezone.utc)
+    db.execute(insert(models.ClusterEvent.__table__), [
+        {"created_at": now_utc, "origin": origin, "kind": kind, "payload": payload} for kind, payload in events
+    ])
+    db.commit()
+
+def get_last_cluster_event_id(db: Session) -> int:
+    return db.query(func.max(models.ClusterEvent.id)).scalar() or 0
+
+def get_cluster_events_after(db: Session, after_id: int, limit: int = 1000) -> List[models.ClusterEvent]:
+    return db.query(models.ClusterEvent).filter(models.ClusterEvent.id > after_id).order_by(models.ClusterEvent.id).limit(limit).all()
+
+def delete_cluster_events_before(db: Session, cutoff: datetime) -> int:
+    deleted = db.query(models.ClusterEvent).filter(models.ClusterEvent.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def acquire_cluster_lease(db: Session, name: str, holder: str, ttl: timedelta) -> bool:
+    """
+    Übernimmt oder verlängert die Zuständigkeit `name` für `holder`, sofern sie frei, abgelaufen
+    oder bereits in dessen Besitz ist. Rückgabe: True, wenn holder jetzt zuständig ist.
+    """
+    now_utc = datetime.now(timezone.utc)
+    leases = models.ClusterLease.__table__
+    result = db.execute(update(leases).where(
+        leases.c.name == name,
+        or_(leases.c.holder == holder, leases.c.expires_at < now_utc)
+    ).values(holder=holder, expires_at=now_utc + ttl))
+    if result.rowcount:
+        db.commit()
+        return True
+    if db.get(models.ClusterLease, name) is not None:
+        db.rollback()
+        return False
+    try:
+        db.add(models.ClusterLease(name=name, holder=holder, expires_at=now_utc + ttl))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback() # ein anderer Worker war schneller
+        return False
+
+def release_cluster_lease(db: Session, name: str, holder: str) -> None:
+    db.query(models.ClusterLease).filter(models.ClusterLease.name == name, models.ClusterLease.holder == holder).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,219 @@
+# app/crud_async.py
+"""
+Async-Varianten der crud-Funktionen für die häufig aufgerufenen async-Endpunkte
+(Dashboards, Berichts-Eingang). Sie arbeiten mit der AsyncSession aus database.py und
+entsprechen inhaltlich den gleichnamigen Funktionen in crud.py.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, func, update, select, insert
+from datetime import datetime, timezone
+from typing import Union, List, Dict, Optional, Iterable, Tuple
+
+from . import models
+from . import schemas
+from .crud import (
+    build_scan_report, latest_scan_reports_before_query, latest_rollups_before_query, merge_latest_scan_results,
+    scan_report_values, apply_last_scan, as_utc, snapshot_values, snapshot_update_statements,
+    usable_snapshot_day, snapshot_usable_query, fleet_snapshot_query,
+)
+from .scan_classification import classify_scan_result, ScanClassification
+from .identity_cache import identifier_cache
+from .metrics import record_ingested_reports
+
+# === Änderungsversion ===
+
+async def bump_fleet_version(db: AsyncSession) -> int:
+    """Siehe crud.bump_fleet_version."""
+    result = await db.execute(
+        update(models.FleetState).where(models.FleetState.id == 1).values(change_version=models.FleetState.change_version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(models.FleetState(id=1, change_version=1))
+        await db.flush()
+        return 1
+    return await db.scalar(select(models.FleetState.change_version).where(models.FleetState.id == 1))
+
+async def get_fleet_version(db: AsyncSession) -> int:
+    version = await db.scalar(select(models.FleetState.change_version).where(models.FleetState.id == 1))
+    return version or 0
+
+async def get_laptops_changed_since(db: AsyncSession, since_version: int, offline_window: Union[Tuple[datetime, datetime], None] = None) -> List[models.Laptop]:
+    """Siehe crud.get_laptops_changed_since."""
+    result = await db.scalars(select(models.Laptop).where(models.Laptop.change_version > since_version))
+    laptops = {laptop.id: laptop for laptop in result}
+    if offline_window is not None:
+        window_start, window_end = offline_window
+        result = await db.scalars(select(models.Laptop).where(
+            models.Laptop.last_api_contact > window_start,
+            models.Laptop.last_api_contact <= window_end
+        ))
+        for laptop in result:
+            laptops.setdefault(laptop.id, laptop)
+    return list(laptops.values())
+
+async def count_laptops(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count(models.Laptop.id))) or 0
+
+# === Laptops ===
+
+async def get_laptop_by_identifier(db: AsyncSession, identifier: str) -> Union[models.Laptop, None]:
+    """Sucht einen Laptop anhand von Hostname ODER Alias (mit Identifier-Cache wie crud.get_laptop_by_identifier)."""
+    cached_id = identifier_cache.get(identifier)
+    if cached_id is not None:
+        db_laptop = await db.get(models.Laptop, cached_id)
+        if db_laptop is not None:
+            return db_laptop
+        identifier_cache.invalidate(identifier, local_only=True) # Laptop existiert nicht mehr (jeder Worker bemerkt das selbst)
+
+    db_laptop = (await db.scalars(select(models.Laptop).where(
+        or_(models.Laptop.hostname == identifier, models.Laptop.alias_name == identifier)
+    ).limit(1))).first()
+    if db_laptop is not None:
+        identifier_cache.put(identifier, db_laptop.id)
+    return db_laptop
+
+async def resolve_laptop_id(db: AsyncSession, identifier: str) -> Union[int, None]:
+    """Löst Hostname/Alias zur Laptop-ID auf, bei einem Cache-Treffer ohne Datenbankzugriff."""
+    cached_id = identifier_cache.get(identifier)
+    if cached_id is not None:
+        return cached_id
+    db_laptop = await get_laptop_by_identifier(db, identifier)
+    return db_laptop.id if db_laptop is not None else None
+
+async def resolve_laptop_ids(db: AsyncSession, identifiers: Iterable[str]) -> Dict[str, int]:
+    """Löst mehrere Hostnamen/Aliase auf einmal auf: Cache-Treffer direkt, der Rest mit EINER Abfrage."""
+    resolved: Dict[str, int] = {}
+    missing = set()
+    for identifier in set(identifiers):
+        cached_id = identifier_cache.get(identifier)
+        if cached_id is not None:
+            resolved[identifier] = cached_id
+        else:
+            missing.add(identifier)
+    if missing:
+        rows = await db.execute(select(models.Laptop.id, models.Laptop.hostname, models.Laptop.alias_name).where(
+            or_(models.Laptop.hostname.in_(missing), models.Laptop.alias_name.in_(missing))
+        ))
+        for laptop_id, hostname, alias_name in rows:
+            for identifier in (hostname, alias_name):
+                if identifier in missing:
+                    resolved[identifier] = laptop_id
+                    identifier_cache.put(identifier, laptop_id)
+    return resolved
+
+async def get_laptops(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Laptop]:
+    return list(await db.scalars(select(models.Laptop).offset(skip).limit(limit)))
+
+async def get_laptops_by_ids(db: AsyncSession, laptop_ids: Iterable[int]) -> List[models.Laptop]:
+    return list(await db.scalars(select(models.Laptop).where(models.Laptop.id.in_(list(laptop_ids)))))
+
+# === Scan-Berichte ===
+
+async def create_scan_report(db: AsyncSession, report_payload: schemas.ScanReportCreate) -> Union[models.ScanReport, None]:
+    """Siehe crud.create_scan_report."""
+    db_laptop = await get_laptop_by_identifier(db=db, identifier=report_payload.laptop_identifier)
+    if not db_laptop:
+        return None
+
+    db_report = build_scan_report(db_laptop, report_payload)
+    db.add(db_report)
+    for statement in snapshot_update_statements([(db_laptop.id, snapshot_values(db_report))], datetime.now(timezone.utc).date()):
+        await db.execute(statement)
+    db_laptop.change_version = await bump_fleet_version(db)
+
+    await db.commit()
+    record_ingested_reports([db_report.scan_status])
+    await db.refresh(db_report)
+    await db.refresh(db_laptop)
+    return db_report
+
+async def create_scan_reports_batch(db: AsyncSession, items: List[Tuple[int, schemas.ScanReportCreate, datetime]]) -> List[Union[models.ScanReport, None]]:
+    """
+    Speichert mehrere Berichte (laptop_id, Payload, Eingangszeit) in EINER Transaktion.
+    Die last_scan_*-Felder werden in Eingangsreihenfolge übertragen, d.h. wie bei einzelnen
+    Aufrufen von create_scan_report gewinnt der zuletzt eingegangene Bericht je Laptop.
+    Rückgabe in der Reihenfolge von items; None, wenn der Laptop nicht (mehr) existiert.
+    """
+    laptops = {laptop.id: laptop for laptop in await get_laptops_by_ids(db, {laptop_id for laptop_id, _, _ in items})}
+    created: List[Union[models.ScanReport, None]] = []
+    for laptop_id, report_payload, received_at in items:
+        db_laptop = laptops.get(laptop_id)
+        if db_laptop is None:
+            created.append(None)
+            continue
+        db_report = build_scan_report(db_laptop, report_payload)
+        db_report.report_time_on_server = received_at # Eingangszeit statt Schreibzeitpunkt des Batches
+        db.add(db_report)
+        created.append(db_report)
+
+    if any(report is not None for report in created):
+        # Nachgereichte Berichte älterer Tage in die Tages-Snapshots übernehmen
+        late_reports = [(report.laptop_id, snapshot_values(report)) for report in created if report is not None]
+        for statement in snapshot_update_statements(late_reports, datetime.now(timezone.utc).date()):
+            await db.execute(statement)
+        new_version = await bump_fleet_version(db)
+        for report in created:
+            if report is not None:
+                laptops[report.laptop_id].change_version = new_version
+        await db.commit()
+        record_ingested_reports(report.scan_status for report in created if report is not None)
+    return created
+
+async def insert_scan_reports_bulk(db: AsyncSession, items: List[Tuple[int, schemas.ScanReportCreate]], received_at: datetime) -> List[int]:
+    """
+    Fügt nachgereichte Berichte (laptop_id, Payload) mit EINEM INSERT ein und gibt die IDs
+    in der Reihenfolge von items zurück. Die last_scan_*-Felder eines Laptops werden nur auf
+    seinen neuesten Bericht vorgerückt – und nur, wenn dieser neuer ist als der bisher bekannte.
+    """
+    if not items:
+        return []
+    newest: Dict[int, Tuple[schemas.ScanReportCreate, ScanClassification]] = {}
+    rows = []
+    for laptop_id, report_payload in items:
+        classification = classify_scan_result(report_payload.scan_result_message, report_payload.threats_found)
+        rows.append({"laptop_id": laptop_id, "report_time_on_server": received_at, **scan_report_values(report_payload, classification)})
+        current = newest.get(laptop_id)
+        if current is None or as_utc(report_payload.client_scan_time) > as_utc(current[0].client_scan_time):
+            newest[laptop_id] = (report_payload, classification)
+
+    report_ids = list(await db.scalars(
+        insert(models.ScanReport).returning(models.ScanReport.id, sort_by_parameter_order=True), rows
+    ))
+
+    for statement in snapshot_update_statements([(row["laptop_id"], row) for row in rows], as_utc(received_at).date()):
+        await db.execute(statement)
+    new_version = await bump_fleet_version(db)
+    for db_laptop in await get_laptops_by_ids(db, newest.keys()):
+        report_payload, classification = newest[db_laptop.id]
+        if db_laptop.last_scan_time is None or as_utc(report_payload.client_scan_time) > as_utc(db_laptop.last_scan_time):
+            apply_last_scan(db_laptop, report_payload, classification)
+        else:
+            db_laptop.last_api_contact = datetime.now(timezone.utc)
+        db_laptop.change_version = new_version
+    await db.commit()
+    record_ingested_reports(row["scan_status"] for row in rows)
+    return report_ids
+
+async def get_latest_scan_reports_before(db: AsyncSession, target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None) -> Dict[int, models.ScanReport]:
+    """Siehe crud.get_latest_scan_reports_before."""
+    reports = await db.scalars(latest_scan_reports_before_query(target_dt, laptop_ids))
+    return {report.laptop_id: report for report in reports}
+
+async def get_latest_scan_results_before(db: AsyncSession, target_dt: datetime, laptop_ids: Optional[Iterable[int]] = None) -> Dict[int, Union[models.ScanReport, models.ScanReportRollup]]:
+    """Siehe crud.get_latest_scan_results_before."""
+    if laptop_ids is not None:
+        laptop_ids = list(laptop_ids)
+    reports = await get_latest_scan_reports_before(db, target_dt, laptop_ids)
+    rollups = await db.scalars(latest_rollups_before_query(target_dt, laptop_ids))
+    return merge_latest_scan_results(reports, rollups)
+
+async def get_fleet_state_at(db: AsyncSession, target_dt: datetime) -> Dict[int, Union[models.ScanReport, models.ScanReportRollup, models.FleetDaySnapshot]]:
+    """Siehe crud.get_fleet_state_at."""
+    snapshot_day = usable_snapshot_day(target_dt)
+    if snapshot_day is not None and await db.scalar(snapshot_usable_query(snapshot_day, target_dt)):
+        return {snapshot.laptop_id: snapshot for snapshot in await db.scalars(fleet_snapshot_query(snapshot_day))}
+    return await get_latest_scan_results_before(db, target_dt)
+
+async def get_last_report_time(db: AsyncSession) -> Union[datetime, None]:
+    """Zeitpunkt des zuletzt beim Server eingegangenen Berichts."""
+    return await db.scalar(select(func.max(models.ScanReport.report_time_on_server)))
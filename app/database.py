@@ -1,24 +1,332 @@
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import AsyncIterator, Dict, Iterator, List, Tuple, Union
 from .config import settings # Importiert unsere Konfiguration
+from .metrics import instrument_sessions, DB_QUERY_DURATION, DB_QUERY_ERRORS
+
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    # connect_args ist nur für SQLite nötig, um Threading-Probleme zu vermeiden
-    connect_args={"check_same_thread": False}
-)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def sqlite_pragmas() -> List[Tuple[str, Union[str, int]]]:
+    """PRAGMAs des SQLite-Profils aus den Settings (leere Werte werden ausgelassen)."""
+    pragmas: List[Tuple[str, Union[str, int]]] = [
+        ("journal_mode", settings.db_sqlite_journal_mode),
+        ("synchronous", settings.db_sqlite_synchronous),
+        ("busy_timeout", settings.db_sqlite_busy_timeout_ms),
+        ("mmap_size", settings.db_sqlite_mmap_size_bytes),
+        # Negativer Wert: Größe in KiB statt in Seiten
+        ("cache_size", -settings.db_sqlite_cache_size_kib),
+        ("temp_store", settings.db_sqlite_temp_store),
+    ]
+    return [(name, value) for name, value in pragmas if value != ""]
+
+
+def engine_options(url: str) -> dict:
+    """Argumente für create_engine/create_async_engine je nach Datenbank."""
+    if _is_sqlite(url):
+        # check_same_thread: Verbindungen werden aus dem Pool von verschiedenen Threads genutzt
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _apply_sqlite_profile(engine, read_only: bool = False) -> None:
+    """
+    Setzt die PRAGMAs aus sqlite_pragmas() auf jeder neuen Verbindung (gilt auch für aiosqlite).
+    read_only: zusätzlich query_only, Schreibversuche über die Lese-Engines schlagen fehl.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+    if read_only:
+        # Zuletzt setzen: journal_mode=WAL muss eine neue Datenbank ggf. noch umstellen
+        pragmas.append(("query_only", "ON"))
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _async_database_url(url: str) -> str:
+    """Leitet aus der synchronen Datenbank-URL die URL für den passenden Async-Treiber ab."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg:" + url[len(prefix):]
+    return url
+
+
+def _create_engines(url: str, async_url: str, read_only: bool = False) -> Tuple[Engine, AsyncEngine]:
+    sync_engine = create_engine(url, **engine_options(url))
+    _apply_sqlite_profile(sync_engine, read_only)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    _apply_sqlite_profile(async_engine.sync_engine, read_only)
+    return sync_engine, async_engine
+
+
+# Schreib-Engines: Client-Polls, Berichts-Eingang, Befehle und Hintergrund-Jobs.
+# Die Async-Engine dient den häufig aufgerufenen async-Endpunkten, damit Datenbankzugriffe
+# die Event-Loop nicht blockieren
+ASYNC_DATABASE_URL = settings.async_database_url or _async_database_url(SQLALCHEMY_DATABASE_URL)
+engine, async_engine = _create_engines(SQLALCHEMY_DATABASE_URL, ASYNC_DATABASE_URL)
+
+# Lese-Engines: Dashboards, CSV-Export und Listen-APIs. Eigener Verbindungspool, damit lange
+# Lesezugriffe keine Verbindungen der Schreibpfade belegen (mit WAL blockieren Leser die
+# Schreiber nicht); mit read_database_url auf einem Lesereplikat
+READ_DATABASE_URL = settings.read_database_url or SQLALCHEMY_DATABASE_URL
+ASYNC_READ_DATABASE_URL = _async_database_url(READ_DATABASE_URL) if settings.read_database_url else ASYNC_DATABASE_URL
+read_engine, async_read_engine = _create_engines(READ_DATABASE_URL, ASYNC_READ_DATABASE_URL, read_only=True)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# expire_on_commit=False: Objekte bleiben nach dem Commit lesbar (kein implizites Nachladen in async)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+def _describe_connection(connection) -> Dict[str, Union[str, int, float, bool]]:
+    """Tatsächlich wirksame Einstellungen einer Verbindung (SQLite: per PRAGMA zurückgelesen)."""
+    engine = connection.engine
+    description: Dict[str, Union[str, int, float, bool]] = {"url": engine.url.render_as_string(hide_password=True), "pool": type(engine.pool).__name__}
+    if engine.dialect.name == "sqlite":
+        for name in [name for name, _ in sqlite_pragmas()] + ["query_only"]:
+            description[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    else:
+        description.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow, pool_timeout=settings.db_pool_timeout_seconds, pool_recycle=settings.db_pool_recycle_seconds, pool_pre_ping=settings.db_pool_pre_ping)
+    return description
+
+
+def _describe_sync_engine(sync_engine: Engine) -> Dict[str, Union[str, int, float, bool]]:
+    with sync_engine.connect() as connection:
+        return _describe_connection(connection)
+
+
+async def _describe_async_engine(engine: AsyncEngine) -> Dict[str, Union[str, int, float, bool]]:
+    async with engine.connect() as connection:
+        return await connection.run_sync(_describe_connection)
+
+
+async def log_engine_profile() -> None:
+    """Gibt beim Start die wirksamen Datenbank-Einstellungen aller Engines aus."""
+    descriptions = {
+        "sync": await asyncio.to_thread(_describe_sync_engine, engine),
+        "async": await _describe_async_engine(async_engine),
+        "sync-read": await asyncio.to_thread(_describe_sync_engine, read_engine),
+        "async-read": await _describe_async_engine(async_read_engine),
+    }
+    for engine_name, description in descriptions.items():
+        logger.info("Datenbank (%s): %s", engine_name, ", ".join(f"{key}={value}" for key, value in description.items()), extra={"engine": engine_name, "settings": description})
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+    engine.dispose()
+    read_engine.dispose()
+
+
+# === SQL-Instrumentierung (Anzahl/Dauer je Request, langsame Abfragen, N+1-Erkennung) ===
+
+# Platzhalter-Listen wie "IN (?, ?, ?)" zählen als dieselbe Abfrage
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalisierte Form eines SQL-Statements (ohne Whitespace-Unterschiede und Länge von IN-Listen)."""
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Zählt SQL-Statements und Datenbankzeit, z.B. eines Requests (siehe QueryStatsMiddleware)."""
+
+    def __init__(self, keep_statements: bool = False):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[str, int] = {}
+        self.statements: Union[List[str], None] = [] if keep_statements else None
+
+    def record(self, statement: str, duration: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+            if self.statements is not None:
+                self.statements.append(shape)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements, die öfter als threshold-mal ausgeführt wurden (Hinweis auf N+1-Abfragen)."""
+        with self._lock:
+            return sorted(((shape, count) for shape, count in self.shapes.items() if count > threshold), key=lambda item: -item[1])
+
+
+_request_query_stats: ContextVar[Union[QueryStats, None]] = ContextVar("request_query_stats", default=None)
+# Zusätzliche Beobachter aus track_queries() (Request-übergreifend, auch über Threads hinweg)
+_query_trackers: List[QueryStats] = []
+_query_trackers_lock = threading.Lock()
+
+
+def _instrument_engine(engine, engine_name: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start_time")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        if settings.metrics_enabled:
+            DB_QUERY_DURATION.observe(duration, engine_name)
+        request_stats = _request_query_stats.get()
+        if request_stats is not None:
+            request_stats.record(statement, duration)
+        if _query_trackers:
+            with _query_trackers_lock:
+                trackers = list(_query_trackers)
+            for tracker in trackers:
+                tracker.record(statement, duration)
+        if settings.db_slow_query_ms > 0 and duration * 1000 >= settings.db_slow_query_ms:
+            logger.warning("Langsame SQL-Abfrage (%.1f ms, %s): %s | Parameter: %s", duration * 1000, engine_name, statement_shape(statement), str(parameters)[:200], extra={"duration_ms": round(duration * 1000, 1), "engine": engine_name})
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        starts = connection.info.get("query_start_time") if connection is not None else None
+        if starts:
+            starts.pop()
+        if settings.metrics_enabled:
+            DB_QUERY_ERRORS.inc(engine_name)
+
+
+_instrument_engine(engine, "sync")
+_instrument_engine(async_engine.sync_engine, "async")
+_instrument_engine(read_engine, "sync-read")
+_instrument_engine(async_read_engine.sync_engine, "async-read")
+if settings.metrics_enabled:
+    instrument_sessions(Session)
+
+
+class QueryStatsMiddleware:
+    """
+    Zählt die SQL-Statements eines Requests und deren Dauer und gibt sie als Server-Timing-Header
+    zurück (sichtbar in den Browser-Entwicklertools). Wird dasselbe Statement öfter als
+    db_repeated_query_threshold-mal ausgeführt, wird eine Warnung ausgegeben (N+1-Verdacht).
+    Abfragen eines Streaming-Bodys (CSV-Export) laufen nach dem Header und fehlen darin.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_query_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.db_server_timing:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} SQL-Abfragen"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_query_stats.reset(token)
+            threshold = settings.db_repeated_query_threshold
+            if threshold > 0:
+                for shape, count in stats.repeated_shapes(threshold):
+                    logger.warning("Mögliche N+1-Abfrage: %s %s führt dasselbe Statement %dx aus: %s", scope["method"], scope["path"], count, shape[:300], extra={"path": scope["path"], "count": count})
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Zählt alle SQL-Statements innerhalb des Blocks (auch aus anderen Threads, z.B. TestClient)."""
+    stats = QueryStats(keep_statements=True)
+    with _query_trackers_lock:
+        _query_trackers.append(stats)
+    try:
+        yield stats
+    finally:
+        with _query_trackers_lock:
+            _query_trackers.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Test-Hilfe für Abfrage-Budgets je Endpunkt:
+
+        with assert_max_queries(4):
+            client.get("/dashboard/laptops")
+
+    Zählt alle Statements im Block (inkl. Hintergrund-Tasks wie dem Heartbeat-Flush).
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {statement[:200]}" for statement in stats.statements or [])
+        raise AssertionError(f"{stats.count} SQL-Abfragen statt höchstens {max_queries}:\n{statements}")
 
 Base = declarative_base()
 
-# Dependency für FastAPI, um eine DB-Session pro Request zu erhalten
-def get_db():
+# Dependencies für FastAPI, eine DB-Session pro Request. Schreibende Endpunkte und solche, die den
+# aktuellen Stand brauchen (Client-Polls), nutzen get_write_db; reine Lese-Endpunkte get_read_db
+def get_write_db() -> Iterator[Session]:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db() -> Iterator[Session]:
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependencies für async-Endpunkte
+async def get_async_write_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncReadSessionLocal() as db:
+        yield db
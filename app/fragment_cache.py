@@ -0,0 +1,83 @@
+# app/fragment_cache.py
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, Tuple, Union
+
+from app.config import settings
+from app.metrics import FRAGMENT_CACHE_EVICTIONS, FRAGMENT_CACHE_REQUESTS, FRAGMENT_CACHE_SIZE
+
+
+class FragmentCache:
+    """
+    Prozesslokaler LRU-Cache für gerenderte Tabellenzeilen der Dashboards.
+    Je (Template, Laptop-ID) wird nur die zuletzt gerenderte Zeile samt Zustandsschlüssel gehalten
+    (change_version, letzter Kontakt, Online-Status, grobes Zeitfenster für die "Stunden seit"-Werte);
+    passt der Schlüssel nicht mehr, wird die Zeile neu gerendert und ersetzt.
+    Der Speicher ist über die Summe der Zeilenlängen (Zeichen) auf max_chars begrenzt.
+    """
+
+    def __init__(self, max_chars: int, time_bucket_seconds: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[Hashable, str]]" = OrderedDict()
+        self.max_chars = max_chars
+        self.time_bucket_seconds = max(time_bucket_seconds, 1)
+        self.size_chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def time_bucket(self, now: datetime) -> int:
+        return int(now.timestamp() // self.time_bucket_seconds)
+
+    def get(self, template: str, laptop_id: int, state: Hashable) -> Union[str, None]:
+        key = (template, laptop_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != state:
+                self.misses += 1
+                FRAGMENT_CACHE_REQUESTS.inc(template, "miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        FRAGMENT_CACHE_REQUESTS.inc(template, "hit")
+        return entry[1]
+
+    def put(self, template: str, laptop_id: int, state: Hashable, html: str) -> None:
+        if self.max_chars <= 0 or len(html) > self.max_chars:
+            return
+        key = (template, laptop_id)
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_chars -= len(previous[1])
+            self._entries[key] = (state, html)
+            self.size_chars += len(html)
+            while self.size_chars > self.max_chars:
+                _, (_, old_html) = self._entries.popitem(last=False)
+                self.size_chars -= len(old_html)
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            FRAGMENT_CACHE_EVICTIONS.inc(amount=evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_chars = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_chars": self.size_chars,
+                "max_chars": self.max_chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+fragment_cache = FragmentCache(max_chars=settings.fragment_cache_max_chars, time_bucket_seconds=settings.fragment_cache_time_bucket_seconds)
+FRAGMENT_CACHE_SIZE.set_function(lambda: fragment_cache.size_chars)
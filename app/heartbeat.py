@@ -0,0 +1,163 @@
+# app/heartbeat.py
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Set, Tuple, Union
+
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+from app.notifications import dashboard_events
+from app.metrics import LAPTOPS, COMMANDS_PENDING
+
+logger = logging.getLogger(__name__)
+
+ONLINE_TIMEOUT = timedelta(minutes=5) # Wie in den Dashboards: Kontakt innerhalb der letzten 5 Minuten = online
+PRESENCE_CHECK_INTERVAL_SECONDS = 15
+
+
+class HeartbeatBuffer:
+    """
+    Sammelt Client-Kontakte (Polls) im Speicher, statt für jeden Poll eine eigene
+    Schreib-Transaktion auszuführen. Ein Hintergrund-Task schreibt den Puffer regelmäßig
+    gebündelt in die Datenbank (siehe flush_loop).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[datetime, Union[str, None]]] = {}
+        # Zuletzt bekannter Kontakt pro Laptop, damit Dashboards auch noch nicht geschriebene Polls sehen
+        self._recent: Dict[int, Tuple[datetime, Union[str, None]]] = {}
+
+    def record(self, laptop_id: int, client_version: Union[str, None] = None) -> None:
+        now_utc = datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._pending.get(laptop_id)
+            if client_version is None and previous is not None:
+                client_version = previous[1]
+            self._pending[laptop_id] = (now_utc, client_version)
+            recent_version = client_version
+            if recent_version is None and laptop_id in self._recent:
+                recent_version = self._recent[laptop_id][1]
+            self._recent[laptop_id] = (now_utc, recent_version)
+
+    def forget(self, laptop_id: int) -> None:
+        """Entfernt einen (z.B. gelöschten) Laptop aus dem Puffer."""
+        with self._lock:
+            self._pending.pop(laptop_id, None)
+            self._recent.pop(laptop_id, None)
+
+    def apply(self, laptop) -> None:
+        """Überträgt einen neueren gepufferten Kontakt auf ein geladenes Laptop-Objekt (nur zur Anzeige)."""
+        with self._lock:
+            recent = self._recent.get(laptop.id)
+        if recent is None:
+            return
+        contact_time, client_version = recent
+        db_contact = laptop.last_api_contact
+        if db_contact is not None and db_contact.tzinfo is None:
+            db_contact = db_contact.replace(tzinfo=timezone.utc)
+        if db_contact is None or db_contact < contact_time:
+            # Die Dashboards interpretieren naive Zeitstempel als UTC (wie aus SQLite gelesen)
+            laptop.last_api_contact = contact_time.replace(tzinfo=None)
+        if client_version:
+            laptop.client_version = client_version
+
+    def contacted_since(self, since: datetime) -> Set[int]:
+        """IDs aller Laptops, deren gepufferter Kontakt nach `since` liegt."""
+        with self._lock:
+            return {laptop_id for laptop_id, (contact_time, _) in self._recent.items() if contact_time >= since}
+
+    def flush(self) -> int:
+        """Schreibt alle gepufferten Kontakte mit einem UPDATE-Statement in die Datenbank."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        db = SessionLocal()
+        try:
+            return crud.flush_laptop_contacts(db, pending, online_timeout=ONLINE_TIMEOUT)
+        except Exception as e:
+            # Bei Fehlern nichts verlieren: Einträge zurücklegen, sofern nicht inzwischen neuere vorliegen
+            with self._lock:
+                for laptop_id, entry in pending.items():
+                    self._pending.setdefault(laptop_id, entry)
+            logger.warning("Heartbeat-Flush fehlgeschlagen (%d Kontakte, erneuter Versuch): %s", len(pending), e)
+            return 0
+        finally:
+            db.close()
+
+    def prune(self) -> None:
+        """Verwirft bereits geschriebene Kontakte, die älter als ein Flush-Intervall sind."""
+        now_utc = datetime.now(timezone.utc)
+        max_age = max(settings.heartbeat_flush_interval_seconds * 2, 60)
+        with self._lock:
+            stale = [laptop_id for laptop_id, (contact_time, _) in self._recent.items()
+                     if laptop_id not in self._pending and (now_utc - contact_time).total_seconds() > max_age]
+            for laptop_id in stale:
+                del self._recent[laptop_id]
+
+
+heartbeat_buffer = HeartbeatBuffer()
+
+
+async def flush_loop() -> None:
+    """Hintergrund-Task: schreibt den Heartbeat-Puffer periodisch (im Threadpool) in die Datenbank."""
+    try:
+        while True:
+            await asyncio.sleep(settings.heartbeat_flush_interval_seconds)
+            await asyncio.to_thread(heartbeat_buffer.flush)
+            heartbeat_buffer.prune()
+    finally:
+        # Beim Herunterfahren ausstehende Kontakte nicht verlieren
+        await asyncio.to_thread(heartbeat_buffer.flush)
+
+
+def _load_online_ids() -> Set[int]:
+    since = datetime.now(timezone.utc) - ONLINE_TIMEOUT
+    db = SessionLocal()
+    try:
+        online_ids = crud.get_laptop_ids_contacted_since(db, since)
+    finally:
+        db.close()
+    return online_ids | heartbeat_buffer.contacted_since(since)
+
+
+def update_fleet_gauges() -> None:
+    """Aktualisiert die Online/Offline- und Befehls-Gauges für /metrics (wird beim Abruf ausgeführt)."""
+    db = SessionLocal()
+    try:
+        total = crud.count_laptops(db)
+        pending_commands = crud.count_pending_commands(db)
+    finally:
+        db.close()
+    online = len(_load_online_ids())
+    LAPTOPS.set(online, "online")
+    LAPTOPS.set(max(total - online, 0), "offline")
+    COMMANDS_PENDING.set(pending_commands)
+
+
+async def presence_loop() -> None:
+    """
+    Hintergrund-Task: erkennt Online/Offline-Wechsel und meldet sie an geöffnete Dashboards.
+    Ohne verbundene Dashboards wird die Datenbank nicht abgefragt.
+    """
+    online_ids: Union[Set[int], None] = None
+    while True:
+        await asyncio.sleep(PRESENCE_CHECK_INTERVAL_SECONDS)
+        if not dashboard_events.has_subscribers():
+            online_ids = None
+            continue
+        try:
+            current_ids = await asyncio.to_thread(_load_online_ids)
+        except Exception as e:
+            # z.B. "database is locked": im nächsten Durchgang erneut versuchen, Vergleichsbasis behalten
+            logger.warning("Online-Status konnte nicht geladen werden (erneuter Versuch): %s", e)
+            continue
+        if online_ids is not None:
+            changed_ids = online_ids ^ current_ids
+            if changed_ids:
+                # Jeder Worker erkennt Wechsel für seine eigenen Dashboards
+                dashboard_events.publish("presence", changed_ids, local_only=True)
+        online_ids = current_ids
@@ -0,0 +1,70 @@
+# app/identity_cache.py
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Union
+
+from app.config import settings
+
+
+class IdentifierCache:
+    """
+    Prozesslokaler LRU-Cache für die Zuordnung Hostname/Alias -> Laptop-ID.
+    Clients melden sich bei jedem Poll und Report mit ihrer Kennung; damit muss die
+    OR-Abfrage über hostname und alias_name nur beim ersten Kontakt ausgeführt werden.
+    Einträge werden beim Anlegen und Löschen von Laptops explizit invalidiert (siehe crud);
+    mit mehreren Workern reicht `forward` die Invalidierung an die anderen Prozesse weiter (app/cluster.py).
+    """
+
+    def __init__(self, max_size: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.forward: Union[Callable[[List[str], Union[int, None]], None], None] = None
+
+    def get(self, identifier: str) -> Union[int, None]:
+        with self._lock:
+            laptop_id = self._entries.get(identifier)
+            if laptop_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(identifier)
+            self.hits += 1
+            return laptop_id
+
+    def put(self, identifier: str, laptop_id: int) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[identifier] = laptop_id
+            self._entries.move_to_end(identifier)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *identifiers: Union[str, None], local_only: bool = False) -> None:
+        if not local_only and self.forward is not None:
+            self.forward([identifier for identifier in identifiers if identifier is not None], None)
+        with self._lock:
+            for identifier in identifiers:
+                if identifier is not None:
+                    self._entries.pop(identifier, None)
+
+    def invalidate_laptop(self, laptop_id: int, local_only: bool = False) -> None:
+        """Entfernt alle Kennungen, die auf die angegebene Laptop-ID zeigen."""
+        if not local_only and self.forward is not None:
+            self.forward([], laptop_id)
+        with self._lock:
+            for identifier in [k for k, v in self._entries.items() if v == laptop_id]:
+                del self._entries[identifier]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+identifier_cache = IdentifierCache(max_size=settings.identifier_cache_size)
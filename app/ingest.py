@@ -0,0 +1,137 @@
+# app/ingest.py
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Tuple, Union
+
+from app import crud_async, models, schemas
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.notifications import dashboard_events
+from app.metrics import INGEST_QUEUE_DEPTH, INGEST_BATCH_SIZE, INGEST_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Die Warteschlange ist voll; der Client soll es nach Retry-After erneut versuchen."""
+
+
+# (laptop_id, Payload, Eingangszeit, Future für das Ergebnis)
+IngestItem = Tuple[int, schemas.ScanReportCreate, datetime, "asyncio.Future[Union[models.ScanReport, None]]"]
+
+
+class ReportIngestQueue:
+    """
+    Begrenzte Warteschlange für eingehende Scan-Berichte. Ein Hintergrund-Task (writer_loop)
+    sammelt die Berichte und schreibt sie gebündelt in einer Transaktion (Group Commit),
+    statt pro Bericht einen eigenen Commit auszuführen. Der Request wartet auf das Ergebnis
+    seines Berichts, die Antwort bleibt also unverändert.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, max_wait_seconds: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: Union[asyncio.Queue, None] = None
+        self._collecting: List[IngestItem] = [] # bereits entnommen, aber noch nicht geschrieben
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Erst im laufenden Event-Loop anlegen (nicht beim Import)
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    def pending_count(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, laptop_id: int, report_payload: schemas.ScanReportCreate) -> Union[models.ScanReport, None]:
+        """Reiht einen Bericht ein und wartet, bis er gespeichert ist. Wirft IngestQueueFull bei Überlast."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((laptop_id, report_payload, datetime.now(timezone.utc), future))
+        except asyncio.QueueFull:
+            INGEST_REJECTED.inc()
+            raise IngestQueueFull()
+        return await future
+
+    async def _collect_batch(self) -> List[IngestItem]:
+        """Wartet auf den ersten Bericht und sammelt dann kurz weitere ein (max. batch_size)."""
+        batch = self._collecting = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_seconds
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    def _drain(self) -> List[IngestItem]:
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return items
+
+    async def write_batch(self, batch: List[IngestItem]) -> None:
+        """
+        Schreibt einen Batch in einer Transaktion. Schlägt das fehl, werden die Berichte einzeln
+        geschrieben, damit ein fehlerhafter Bericht nicht die übrigen mitreißt.
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                results = await crud_async.create_scan_reports_batch(db, [item[:3] for item in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _set_exception(batch[0][3], e)
+                return
+            logger.warning("Batch mit %d Berichten fehlgeschlagen, schreibe einzeln: %s", len(batch), e)
+            for item in batch:
+                await self.write_batch([item])
+            return
+
+        for item, result in zip(batch, results):
+            if not item[3].done():
+                item[3].set_result(result)
+        laptop_ids = {result.laptop_id for result in results if result is not None}
+        if laptop_ids:
+            dashboard_events.publish("report", laptop_ids)
+
+    async def writer_loop(self) -> None:
+        """Hintergrund-Task: schreibt eingehende Berichte gebündelt in die Datenbank."""
+        try:
+            while True:
+                batch = await self._collect_batch()
+                INGEST_BATCH_SIZE.observe(len(batch))
+                await self.write_batch(batch)
+        finally:
+            # Beim Herunterfahren bereits angenommene Berichte noch speichern
+            remaining = self._collecting + self._drain()
+            self._collecting = []
+            for start in range(0, len(remaining), self.batch_size):
+                await self.write_batch(remaining[start:start + self.batch_size])
+
+
+def _set_exception(future: asyncio.Future, exc: Exception) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+report_ingest_queue = ReportIngestQueue(
+    max_size=settings.ingest_queue_size,
+    batch_size=settings.ingest_batch_size,
+    max_wait_seconds=settings.ingest_batch_max_wait_seconds,
+)
+INGEST_QUEUE_DEPTH.set_function(report_ingest_queue.pending_count)
@@ -0,0 +1,267 @@
+# app/metrics.py
+"""
+Schlanke Metriken im Prometheus-Textformat (GET /metrics) ohne zusätzliche Abhängigkeit.
+Zähler und Histogramme werden im Prozess gehalten; Werte, die erst beim Abruf bestimmt werden
+(z.B. Warteschlangenlänge), werden als Gauge mit Callback registriert.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Standard-Buckets von Prometheus, ergänzt um lange Requests (Long-Poll bis 120 s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labelvalues: Sequence[str]) -> LabelValues:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name}: erwartet Labels {self.labelnames}, erhalten {labelvalues}")
+        return tuple(str(value) for value in labelvalues)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Union[Callable[[], float], None] = None
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Wert wird erst beim Abruf von /metrics bestimmt (nur ohne Labels)."""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # je Label-Kombination: [Anzahl je Bucket (nicht kumuliert)..., Summe, Anzahl]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(entry)) for key, entry in self._values.items())
+        lines = []
+        for key, entry in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(entry[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# === Metriken ===
+
+HTTP_REQUESTS = Counter("scanop_http_requests_total", "Anzahl HTTP-Requests je Route und Statuscode.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram("scanop_http_request_duration_seconds", "Dauer der HTTP-Requests je Route (bis zum letzten Byte der Antwort).", ("method", "route"))
+HTTP_REQUESTS_IN_PROGRESS = Gauge("scanop_http_requests_in_progress", "Aktuell laufende HTTP-Requests.")
+
+DB_QUERY_DURATION = Histogram("scanop_db_query_duration_seconds", "Dauer einzelner SQL-Statements.", ("engine",), buckets=DB_BUCKETS)
+DB_QUERY_ERRORS = Counter("scanop_db_query_errors_total", "Fehlgeschlagene SQL-Statements.", ("engine",))
+DB_TRANSACTION_DURATION = Histogram("scanop_db_session_transaction_duration_seconds", "Dauer der Session-Transaktionen (erstes Statement bis Commit/Rollback).", buckets=DB_BUCKETS)
+
+REPORTS_INGESTED = Counter("scanop_reports_ingested_total", "Gespeicherte Scan-Berichte nach Ergebnis (ok, error, threat).", ("result",))
+INGEST_QUEUE_DEPTH = Gauge("scanop_ingest_queue_depth", "Berichte in der Ingest-Warteschlange, die noch nicht geschrieben sind.")
+INGEST_BATCH_SIZE = Histogram("scanop_ingest_batch_size", "Anzahl Berichte je Group-Commit.", buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500, 1000))
+INGEST_REJECTED = Counter("scanop_ingest_rejected_total", "Wegen voller Warteschlange abgewiesene Berichte (503).")
+
+COMMANDS_PENDING = Gauge("scanop_commands_pending", "Laptops mit ausstehendem Befehl.")
+LONG_POLL_WAITERS = Gauge("scanop_long_poll_waiters", "Wartende Long-Poll-Requests der Clients.")
+LAPTOPS = Gauge("scanop_laptops", "Laptops nach Online-Status (Kontakt in den letzten 5 Minuten).", ("state",))
+
+FRAGMENT_CACHE_REQUESTS = Counter("scanop_fragment_cache_requests_total", "Abfragen des Zeilen-Caches der Dashboards je Template (hit, miss).", ("template", "result"))
+FRAGMENT_CACHE_EVICTIONS = Counter("scanop_fragment_cache_evictions_total", "Wegen der Speichergrenze verdrängte Tabellenzeilen.")
+FRAGMENT_CACHE_SIZE = Gauge("scanop_fragment_cache_size_chars", "Gesamtlänge der zwischengespeicherten Tabellenzeilen (Zeichen).")
+RESPONSE_CACHE_REQUESTS = Counter("scanop_response_cache_requests_total", "Abfragen des Antwort-Caches der Dashboards (hit, miss, coalesced = auf laufende Erzeugung gewartet).", ("cache", "result"))
+
+RETENTION_PENDING_REPORTS = Gauge("scanop_retention_pending_reports", "Berichte vor dem Stichtag, die der laufende Verdichtungs-Durchgang noch zusammenfassen muss.")
+RETENTION_REPORTS_ROLLED_UP = Counter("scanop_retention_reports_rolled_up_total", "Zu Tageszusammenfassungen verdichtete und gelöschte Scan-Berichte.")
+RETENTION_ROLLUPS_WRITTEN = Counter("scanop_retention_rollups_written_total", "Geschriebene bzw. aktualisierte Tageszusammenfassungen.")
+RETENTION_BATCHES = Counter("scanop_retention_batches_total", "Verarbeitete Blöcke der Verdichtung.")
+RETENTION_ERRORS = Counter("scanop_retention_errors_total", "Fehlgeschlagene Verdichtungs-Durchgänge.")
+RETENTION_LAST_RUN_DURATION = Gauge("scanop_retention_last_run_duration_seconds", "Dauer des letzten abgeschlossenen Verdichtungs-Durchgangs.")
+
+
+def record_ingested_reports(statuses: Iterable) -> None:
+    """Zählt gespeicherte Berichte je Einordnung (ScanStatus oder None)."""
+    counts: Dict[str, int] = {}
+    for scan_status in statuses:
+        result = getattr(scan_status, "value", scan_status) or "ok"
+        counts[result] = counts.get(result, 0) + 1
+    for result, count in counts.items():
+        REPORTS_INGESTED.inc(result, amount=count)
+
+
+# === Datenbank ===
+
+def instrument_sessions(session_class) -> None:
+    """Misst die Dauer der äußeren Transaktion jeder Session (gilt auch für AsyncSession)."""
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, "after_begin")
+    def _after_begin(session, transaction, connection):
+        session.info.setdefault("metrics_transaction_start", time.perf_counter())
+
+    @event.listens_for(session_class, "after_transaction_end")
+    def _after_transaction_end(session, transaction):
+        if transaction.parent is None:
+            started = session.info.pop("metrics_transaction_start", None)
+            if started is not None:
+                DB_TRANSACTION_DURATION.observe(time.perf_counter() - started)
+
+
+# === HTTP ===
+
+def _route_label(scope: Scope) -> str:
+    """Routen-Template statt konkretem Pfad (begrenzt die Anzahl der Label-Werte)."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("root_path", "") != scope.get("metrics_root_path", ""):
+        return scope["root_path"] + "/*" # gemountete Apps, z.B. /assets
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Zählt Requests je Route und Statuscode und misst ihre Dauer bis zum Ende der Antwort."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope["metrics_root_path"] = scope.get("root_path", "")
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = _route_label(scope)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route)
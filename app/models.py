@@ -1,9 +1,17 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text
+import enum
+
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, Float, String, DateTime, Date, Text, Index, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # Für Default-Zeitstempel
 
 from .database import Base # Importiert Base von unserer database.py
 
+class ScanStatus(str, enum.Enum):
+    """Normalisierter Status eines Scan-Ergebnisses, wird beim Eingang des Berichts bestimmt."""
+    OK = "ok"
+    ERROR = "error"   # Fehler / Abbruch (z.B. Event 1002)
+    THREAT = "threat" # echte Bedrohung gefunden
+
 class Laptop(Base):
     __tablename__ = "laptops"
 
@@ -12,13 +20,18 @@ class Laptop(Base):
     alias_name = Column(String, unique=True, index=True, nullable=False) # Alias muss auch eindeutig sein
     
     first_seen = Column(DateTime(timezone=True), server_default=func.now())
-    last_api_contact = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True) # Zeit des letzten API-Kontakts (Polling oder Report)
+    last_api_contact = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True, index=True) # Zeit des letzten API-Kontakts (Polling oder Report)
     
     last_scan_time = Column(DateTime(timezone=True), nullable=True) # Wann der Scan auf dem Client lief
     last_scan_type = Column(String, nullable=True)
     last_scan_result_message = Column(Text, nullable=True)
     last_scan_threats_found = Column(Boolean, nullable=True)
     last_scan_duration_minutes = Column(Integer, nullable=True)
+    # Einordnung des letzten Scans (siehe scan_classification.py), beim Speichern des Berichts gesetzt
+    last_scan_clean_message = Column(Text, nullable=True)
+    last_scan_is_error = Column(Boolean, nullable=True)
+    last_scan_is_real_threat = Column(Boolean, nullable=True)
+    last_scan_status = Column(Enum(ScanStatus, native_enum=False, length=16, values_callable=lambda e: [m.value for m in e]), nullable=True, index=True)
 
     pending_command = Column(String, nullable=True)
     pending_scan_type = Column(String, nullable=True)
@@ -27,13 +40,28 @@ class Laptop(Base):
     
     client_version = Column(String, nullable=True)
 
+    # Wert der globalen Änderungsversion (FleetState) bei der letzten Änderung dieses Laptops,
+    # für inkrementelle Dashboard-Aktualisierungen
+    change_version = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+
     # Beziehung zu ScanReports
     # 'back_populates' muss auf den Namen der Beziehung in ScanReport zeigen
     scan_reports = relationship("ScanReport", back_populates="laptop", cascade="all, delete-orphan")
+    scan_report_rollups = relationship("ScanReportRollup", back_populates="laptop", cascade="all, delete-orphan")
+    fleet_day_snapshots = relationship("FleetDaySnapshot", back_populates="laptop", cascade="all, delete-orphan")
 
 
 class ScanReport(Base):
     __tablename__ = "scan_reports"
+    __table_args__ = (
+        # Für "letzter Bericht je Laptop bis Zeitpunkt X" (Tagesbericht, CSV-Export)
+        Index("ix_scan_reports_laptop_id_client_scan_time", "laptop_id", "client_scan_time"),
+        # Keyset-Pagination der Berichts-API (neueste zuerst, optional nach Status gefiltert)
+        Index("ix_scan_reports_report_time_on_server_id", "report_time_on_server", "id"),
+        Index("ix_scan_reports_scan_status_report_time_on_server_id", "scan_status", "report_time_on_server", "id"),
+        # Aufbewahrung: älteste Berichte vor dem Stichtag blockweise verdichten
+        Index("ix_scan_reports_client_scan_time_id", "client_scan_time", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     laptop_id = Column(Integer, ForeignKey("laptops.id"), nullable=False) # Fremdschlüssel zu laptops.id
@@ -47,6 +75,145 @@ class ScanReport(Base):
     # Details zu gefundenen Bedrohungen, falls vorhanden (kann JSON als String sein oder eine separate Tabelle)
     threat_details = Column(Text, nullable=True)
 
+    # Beim Eingang bestimmte Einordnung, damit Dashboards und Export nicht jede Meldung neu auswerten
+    clean_result_message = Column(Text, nullable=True) # Meldung ohne Pseudo-Lokalisierungs-Tokens
+    is_error = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
+    is_real_threat = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
+    scan_status = Column(Enum(ScanStatus, native_enum=False, length=16, values_callable=lambda e: [m.value for m in e]), nullable=True, index=True)
+
     # Beziehung zu Laptop
     # 'back_populates' muss auf den Namen der Beziehung in Laptop zeigen
-    laptop = relationship("Laptop", back_populates="scan_reports")
\ No newline at end of file
+    laptop = relationship("Laptop", back_populates="scan_reports")
+
+
+class ScanReportRollup(Base):
+    """
+    Tageszusammenfassung der Scan-Berichte eines Laptops (UTC-Tag der client_scan_time).
+    Berichte älter als die Aufbewahrungsfrist werden hierin verdichtet und gelöscht (siehe retention.py).
+    Die Ergebnis-Spalten heißen wie in ScanReport und enthalten den letzten Bericht des Tages,
+    damit Tagesbericht und CSV-Export Zusammenfassungen wie Berichte behandeln können.
+    """
+    __tablename__ = "scan_report_rollups"
+    __table_args__ = (
+        UniqueConstraint("laptop_id", "day", name="uq_scan_report_rollups_laptop_id_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    laptop_id = Column(Integer, ForeignKey("laptops.id"), nullable=False)
+    day = Column(Date, nullable=False, index=True)
+
+    report_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    threat_count = Column(Integer, nullable=False, default=0)
+    # Größte Zeitspanne zwischen Scan auf dem Client und Eingang beim Server (wie last_scan_duration_minutes)
+    max_duration_minutes = Column(Integer, nullable=True)
+
+    # Letzter Bericht des Tages
+    client_scan_time = Column(DateTime(timezone=True), nullable=False)
+    scan_type = Column(String, nullable=False)
+    scan_result_message = Column(Text, nullable=False)
+    threats_found = Column(Boolean, nullable=False, default=False)
+    threat_details = Column(Text, nullable=True)
+    clean_result_message = Column(Text, nullable=True)
+    is_error = Column(Boolean, nullable=False, default=False)
+    is_real_threat = Column(Boolean, nullable=False, default=False)
+    scan_status = Column(Enum(ScanStatus, native_enum=False, length=16, values_callable=lambda e: [m.value for m in e]), nullable=True)
+
+    laptop = relationship("Laptop", back_populates="scan_report_rollups")
+
+
+class FleetDaySnapshot(Base):
+    """
+    Zustand eines Laptops am Ende eines (abgeschlossenen) UTC-Tages: sein letzter Scan bis
+    Tagesende, bereits eingeordnet. Historische Tagesberichte lesen eine Zeile je Laptop statt
+    den Zustand aus allen Berichten neu zu berechnen (siehe snapshots.py). Laptops ohne Scan
+    bis zu diesem Tag haben keine Zeile. Ergebnis-Spalten wie in ScanReport.
+    """
+    __tablename__ = "fleet_day_snapshots"
+    __table_args__ = (
+        UniqueConstraint("day", "laptop_id", name="uq_fleet_day_snapshots_day_laptop_id"),
+        # Nachträglich eingegangene Berichte: alle Tage eines Laptops ab dem Scan-Tag
+        Index("ix_fleet_day_snapshots_laptop_id_day", "laptop_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    laptop_id = Column(Integer, ForeignKey("laptops.id"), nullable=False)
+
+    client_scan_time = Column(DateTime(timezone=True), nullable=False)
+    scan_type = Column(String, nullable=False)
+    scan_result_message = Column(Text, nullable=False)
+    threats_found = Column(Boolean, nullable=False, default=False)
+    threat_details = Column(Text, nullable=True)
+    clean_result_message = Column(Text, nullable=True)
+    is_error = Column(Boolean, nullable=False, default=False)
+    is_real_threat = Column(Boolean, nullable=False, default=False)
+    scan_status = Column(Enum(ScanStatus, native_enum=False, length=16, values_callable=lambda e: [m.value for m in e]), nullable=True)
+
+    laptop = relationship("Laptop", back_populates="fleet_day_snapshots")
+
+
+class FleetSnapshotDay(Base):
+    """Tage, deren Snapshot vollständig aufgebaut ist (nur diese werden für Tagesberichte gelesen)."""
+    __tablename__ = "fleet_snapshot_days"
+
+    day = Column(Date, primary_key=True)
+    built_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class FleetState(Base):
+    """Einzeilige Tabelle mit der globalen, monoton steigenden Änderungsversion aller Laptops."""
+    __tablename__ = "fleet_state"
+
+    id = Column(Integer, primary_key=True)
+    change_version = Column(Integer, nullable=False, default=0)
+
+
+class ClusterEvent(Base):
+    """
+    Änderungsfolge für den Betrieb mit mehreren Worker-Prozessen (siehe app/cluster.py): Jeder Worker
+    schreibt hier Ereignisse, die auch die anderen Prozesse betreffen (Befehl gesetzt, Dashboard-Event,
+    Laptop-Kennung geändert), und liest die neuen Einträge der anderen per aufsteigender ID.
+    """
+    __tablename__ = "cluster_events"
+    # AUTOINCREMENT: IDs werden nach dem Aufräumen alter Einträge nie wiederverwendet
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    origin = Column(String, nullable=False) # Worker, der das Ereignis geschrieben hat
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=True) # JSON
+
+
+class ClusterLease(Base):
+    """Zeitlich begrenzte Zuständigkeit eines Workers, z.B. für die Hintergrund-Jobs (Verdichtung, Snapshots)."""
+    __tablename__ = "cluster_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class RetentionStatus(Base):
+    """
+    Einzeilige Tabelle mit dem Fortschritt der Verdichtung alter Berichte (app/retention.py). Der Job läuft
+    nur in einem Worker; so liefert GET /scanreports/retention in jedem Worker denselben Stand.
+    """
+    __tablename__ = "retention_status"
+
+    id = Column(Integer, primary_key=True)
+    running = Column(Boolean, nullable=False, default=False)
+    runs = Column(Integer, nullable=False, default=0)
+    last_run_started = Column(DateTime(timezone=True), nullable=True)
+    last_run_finished = Column(DateTime(timezone=True), nullable=True)
+    last_run_duration_seconds = Column(Float, nullable=True)
+    last_cutoff = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Fortschritt des aktuellen (bzw. letzten) Laufs
+    pending_reports = Column(Integer, nullable=False, default=0)
+    run_reports_processed = Column(Integer, nullable=False, default=0)
+    # Summen über alle Läufe
+    reports_rolled_up_total = Column(Integer, nullable=False, default=0)
+    rollups_written_total = Column(Integer, nullable=False, default=0)
+    batches_total = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,128 @@
+# app/notifications.py
+import asyncio
+import json
+from typing import Callable, Dict, Iterable, List, Set, Union
+
+from app.metrics import LONG_POLL_WAITERS
+
+
+class CommandNotifier:
+    """
+    Registry für wartende Long-Poll-Requests der Clients.
+    Wird ein Befehl gesetzt, werden die Waiter des betroffenen Laptops direkt geweckt,
+    statt dass sie die Datenbank periodisch erneut abfragen.
+    notify() darf auch aus Threadpool-Threads (synchrone Endpoints) aufgerufen werden.
+    Mit mehreren Workern reicht `forward` die Benachrichtigung an die anderen Prozesse weiter (app/cluster.py).
+    """
+
+    def __init__(self):
+        self._waiters: Dict[int, Set[asyncio.Event]] = {}
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self.forward: Union[Callable[[Union[int, None]], None], None] = None
+
+    def subscribe(self, laptop_id: int) -> asyncio.Event:
+        """Registriert einen Waiter; muss im Event-Loop aufgerufen werden."""
+        self._loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        self._waiters.setdefault(laptop_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, laptop_id: int, event: asyncio.Event) -> None:
+        waiters = self._waiters.get(laptop_id)
+        if waiters is None:
+            return
+        waiters.discard(event)
+        if not waiters:
+            del self._waiters[laptop_id]
+
+    def waiting_count(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def notify(self, laptop_id: Union[int, None] = None, local_only: bool = False) -> None:
+        """Weckt die Waiter eines Laptops, bzw. aller Laptops bei laptop_id=None."""
+        if not local_only and self.forward is not None:
+            self.forward(laptop_id)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self._wake(laptop_id)
+        else:
+            loop.call_soon_threadsafe(self._wake, laptop_id)
+
+    def _wake(self, laptop_id: Union[int, None]) -> None:
+        if laptop_id is None:
+            targets = [event for waiters in self._waiters.values() for event in waiters]
+        else:
+            targets = list(self._waiters.get(laptop_id, ()))
+        for event in targets:
+            event.set()
+
+
+command_notifier = CommandNotifier()
+LONG_POLL_WAITERS.set_function(command_notifier.waiting_count)
+
+
+class DashboardEventBroadcaster:
+    """
+    Verteilt Änderungs-Events (neue Reports, Befehle, Online/Offline, Laptops) an alle
+    geöffneten Dashboards über Server-Sent Events. Jeder Abonnent erhält eine eigene
+    begrenzte Queue; läuft sie über, bekommt er ein "resync"-Event und lädt die Tabelle neu.
+    publish() darf auch aus Threadpool-Threads aufgerufen werden; `forward` wie bei CommandNotifier.
+    """
+
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self.forward: Union[Callable[[str, Union[List[int], None]], None], None] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, event_type: str, laptop_ids: Union[Iterable[int], None] = None, local_only: bool = False) -> None:
+        """Sendet ein Event für die angegebenen Laptops, bzw. für alle bei laptop_ids=None."""
+        data = {"all": True} if laptop_ids is None else {"laptop_ids": sorted(set(laptop_ids))}
+        if "laptop_ids" in data and not data["laptop_ids"]:
+            return
+        if not local_only and self.forward is not None:
+            self.forward(event_type, data.get("laptop_ids"))
+        loop = self._loop
+        if not self._subscribers or loop is None or loop.is_closed():
+            return
+        message = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self._dispatch(message)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _dispatch(self, message: str) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Zu langsamer Client: Queue leeren und vollständiges Neuladen anfordern
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait("event: resync\ndata: {}\n\n")
+
+
+dashboard_events = DashboardEventBroadcaster()
@@ -0,0 +1,43 @@
+# app/pagination.py
+"""
+Opake Cursor für Keyset-Pagination der Listen-APIs. Ein Cursor kodiert den Sortierschlüssel
+und die ID des letzten gelieferten Eintrags; die nächste Seite setzt direkt dahinter an,
+statt wie mit offset alle vorherigen Zeilen erneut zu überspringen.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence, Union
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> List[Any]:
+    """Dekodiert einen Cursor in Werte der angegebenen Typen (datetime oder int); ungültig -> 400."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError("falsche Anzahl Werte")
+        return [datetime.fromisoformat(value) if value_type is datetime else value_type(value) for value, value_type in zip(raw, types)]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ungültiger Cursor: {e}")
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int, *key_attributes: str) -> Union[str, None]:
+    """
+    Setzt den Cursor für die nächste Seite als Header, wenn die Seite voll ist
+    (eine volle letzte Seite liefert beim nächsten Aufruf eine leere Liste).
+    """
+    if limit <= 0 or len(items) < limit:
+        return None
+    last_item = items[-1]
+    next_cursor = encode_cursor(*(getattr(last_item, attribute) for attribute in key_attributes))
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return next_cursor
@@ -0,0 +1,93 @@
+# app/response_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.config import settings
+from app.metrics import RESPONSE_CACHE_REQUESTS
+
+MAX_ENTRIES = 256
+
+
+class _BuildCancelled(Exception):
+    """Die laufende Erzeugung wurde abgebrochen; wartende Aufrufer versuchen es erneut."""
+
+
+class FleetVersionCache:
+    """
+    Prozesslokaler Cache für Dashboard-Antworten. Ein Eintrag gilt, solange die globale
+    Änderungsversion (crud.bump_fleet_version, in der DB und damit für alle Worker gleich) unverändert
+    ist und höchstens ttl_seconds lang – zeitabhängige Werte (Online-Status, "zuletzt gesehen",
+    Stunden seit dem letzten Scan) ändern sich auch ohne Schreibvorgang.
+    Gleichzeitige Fehlschläge für denselben Schlüssel werden zusammengefasst (Single-Flight):
+    nur ein Aufrufer erzeugt die Antwort, die anderen warten auf sein Ergebnis.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        # Schlüssel -> (Version, Ablaufzeitpunkt, Wert)
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        # Schlüssel -> (Version, Future der laufenden Erzeugung)
+        self._in_flight: Dict[Hashable, Tuple[int, asyncio.Future]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_build(self, name: str, key: Hashable, version: int, build: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl_seconds <= 0:
+            return await build()
+        key = (name, key)
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                RESPONSE_CACHE_REQUESTS.inc(name, "hit")
+                return entry[2]
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None or in_flight[0] != version:
+                return await self._build(name, key, version, build)
+            self.coalesced += 1
+            RESPONSE_CACHE_REQUESTS.inc(name, "coalesced")
+            try:
+                # shield: bricht ein wartender Request ab, läuft die Erzeugung für die anderen weiter
+                return await asyncio.shield(in_flight[1])
+            except _BuildCancelled:
+                continue # der erzeugende Request wurde abgebrochen -> erneut versuchen bzw. selbst erzeugen
+
+    async def _build(self, name: str, key: Hashable, version: int, build: Callable[[], Awaitable[Any]]) -> Any:
+        self.misses += 1
+        RESPONSE_CACHE_REQUESTS.inc(name, "miss")
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (version, future)
+        try:
+            value = await build()
+        except asyncio.CancelledError:
+            # Wartende nicht mit abbrechen, sondern neu erzeugen lassen
+            future.set_exception(_BuildCancelled())
+            future.exception() # als abgerufen markieren, falls niemand wartet
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key, (None, None))[1] is future:
+                del self._in_flight[key]
+        future.set_result(value)
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "in_flight": len(self._in_flight), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+dashboard_cache = FleetVersionCache(ttl_seconds=settings.dashboard_cache_ttl_seconds)
@@ -0,0 +1,155 @@
+# app/retention.py
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Union
+
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import (
+    RETENTION_BATCHES, RETENTION_ERRORS, RETENTION_LAST_RUN_DURATION, RETENTION_PENDING_REPORTS,
+    RETENTION_REPORTS_ROLLED_UP, RETENTION_ROLLUPS_WRITTEN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def retention_cutoff(now: datetime, retention_days: int) -> datetime:
+    """Stichtag (UTC-Mitternacht): Berichte davor werden verdichtet, nur ganze Tage."""
+    cutoff_day = (now.astimezone(timezone.utc) - timedelta(days=retention_days)).date()
+    return datetime(cutoff_day.year, cutoff_day.month, cutoff_day.day, tzinfo=timezone.utc)
+
+
+# Felder des Fortschritts, die in der Tabelle retention_status stehen
+STATUS_FIELDS = (
+    "running", "runs", "last_run_started", "last_run_finished", "last_run_duration_seconds", "last_cutoff",
+    "last_error", "pending_reports", "run_reports_processed", "reports_rolled_up_total", "rollups_written_total",
+    "batches_total",
+)
+
+
+class RetentionJob:
+    """
+    Verdichtet Scan-Berichte älter als report_retention_days zu Tageszusammenfassungen
+    (scan_report_rollups) und löscht sie blockweise. Tagesbericht und CSV-Export lesen für diese
+    Tage die Zusammenfassungen (crud.get_latest_scan_results_before, crud.iter_scan_results_in_range).
+    Der Job läuft nur im zuständigen Worker (cluster.py); der Fortschritt wird deshalb nach jedem Block
+    in retention_status gespeichert (GET /api/v1/scanreports/retention, siehe retention_status())
+    und als scanop_retention_* unter /metrics gezählt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.running = False
+        self.runs = 0
+        self.last_run_started: Union[datetime, None] = None
+        self.last_run_finished: Union[datetime, None] = None
+        self.last_run_duration_seconds: Union[float, None] = None
+        self.last_cutoff: Union[datetime, None] = None
+        self.last_error: Union[str, None] = None
+        # Fortschritt des aktuellen (bzw. letzten) Laufs
+        self.pending_reports = 0
+        self.run_reports_processed = 0
+        # Summen über alle Läufe (beim Start eines Durchgangs aus retention_status übernommen)
+        self.reports_rolled_up_total = 0
+        self.rollups_written_total = 0
+        self.batches_total = 0
+
+    def stop(self) -> None:
+        """Bricht einen laufenden Durchgang nach dem aktuellen Batch ab."""
+        self._stop.set()
+
+    def _load(self, db) -> None:
+        """Übernimmt Zähler und Summen aus der DB (der vorherige Lauf kann in einem anderen Worker stattgefunden haben)."""
+        status = crud.get_retention_status(db)
+        if status is not None:
+            self.runs = status.runs
+            self.reports_rolled_up_total = status.reports_rolled_up_total
+            self.rollups_written_total = status.rollups_written_total
+            self.batches_total = status.batches_total
+
+    def _save(self, db) -> None:
+        RETENTION_PENDING_REPORTS.set(self.pending_reports)
+        try:
+            crud.save_retention_status(db, {field: getattr(self, field) for field in STATUS_FIELDS})
+        except Exception:
+            db.rollback()
+            logger.exception("Fortschritt der Verdichtung konnte nicht gespeichert werden")
+
+    def run_once(self, now: Union[datetime, None] = None) -> int:
+        """Ein Durchgang bis keine Berichte vor dem Stichtag mehr übrig sind. Rückgabe: verdichtete Berichte."""
+        if settings.report_retention_days <= 0:
+            return 0
+        if not self._lock.acquire(blocking=False):
+            return 0 # läuft bereits
+        started = time.monotonic()
+        cutoff = retention_cutoff(now or datetime.now(timezone.utc), settings.report_retention_days)
+        db = SessionLocal()
+        try:
+            self._load(db)
+            self.running = True
+            self.runs += 1
+            self.last_run_started = datetime.now(timezone.utc)
+            self.last_cutoff = cutoff
+            self.last_error = None
+            self.run_reports_processed = 0
+            self.pending_reports = crud.count_scan_reports_before(db, cutoff)
+            self._save(db)
+            while not self._stop.is_set():
+                processed, rollups = crud.rollup_scan_reports_before(db, cutoff, settings.retention_batch_size)
+                if not processed:
+                    break
+                self.run_reports_processed += processed
+                self.pending_reports = max(self.pending_reports - processed, 0)
+                self.reports_rolled_up_total += processed
+                self.rollups_written_total += rollups
+                self.batches_total += 1
+                RETENTION_REPORTS_ROLLED_UP.inc(amount=processed)
+                RETENTION_ROLLUPS_WRITTEN.inc(amount=rollups)
+                RETENTION_BATCHES.inc()
+                self._save(db)
+                if settings.retention_batch_pause_seconds > 0:
+                    time.sleep(settings.retention_batch_pause_seconds)
+        except Exception as e:
+            db.rollback()
+            self.last_error = str(e)
+            RETENTION_ERRORS.inc()
+            logger.exception("Verdichtung alter Scan-Berichte fehlgeschlagen")
+        finally:
+            self.running = False
+            self.last_run_finished = datetime.now(timezone.utc)
+            self.last_run_duration_seconds = round(time.monotonic() - started, 3)
+            RETENTION_LAST_RUN_DURATION.set(self.last_run_duration_seconds)
+            self._save(db)
+            db.close()
+            self._lock.release()
+        return self.run_reports_processed
+
+
+def retention_status(db) -> dict:
+    """Fortschritt der Verdichtung aus retention_status – unabhängig davon, welcher Worker den Job ausführt."""
+    status = crud.get_retention_status(db)
+    values = {field: getattr(status, field) if status is not None else None for field in STATUS_FIELDS}
+    if status is None:
+        values.update(running=False, runs=0, pending_reports=0, run_reports_processed=0, reports_rolled_up_total=0, rollups_written_total=0, batches_total=0)
+    return {"enabled": settings.report_retention_days > 0, "retention_days": settings.report_retention_days, **values}
+
+
+retention_job = RetentionJob()
+
+
+async def retention_loop() -> None:
+    """Hintergrund-Task: verdichtet alte Berichte beim Start und danach im Abstand von retention_interval_seconds."""
+    if settings.report_retention_days <= 0:
+        return
+    retention_job._stop.clear() # erneuter Start, z.B. nach Wechsel des zuständigen Workers
+    try:
+        while True:
+            await asyncio.to_thread(retention_job.run_once)
+            await asyncio.sleep(settings.retention_interval_seconds)
+    finally:
+        retention_job.stop()
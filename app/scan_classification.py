@@ -0,0 +1,54 @@
+# app/scan_classification.py
+"""
+Einordnung eingehender Scan-Ergebnisse. Wird einmalig beim Speichern eines Berichts
+ausgeführt, damit die Dashboards nur noch die gespeicherten Spalten lesen müssen.
+(Die Backfill-Migration f6g7h8i9j0k1 enthält eine eigene Kopie der damaligen Regeln.)
+"""
+import re
+from typing import NamedTuple, Optional
+
+from .models import ScanStatus
+
+# Meldungen mit diesen Bestandteilen gelten als Fehler / Abbruch
+ERROR_MARKERS = ("Event 1002", "FEHLER:", "stopped", "Fehler")
+# Event 1002 ist nur ein abgebrochener Scan, keine Bedrohung (alte Clients haben ihn als Fund gemeldet)
+CANCELLED_SCAN_MARKER = "Event 1002"
+
+# Reste der Pseudo-Lokalisierung (%n, %t, %b in diversen Schriften) aus älteren Client-Versionen
+_NEWLINE_TOKEN = re.compile(r'%[nиñńηйNИÑŃΗЙ]')
+_TAB_TOKEN = re.compile(r'%[tтŧťτTТŦŤΤ]')
+_BACKSPACE_TOKEN = re.compile(r'%[bьвβBЬВΒ]')
+
+
+class ScanClassification(NamedTuple):
+    clean_message: Optional[str]
+    is_error: bool
+    is_real_threat: bool
+    status: ScanStatus
+
+
+def clean_scan_message(message: Optional[str]) -> Optional[str]:
+    """Ersetzt die Pseudo-Lokalisierungs-Tokens durch Zeilenumbruch/Einrückung bzw. entfernt sie."""
+    if not message:
+        return message
+    message = _NEWLINE_TOKEN.sub('\n', message)
+    message = _TAB_TOKEN.sub('    ', message)
+    return _BACKSPACE_TOKEN.sub('', message)
+
+
+def classify_scan_result(message: Optional[str], threats_found: Optional[bool]) -> ScanClassification:
+    """Bestimmt bereinigte Meldung, Fehler-/Bedrohungs-Flag und Status eines Scan-Ergebnisses."""
+    is_real_threat = bool(threats_found)
+    is_error = False
+    if message and any(marker in message for marker in ERROR_MARKERS):
+        if CANCELLED_SCAN_MARKER in message:
+            is_real_threat = False
+        is_error = True
+
+    if is_real_threat:
+        status = ScanStatus.THREAT
+    elif is_error:
+        status = ScanStatus.ERROR
+    else:
+        status = ScanStatus.OK
+    return ScanClassification(clean_scan_message(message), is_error, is_real_threat, status)
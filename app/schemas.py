@@ -1,7 +1,21 @@
-from pydantic import BaseModel, Field
+import re
+
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List # List wird für LaptopResponse verwendet
 from datetime import datetime, timezone
 
+from .models import ScanStatus
+
+
+def version_key(version: Optional[str]) -> Optional[tuple]:
+    """Wandelt 'v1.4.2' / '1.4' in ein vergleichbares Tupel (1, 4, 2) um, None wenn nicht lesbar."""
+    if not version:
+        return None
+    parts = re.findall(r'\d+', version.strip().lstrip('vV').split('-')[0])
+    if not parts:
+        return None
+    return tuple(int(p) for p in parts)
+
 # ----- Laptop Schemas -----
 class LaptopBase(BaseModel):
     hostname: str
@@ -25,6 +39,7 @@ class Laptop(LaptopBase):
     last_scan_result_message: Optional[str] = None
     last_scan_threats_found: Optional[bool] = None
     last_scan_duration_minutes: Optional[int] = None
+    last_scan_status: Optional[ScanStatus] = None
     pending_command: Optional[str] = None
     command_issue_time: Optional[datetime] = None
 
@@ -48,6 +63,9 @@ class ScanReport(ScanReportBase):
     id: int
     laptop_id: int
     report_time_on_server: datetime
+    is_error: bool = False
+    is_real_threat: bool = False
+    scan_status: Optional[ScanStatus] = None
     
     # Pydantic V2 Konfiguration
     model_config = {
@@ -92,9 +110,25 @@ class ClientCommand(BaseModel):
     scan_type: Optional[str] = None
     payload: Optional[str] = None
 
+class CommandTargetFilter(BaseModel):
+    # Alle gesetzten Kriterien müssen zutreffen (UND-Verknüpfung); ohne Kriterien -> alle Laptops
+    laptop_ids: Optional[List[int]] = None
+    client_version_below: Optional[str] = None # z.B. "1.4.0" -> alle Clients mit kleinerer oder unbekannter Version
+    offline_longer_than_hours: Optional[float] = None
+    last_scan_older_than_hours: Optional[float] = None
+
+    @field_validator("client_version_below")
+    @classmethod
+    def check_client_version_below(cls, value: Optional[str]) -> Optional[str]:
+        # Eine nicht lesbare Version würde sonst auf alle Laptops zutreffen
+        if value is not None and version_key(value) is None:
+            raise ValueError(f"Keine gültige Versionsnummer: '{value}'")
+        return value
+
 class TriggerUpdatePayload(BaseModel):
     repo_url: str
     version: str = "main"
+    target: Optional[CommandTargetFilter] = None # Nur für "all" relevant, wird nicht an den Client gesendet
 
 class ClientCommandResponse(ClientCommand): # <--- HIER IST ES!
     # Erbt vorerst alle Felder von ClientCommand.
@@ -1,6 +1,6 @@
 # app/security.py
 from fastapi import Security, Depends, HTTPException, status
-from fastapi.security import APIKeyHeader
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
 import secrets
 
 from app.config import settings
@@ -8,6 +8,7 @@ from app.config import settings
 # Definiert, in welchem Header wir den API-Schlüssel erwarten.
 # "X-API-Key" ist eine gängige Konvention.
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+metrics_bearer = HTTPBearer(auto_error=False)
 
 async def get_api_key(api_key_header: str = Security(api_key_header)):
     """
@@ -28,4 +29,13 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Ungültiger API Key"
-        )
\ No newline at end of file
+        )
+
+async def get_metrics_access(
+    api_key_header: str = Security(api_key_header),
+    credentials: HTTPAuthorizationCredentials = Security(metrics_bearer)
+):
+    """Zugriff auf /metrics: eigener Token (settings.metrics_token) per Bearer-Header oder der API-Schlüssel."""
+    if settings.metrics_token and credentials is not None and secrets.compare_digest(credentials.credentials, settings.metrics_token):
+        return credentials.credentials
+    return await get_api_key(api_key_header)
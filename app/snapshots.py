@@ -0,0 +1,65 @@
+# app/snapshots.py
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Union
+
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_stop = threading.Event()
+
+
+def build_missing_snapshots(now: Union[datetime, None] = None) -> int:
+    """
+    Baut die Tages-Snapshots aller abgeschlossenen Tage der letzten fleet_snapshot_max_days,
+    die noch fehlen (z.B. nach dem ersten Start oder einer Pause des Servers), in
+    aufsteigender Reihenfolge, damit jeder Tag auf dem Vortag aufsetzen kann.
+    Snapshots vor diesem Zeitraum werden vorher gelöscht.
+    Nachträglich eingegangene Berichte werden beim Speichern übernommen (crud.snapshot_update_statements).
+    Rückgabe: Anzahl gebauter Tage.
+    """
+    if settings.fleet_snapshot_max_days <= 0:
+        return 0
+    today = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    built_count = 0
+    db = SessionLocal()
+    try:
+        oldest_kept_day = today - timedelta(days=settings.fleet_snapshot_max_days)
+        deleted_days = crud.delete_fleet_snapshots_before(db, oldest_kept_day)
+        if deleted_days:
+            logger.info("Tages-Snapshots vor %s gelöscht (%d Tage)", oldest_kept_day, deleted_days)
+        first_day = crud.get_first_scan_day(db)
+        if first_day is None:
+            return 0
+        first_day = max(first_day, oldest_kept_day)
+        built_days = crud.get_built_snapshot_days(db, first_day, today - timedelta(days=1))
+        day = first_day
+        while day < today and not _stop.is_set():
+            if day not in built_days:
+                crud.build_fleet_snapshot(db, day)
+                built_count += 1
+            day += timedelta(days=1)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Aufbau der Tages-Snapshots fehlgeschlagen")
+    finally:
+        db.close()
+    return built_count
+
+
+async def snapshot_loop() -> None:
+    """Hintergrund-Task: baut fehlende Tages-Snapshots beim Start und danach periodisch (u.a. den Vortag nach Mitternacht)."""
+    if settings.fleet_snapshot_max_days <= 0:
+        return
+    _stop.clear() # erneuter Start, z.B. nach Wechsel des zuständigen Workers
+    try:
+        while True:
+            await asyncio.to_thread(build_missing_snapshots)
+            await asyncio.sleep(settings.fleet_snapshot_interval_seconds)
+    finally:
+        _stop.set()
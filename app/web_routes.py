@@ -1,18 +1,25 @@
 # app/web_routes.py
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi import APIRouter, Request, Depends, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from markupsafe import Markup
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime, timezone, timedelta
 from pathlib import Path
+from zoneinfo import ZoneInfo
+import asyncio
 import io
 import csv
-import re
-from typing import Union, Optional # KORREKTUR: Union und Optional importieren
+from typing import Union, Optional, List, Iterator, Tuple, Callable # KORREKTUR: Union und Optional importieren
 
-from app.database import get_db
-from app import crud
+from app.database import get_async_read_db, ReadSessionLocal
+from app import crud, crud_async, models
+from app.scan_classification import clean_scan_message
 from app.auth import get_current_user_or_none 
+from app.heartbeat import heartbeat_buffer, ONLINE_TIMEOUT
+from app.fragment_cache import fragment_cache
+from app.response_cache import dashboard_cache
+from app.notifications import dashboard_events
 
 # --- Konfiguration für diesen Router ---
 PROJECT_ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +35,8 @@ def to_utc_iso_string(dt: Union[datetime, None]) -> str:
 templates.env.globals['to_utc_iso'] = to_utc_iso_string
 
 
+SSE_KEEPALIVE_SECONDS = 25 # Kommentarzeile, damit Proxies die Event-Verbindung nicht schließen
+
 # --- Router-Definition mit Schutzmechanismus ---
 router = APIRouter()
 
@@ -43,188 +52,345 @@ async def read_root_html(user: Optional[str] = Depends(get_current_user_or_none)
     return RedirectResponse(url="/dashboard/laptops")
 
 @router.get("/dashboard/laptops", response_class=HTMLResponse)
-async def web_laptops_overview(request: Request, db: Session = Depends(get_db), user: Optional[str] = Depends(get_current_user_or_none)):
+async def web_laptops_overview(request: Request, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
     redirect = await check_auth(user)
     if redirect: return redirect
-        
-    all_laptops_db = crud.get_laptops(db=db, limit=10000)
+    return await _cached_dashboard_page(request, db, user, _render_laptops_overview)
+
+async def _render_laptops_overview(request: Request, db: AsyncSession, user: str, fleet_version: int) -> bytes:
+    # Cursor vor dem Laden bestimmen, damit währenddessen geänderte Laptops beim nächsten Delta mitkommen
+    change_cursor = _make_change_cursor(fleet_version, datetime.now(timezone.utc))
+    all_laptops_db = await crud_async.get_laptops(db=db, limit=10000)
     all_laptops_db = sorted(all_laptops_db, key=lambda x: (x.alias_name or "").lower())
     
-    laptops_with_status = []
     now_utc = datetime.now(timezone.utc)
-    for laptop_instance in all_laptops_db:
-        is_online = False
-        if laptop_instance.last_api_contact:
-            contact_aware = laptop_instance.last_api_contact.replace(tzinfo=timezone.utc)
-            if (now_utc - contact_aware) <= timedelta(minutes=5):
-                is_online = True
-                
-        status_info = {"text": "Unbekannt", "color_class": "status-unknown", "style": ""} 
-        if laptop_instance.last_scan_time is not None:
-            last_scan_time_aware = laptop_instance.last_scan_time.replace(tzinfo=timezone.utc)
-            time_since_last_scan = now_utc - last_scan_time_aware
-            hours_since = time_since_last_scan.total_seconds() / 3600.0
-            hours_rounded = round(hours_since)
+    laptops_with_status = [_build_overview_row(laptop_instance, now_utc) for laptop_instance in all_laptops_db]
+    rows_html = _render_rows_html("_laptops_overview_row.html", laptops_with_status, now_utc)
+    return templates.TemplateResponse("laptops_overview.html", {"request": request, "laptops_list": laptops_with_status, "rows_html": rows_html, "change_cursor": change_cursor, "title": "Laptop Übersicht", "user": user}).body
+
+async def _cached_dashboard_page(request: Request, db: AsyncSession, user: str, render: Callable) -> HTMLResponse:
+    """
+    Liefert eine Dashboard-Seite aus dem Antwort-Cache (gültig bis zur nächsten Änderung der Flotte bzw.
+    dashboard_cache_ttl_seconds). Gleichzeitige Aufrufe warten auf dieselbe Erzeugung, statt selbst zu rendern.
+    Benutzer und Basis-URL gehören zum Schlüssel (Logout-Link, url_for).
+    """
+    fleet_version = await crud_async.get_fleet_version(db)
+    key = (user, str(request.base_url))
+    body = await dashboard_cache.get_or_build(request.url.path, key, fleet_version, lambda: render(request, db, user, fleet_version))
+    return HTMLResponse(body)
+
+def _make_change_cursor(version: int, at: datetime) -> str:
+    """Opaker Cursor für die Delta-Endpunkte: globale Änderungsversion + Zeitpunkt (für Offline-Wechsel)."""
+    return f"{version}-{int(at.timestamp())}"
+
+def _parse_change_cursor(value: Optional[str]) -> Union[Tuple[int, datetime], None]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        version_str, timestamp_str = value.strip('"').split("-", 1)
+        return int(version_str), datetime.fromtimestamp(int(timestamp_str), tz=timezone.utc)
+    except ValueError:
+        return None
+
+async def _dashboard_delta_response(request: Request, db: AsyncSession, since: Optional[str], row_builder: Callable, row_template: str) -> Response:
+    """
+    Liefert nur die seit dem Cursor geänderten Laptops (inkl. gerenderter Tabellenzeile) als JSON,
+    bzw. 304, wenn sich nichts geändert hat. Der Cursor kann als ?since= oder If-None-Match übergeben werden.
+    """
+    now_utc = datetime.now(timezone.utc)
+    fleet_version = await crud_async.get_fleet_version(db)
+    parsed_cursor = _parse_change_cursor(since or request.headers.get("if-none-match"))
+
+    if parsed_cursor is None:
+        changed_laptops = await crud_async.get_laptops_changed_since(db, -1)
+    else:
+        since_version, since_time = parsed_cursor
+        # Laptops, die seit dem letzten Abruf offline gegangen sind (ohne dass ein Schreibvorgang stattfand)
+        offline_window = (since_time - ONLINE_TIMEOUT, now_utc - ONLINE_TIMEOUT)
+        changed_laptops = await crud_async.get_laptops_changed_since(db, since_version, offline_window)
+        if not changed_laptops and fleet_version == since_version:
+            return Response(status_code=304, headers={"ETag": f'"{_make_change_cursor(since_version, since_time)}"'})
+
+    new_cursor = _make_change_cursor(fleet_version, now_utc)
+    laptops_payload = []
+    for laptop in sorted(changed_laptops, key=lambda x: (x.alias_name or "").lower()):
+        item = row_builder(laptop, now_utc)
+        laptops_payload.append({
+            "id": laptop.id,
+            "alias_name": laptop.alias_name,
+            "change_version": laptop.change_version,
+            "html": _render_row_html(row_template, item, now_utc),
+        })
+    return JSONResponse(
+        {"cursor": new_cursor, "total": await crud_async.count_laptops(db), "laptops": laptops_payload},
+        headers={"ETag": f'"{new_cursor}"', "Cache-Control": "no-cache"}
+    )
+
+@router.get("/dashboard/laptops/delta")
+async def web_laptops_overview_delta(request: Request, since: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
+    redirect = await check_auth(user)
+    if redirect: return redirect
+    return await _dashboard_delta_response(request, db, since, _build_overview_row, "_laptops_overview_row.html")
+
+@router.get("/dashboard/updates/delta")
+async def web_client_updates_delta(request: Request, since: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
+    redirect = await check_auth(user)
+    if redirect: return redirect
+    return await _dashboard_delta_response(request, db, since, _build_updates_row, "_client_updates_row.html")
+
+def _parse_id_list(ids: Optional[str]) -> List[int]:
+    if not ids:
+        return []
+    try:
+        return [int(x) for x in ids.split(',') if x.strip()]
+    except ValueError:
+        return []
+
+@router.get("/dashboard/laptops/rows", response_class=HTMLResponse)
+async def web_laptops_overview_rows(request: Request, ids: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
+    """Rendert nur die Tabellenzeilen der angegebenen Laptops (für Live-Updates per SSE)."""
+    redirect = await check_auth(user)
+    if redirect: return redirect
+
+    now_utc = datetime.now(timezone.utc)
+    laptops_with_status = [_build_overview_row(laptop_instance, now_utc) for laptop_instance in await crud_async.get_laptops_by_ids(db, _parse_id_list(ids))]
+    return templates.TemplateResponse("_dashboard_rows.html", {"request": request, "rows_html": _render_rows_html("_laptops_overview_row.html", laptops_with_status, now_utc)})
+
+@router.get("/dashboard/events")
+async def dashboard_event_stream(request: Request, user: Optional[str] = Depends(get_current_user_or_none)):
+    """
+    Server-Sent Events für die Dashboards: meldet neue Reports, Befehlsänderungen,
+    Online/Offline-Wechsel und angelegte/gelöschte Laptops mit den betroffenen Laptop-IDs.
+    """
+    redirect = await check_auth(user)
+    if redirect: return redirect
+
+    async def event_stream():
+        queue = dashboard_events.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                yield message
+        finally:
+            dashboard_events.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _render_row_html(row_template: str, item: dict, now_utc: datetime) -> str:
+    """
+    Tabellenzeile aus dem Fragment-Cache; neu gerendert wird nur, wenn sich der Laptop geändert hat
+    (change_version, letzter Kontakt aus dem Heartbeat-Puffer, Online-Status) oder das Zeitfenster
+    für die "Stunden seit"-Werte abgelaufen ist.
+    """
+    laptop = item["db_data"]
+    state = (laptop.change_version, laptop.last_api_contact, item["is_online"], fragment_cache.time_bucket(now_utc))
+    html = fragment_cache.get(row_template, laptop.id, state)
+    if html is None:
+        html = templates.get_template(row_template).render(item=item)
+        fragment_cache.put(row_template, laptop.id, state, html)
+    return html
+
+def _render_rows_html(row_template: str, items: List[dict], now_utc: datetime) -> Markup:
+    return Markup("\n".join(_render_row_html(row_template, item, now_utc) for item in items))
+
+def _build_overview_row(laptop_instance, now_utc: datetime) -> dict:
+    """Berechnet die Statusdaten einer Zeile der Laptop-Übersicht."""
+    heartbeat_buffer.apply(laptop_instance) # noch nicht geschriebene Polls berücksichtigen
+    is_online = False
+    if laptop_instance.last_api_contact:
+        contact_aware = laptop_instance.last_api_contact.replace(tzinfo=timezone.utc)
+        if (now_utc - contact_aware) <= timedelta(minutes=5):
+            is_online = True
             
-            # Retroactively fix old DB entries where Event 1002 was marked as a threat
-            is_real_threat = laptop_instance.last_scan_threats_found
-            is_error = False
-            if laptop_instance.last_scan_result_message and ("Event 1002" in laptop_instance.last_scan_result_message or "FEHLER:" in laptop_instance.last_scan_result_message or "stopped" in laptop_instance.last_scan_result_message or "Fehler" in laptop_instance.last_scan_result_message):
-                if "Event 1002" in laptop_instance.last_scan_result_message:
-                    is_real_threat = False # 1002 is just a cancelled scan, not a threat
-                is_error = True
-                
-            laptop_instance.last_scan_threats_found = is_real_threat
-            laptop_instance.is_error = is_error
-
-            if is_real_threat is True:
-                status_info = {"text": "Bedrohung(en) gefunden!", "color_class": "status-red", "style": ""}
-            elif is_error:
-                status_info = {"text": "Fehler / Abbruch", "color_class": "status-yellow", "style": ""}
-            else:
-                if hours_since <= 5:
-                    hue = 120 # Green
-                elif hours_since <= 12:
-                    ratio = (hours_since - 5) / 7.0
-                    hue = 120 - (ratio * 90)
-                elif hours_since <= 24:
-                    ratio = (hours_since - 12) / 12.0
-                    hue = 30 - (ratio * 30)
-                else:
-                    hue = 0 # Red
-                
-                status_info = {
-                    "text": f"OK ({hours_rounded}h)", 
-                    "color_class": "", 
-                    "style": f"color: hsl({hue}, 80%, 50%); font-weight: bold;"
-                }
+    status_info = {"text": "Unbekannt", "color_class": "status-unknown", "style": ""} 
+    if laptop_instance.last_scan_time is not None:
+        last_scan_time_aware = laptop_instance.last_scan_time.replace(tzinfo=timezone.utc)
+        time_since_last_scan = now_utc - last_scan_time_aware
+        hours_since = time_since_last_scan.total_seconds() / 3600.0
+        hours_rounded = round(hours_since)
+        
+        # Einordnung wurde beim Eingang des Berichts gespeichert (crud.create_scan_report)
+        if laptop_instance.last_scan_status == models.ScanStatus.THREAT:
+            status_info = {"text": "Bedrohung(en) gefunden!", "color_class": "status-red", "style": ""}
+        elif laptop_instance.last_scan_status == models.ScanStatus.ERROR:
+            status_info = {"text": "Fehler / Abbruch", "color_class": "status-yellow", "style": ""}
         else:
-            status_info = {"text": "Kein Scan bisher", "color_class": "status-white", "style": ""}
-            hours_rounded = 999999 # So it's always considered outdated if never scanned
-            
-        simplified_result_message = "N/A"
-        if laptop_instance.last_scan_result_message:
-            # Clean up old pseudo-localization tokens from database
-            clean_msg = laptop_instance.last_scan_result_message
-            clean_msg = re.sub(r'%[nиñńηйNИÑŃΗЙ]', '\n', clean_msg)
-            clean_msg = re.sub(r'%[tтŧťτTТŦŤΤ]', '    ', clean_msg)
-            clean_msg = re.sub(r'%[bьвβBЬВΒ]', '', clean_msg)
-            laptop_instance.last_scan_result_message = clean_msg
-            
-            if "erfolgreich abgeschlossen" in clean_msg:
-                simplified_result_message = "OK"
+            if hours_since <= 5:
+                hue = 120 # Green
+            elif hours_since <= 12:
+                ratio = (hours_since - 5) / 7.0
+                hue = 120 - (ratio * 90)
+            elif hours_since <= 24:
+                ratio = (hours_since - 12) / 12.0
+                hue = 30 - (ratio * 30)
             else:
-                simplified_result_message = clean_msg[:30] + ("..." if len(clean_msg) > 30 else "")
-                
-        
-        has_error = False
-        has_threat = False
-        msg_lower = (laptop_instance.last_scan_result_message or "").lower()
-        if "fehler" in msg_lower:
-            has_error = True
-        if "fund!" in msg_lower or "siehe bericht" in msg_lower or "bedrohung" in msg_lower:
-            has_threat = True
+                hue = 0 # Red
             
-        laptops_with_status.append({
-            "db_data": laptop_instance, 
-            "scan_status": status_info,
-            "is_online": is_online,
-            "scan_hours": hours_rounded,
-            "simplified_result_message": simplified_result_message,
-            "has_error": has_error,
-            "has_threat": has_threat
-        })
-    return templates.TemplateResponse("laptops_overview.html", {"request": request, "laptops_list": laptops_with_status, "title": "Laptop Übersicht", "user": user})
+            status_info = {
+                "text": f"OK ({hours_rounded}h)", 
+                "color_class": "", 
+                "style": f"color: hsl({hue}, 80%, 50%); font-weight: bold;"
+            }
+    else:
+        status_info = {"text": "Kein Scan bisher", "color_class": "status-white", "style": ""}
+        hours_rounded = 999999 # So it's always considered outdated if never scanned
+        
+    simplified_result_message = "N/A"
+    clean_msg = laptop_instance.last_scan_clean_message
+    if clean_msg:
+        if "erfolgreich abgeschlossen" in clean_msg:
+            simplified_result_message = "OK"
+        else:
+            simplified_result_message = clean_msg[:30] + ("..." if len(clean_msg) > 30 else "")
+
+    has_error = laptop_instance.last_scan_status == models.ScanStatus.ERROR
+    has_threat = laptop_instance.last_scan_status == models.ScanStatus.THREAT
+        
+    return {
+        "db_data": laptop_instance, 
+        "scan_status": status_info,
+        "is_online": is_online,
+        "scan_hours": hours_rounded,
+        "simplified_result_message": simplified_result_message,
+        "has_error": has_error,
+        "has_threat": has_threat
+    }
+
+CSV_CHUNK_ROWS = 500 # Anzahl Zeilen pro gesendetem Chunk beim CSV-Export
+
+def _parse_report_date(value: Optional[str]) -> Union[datetime, None]:
+    """Parst einen ISO-Zeitpunkt aus der URL; naive Werte werden als UTC interpretiert."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def _csv_fields_for_report(report, local_tz) -> list:
+    """Baut Zeitstempel, Ergebnis und Bedrohungs-Spalte für eine CSV-Zeile aus einem Scan-Bericht."""
+    if report is None:
+        return ["N/A", "N/A", "N/A"]
+
+    scan_time_local = report.client_scan_time.replace(tzinfo=timezone.utc).astimezone(local_tz)
+    scan_time_str = scan_time_local.strftime('%d.%m.%Y %H:%M:%S')
+
+    clean_msg = report.clean_result_message
+    if report.scan_status == models.ScanStatus.THREAT:
+        scan_result = "Fund!"
+        if report.threat_details:
+            threats_str = clean_scan_message(report.threat_details)
+        elif clean_msg:
+            threats_str = clean_msg
+        else:
+            threats_str = "Ja"
+    elif report.scan_status == models.ScanStatus.ERROR:
+        scan_result = "Fehler"
+        threats_str = clean_msg or "Fehler aufgetreten"
+    else:
+        scan_result = clean_msg or "Keine Meldung"
+        if len(scan_result) > 50:
+            scan_result = scan_result[:50] + "..."
+        threats_str = "Nein"
+
+    return [scan_time_str, scan_result, threats_str]
+
+def _iter_csv_chunks(header: list, rows: Iterator[list]) -> Iterator[bytes]:
+    """
+    Schreibt die Zeilen blockweise als UTF-8 (mit BOM für Excel) und gibt jeden Block
+    sofort zurück, statt die ganze Datei im Speicher aufzubauen.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(header)
+    yield buffer.getvalue().encode('utf-8-sig')
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    pending_rows = 0
+    for row in rows:
+        writer.writerow(row)
+        pending_rows += 1
+        if pending_rows >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending_rows = 0
+    if pending_rows:
+        yield buffer.getvalue().encode('utf-8')
+
+def _snapshot_csv_rows(target_date: datetime, id_list: Optional[List[int]]) -> Iterator[list]:
+    """Eine Zeile pro Laptop mit dem letzten Bericht bis target_date."""
+    berlin_tz = ZoneInfo("Europe/Berlin")
+    # Eigene Session, da der Generator erst nach dem Ende des Request-Handlers läuft
+    db = ReadSessionLocal()
+    try:
+        all_laptops_db = crud.get_laptops(db=db, limit=10000)
+        if id_list is not None:
+            all_laptops_db = [l for l in all_laptops_db if l.id in id_list]
+        all_laptops_db = sorted(all_laptops_db, key=lambda x: (x.alias_name or "").lower())
+
+        # Ein einziger Query für alle Laptops statt einem pro Laptop (für abgeschlossene Tage aus dem Tages-Snapshot)
+        historical_reports = crud.get_fleet_state_at(db, target_date)
+
+        for laptop in all_laptops_db:
+            yield [laptop.alias_name, laptop.hostname] + _csv_fields_for_report(historical_reports.get(laptop.id), berlin_tz)
+    finally:
+        db.close()
+
+def _range_csv_rows(start_dt: datetime, end_dt: datetime, id_list: Optional[List[int]]) -> Iterator[list]:
+    """
+    Eine Zeile pro Bericht im Zeitraum, gelesen über einen serverseitigen Cursor.
+    Bereits verdichtete Tage erscheinen als eine Zeile je Laptop und Tag (letzter Bericht des Tages).
+    """
+    berlin_tz = ZoneInfo("Europe/Berlin")
+    db = ReadSessionLocal()
+    try:
+        for row in crud.iter_scan_results_in_range(db, start_dt, end_dt, laptop_ids=id_list):
+            scan_type = row.scan_type
+            if row.is_rollup:
+                scan_type = f"{scan_type} (Tageszusammenfassung, Scans: {row.report_count})"
+            yield [row.alias_name, row.hostname, scan_type] + _csv_fields_for_report(row, berlin_tz)
+    finally:
+        db.close()
 
 @router.get("/dashboard/daily_report/csv", response_class=StreamingResponse)
-async def export_daily_report_csv(request: Request, report_date_str: Optional[str] = None, selected_ids: Optional[str] = None, db: Session = Depends(get_db), user: Optional[str] = Depends(get_current_user_or_none)):
+async def export_daily_report_csv(request: Request, report_date_str: Optional[str] = None, selected_ids: Optional[str] = None, date_from: Optional[str] = Query(None, alias="from"), date_to: Optional[str] = Query(None, alias="to"), user: Optional[str] = Depends(get_current_user_or_none)):
     redirect = await check_auth(user)
     if redirect: return redirect
 
-    target_date: datetime
-    if report_date_str:
-        try:
-            target_date = datetime.fromisoformat(report_date_str)
-            if target_date.tzinfo is None:
-                target_date = target_date.replace(tzinfo=timezone.utc)
-        except (ValueError, TypeError):
-            target_date = datetime.now(timezone.utc)
-    else:
-        target_date = datetime.now(timezone.utc)
-    
-    # ... (Rest der CSV-Logik hier einfügen)
-    all_laptops_db = crud.get_laptops(db=db, limit=10000)
-    
+    id_list: Optional[List[int]] = None
     if selected_ids:
         try:
             id_list = [int(x) for x in selected_ids.split(',')]
-            all_laptops_db = [l for l in all_laptops_db if l.id in id_list]
         except ValueError:
             pass # ignore invalid ids
-            
-    all_laptops_db = sorted(all_laptops_db, key=lambda x: (x.alias_name or "").lower())
-    from zoneinfo import ZoneInfo
-    berlin_tz = ZoneInfo("Europe/Berlin")
 
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
-    writer.writerow(["Alias", "Hostname", "Letzter Scan (Lokalzeit)", "Scan Ergebnis", "Bedrohungen"])
-    
-    now_utc = datetime.now(timezone.utc)
-    
-    for laptop in all_laptops_db:
-        historical_report = crud.get_latest_scan_report_before(db, laptop.id, target_date)
-        
-        scan_time_str = "N/A"
-        scan_result = "N/A"
-        threats_str = "N/A"
-        
-        if historical_report:
-            scan_time_berlin = historical_report.client_scan_time.replace(tzinfo=timezone.utc).astimezone(berlin_tz)
-            scan_time_str = scan_time_berlin.strftime('%d.%m.%Y %H:%M:%S')
-            
-            is_real_threat = historical_report.threats_found
-            is_error = False
-            if historical_report.scan_result_message and ("Event 1002" in historical_report.scan_result_message or "FEHLER:" in historical_report.scan_result_message or "stopped" in historical_report.scan_result_message or "Fehler" in historical_report.scan_result_message):
-                if "Event 1002" in historical_report.scan_result_message:
-                    is_real_threat = False
-                is_error = True
-            
-            if is_real_threat is True:
-                scan_result = "Fund!"
-                if historical_report.threat_details:
-                    threats_str = historical_report.threat_details
-                elif historical_report.scan_result_message:
-                    threats_str = historical_report.scan_result_message
-                else:
-                    threats_str = "Ja"
-            elif is_error:
-                scan_result = "Fehler"
-                threats_str = historical_report.scan_result_message or "Fehler aufgetreten"
-            else:
-                scan_result = historical_report.scan_result_message or "Keine Meldung"
-                if len(scan_result) > 50:
-                    scan_result = scan_result[:50] + "..."
-                threats_str = "Nein"
-                
-            # Clean up old pseudo-localization tokens from database
-            threats_str = re.sub(r'%[nиñńηйNИÑŃΗЙ]', '\n', threats_str)
-            threats_str = re.sub(r'%[tтŧťτTТŦŤΤ]', '    ', threats_str)
-            threats_str = re.sub(r'%[bьвβBЬВΒ]', '', threats_str)
-            
-            scan_result = re.sub(r'%[nиñńηйNИÑŃΗЙ]', '\n', scan_result)
-            scan_result = re.sub(r'%[tтŧťτTТŦŤΤ]', '    ', scan_result)
-            scan_result = re.sub(r'%[bьвβBЬВΒ]', '', scan_result)
+    # Zeitraum-Export: alle Berichte zwischen from und to (to fehlt -> bis jetzt)
+    start_dt = _parse_report_date(date_from)
+    if start_dt is not None:
+        end_dt = _parse_report_date(date_to) or datetime.now(timezone.utc)
+        header = ["Alias", "Hostname", "Scan Typ", "Scan-Zeitpunkt (Lokalzeit)", "Scan Ergebnis", "Bedrohungen"]
+        filename = f"scanop_berichte_{start_dt.date().isoformat()}_{end_dt.date().isoformat()}.csv"
+        return StreamingResponse(_iter_csv_chunks(header, _range_csv_rows(start_dt, end_dt, id_list)), media_type="text/csv", headers={"Content-Disposition": f"attachment;filename={filename}"})
 
-        writer.writerow([laptop.alias_name, laptop.hostname, scan_time_str, scan_result, threats_str])
-        
-    output.seek(0)
-    
-    return StreamingResponse(io.BytesIO(output.getvalue().encode('utf-8-sig')), media_type="text/csv", headers={"Content-Disposition": f"attachment;filename=scanop_tagesbericht_{target_date.isoformat()}.csv"})
+    target_date = _parse_report_date(report_date_str) or datetime.now(timezone.utc)
+    header = ["Alias", "Hostname", "Letzter Scan (Lokalzeit)", "Scan Ergebnis", "Bedrohungen"]
+    return StreamingResponse(_iter_csv_chunks(header, _snapshot_csv_rows(target_date, id_list)), media_type="text/csv", headers={"Content-Disposition": f"attachment;filename=scanop_tagesbericht_{target_date.isoformat()}.csv"})
 
 
 @router.get("/dashboard/daily_report", response_class=HTMLResponse)
-async def web_daily_report(request: Request, report_date_str: Optional[str] = None, db: Session = Depends(get_db), user: Optional[str] = Depends(get_current_user_or_none)):
+async def web_daily_report(request: Request, report_date_str: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
     redirect = await check_auth(user)
     if redirect: return redirect
         
@@ -244,15 +410,18 @@ async def web_daily_report(request: Request, report_date_str: Optional[str] = No
         target_date = datetime.now(timezone.utc)
         report_title = f"Tagesbericht bis {target_date.strftime('%d.%m.%Y %H:%M')}"
     
-    all_laptops_db = crud.get_laptops(db=db, limit=10000)
+    all_laptops_db = await crud_async.get_laptops(db=db, limit=10000)
     all_laptops_db = sorted(all_laptops_db, key=lambda x: (x.alias_name or "").lower())
     
     report_data = []
     now_utc = datetime.now(timezone.utc)
     
+    # Fetch historical reports up to target_date for all laptops in one query
+    # (abgeschlossene Tage aus dem Tages-Snapshot, Tage jenseits der Aufbewahrungsfrist aus den Tageszusammenfassungen)
+    historical_reports = await crud_async.get_fleet_state_at(db, target_date)
+    
     for laptop in all_laptops_db:
-        # Fetch historical report up to target_date
-        historical_report = crud.get_latest_scan_report_before(db, laptop.id, target_date)
+        historical_report = historical_reports.get(laptop.id)
         
         # Override laptop properties temporarily with historical data
         if historical_report:
@@ -261,6 +430,10 @@ async def web_daily_report(request: Request, report_date_str: Optional[str] = No
             laptop.last_scan_result_message = historical_report.scan_result_message
             laptop.last_scan_threats_found = historical_report.threats_found
             laptop.last_scan_threat_details = historical_report.threat_details
+            laptop.last_scan_clean_message = historical_report.clean_result_message
+            laptop.last_scan_is_error = historical_report.is_error
+            laptop.last_scan_is_real_threat = historical_report.is_real_threat
+            laptop.last_scan_status = historical_report.scan_status
             laptop.last_scan_duration_minutes = None # We don't have duration in historical reports right now
         else:
             laptop.last_scan_time = None
@@ -268,33 +441,27 @@ async def web_daily_report(request: Request, report_date_str: Optional[str] = No
             laptop.last_scan_result_message = None
             laptop.last_scan_threats_found = None
             laptop.last_scan_threat_details = None
+            laptop.last_scan_clean_message = None
+            laptop.last_scan_is_error = None
+            laptop.last_scan_is_real_threat = None
+            laptop.last_scan_status = None
             laptop.last_scan_duration_minutes = None
 
         status_text, color_class = "N/A", "status-white"
         if laptop.last_scan_time is not None:
             last_scan_time_aware = laptop.last_scan_time.replace(tzinfo=timezone.utc)
             
-            # Retroactively fix old DB entries where Event 1002 was marked as a threat
-            is_real_threat = laptop.last_scan_threats_found
-            is_error = False
-            if laptop.last_scan_result_message and ("Event 1002" in laptop.last_scan_result_message or "FEHLER:" in laptop.last_scan_result_message or "stopped" in laptop.last_scan_result_message or "Fehler" in laptop.last_scan_result_message):
-                if "Event 1002" in laptop.last_scan_result_message:
-                    is_real_threat = False # 1002 is just a cancelled scan, not a threat
-                is_error = True
-
-            laptop.last_scan_threats_found = is_real_threat
-            laptop.is_error = is_error
-
-            if is_real_threat is True:
+            # Einordnung wurde beim Eingang des Berichts gespeichert (crud.create_scan_report)
+            if laptop.last_scan_status == models.ScanStatus.THREAT:
                 if getattr(laptop, "last_scan_threat_details", None):
-                    status_text = laptop.last_scan_threat_details
-                elif laptop.last_scan_result_message:
-                    status_text = laptop.last_scan_result_message
+                    status_text = clean_scan_message(laptop.last_scan_threat_details)
+                elif laptop.last_scan_clean_message:
+                    status_text = laptop.last_scan_clean_message
                 else:
                     status_text = "Bedrohung(en)!"
                 color_class = "status-red"
-            elif is_error:
-                status_text = laptop.last_scan_result_message
+            elif laptop.last_scan_status == models.ScanStatus.ERROR:
+                status_text = laptop.last_scan_clean_message
                 color_class = "status-yellow"
             elif (now_utc.date() == last_scan_time_aware.date()) and (now_utc - last_scan_time_aware) <= timedelta(days=1):
                 status_text, color_class = "OK (Scan heute)", "status-green"
@@ -302,16 +469,6 @@ async def web_daily_report(request: Request, report_date_str: Optional[str] = No
                 status_text, color_class = "OK (Scan <24h)", "status-green"
             else:
                 status_text, color_class = "OK (Scan älter)", "status-yellow"
-                
-            # Clean up old pseudo-localization tokens from database
-            if status_text:
-                status_text = re.sub(r'%[nиñńηйNИÑŃΗЙ]', '\n', status_text)
-                status_text = re.sub(r'%[tтŧťτTТŦŤΤ]', '    ', status_text)
-                status_text = re.sub(r'%[bьвβBЬВΒ]', '', status_text)
-                
-            # Truncate very long texts if they aren't threats or errors to save space
-            if not is_real_threat and not is_error and len(status_text) > 100:
-                status_text = status_text[:100] + "..."
         else:
             status_text, color_class = "Kein Scan bisher", "status-white"
             
@@ -323,66 +480,77 @@ async def web_daily_report(request: Request, report_date_str: Optional[str] = No
     return templates.TemplateResponse("daily_report.html", {"request": request, "report_date_iso": iso_local_str, "report_date_display": target_date.strftime('%d.%m.%Y %H:%M'), "laptops_report_data": report_data, "title": report_title, "user": user})
 
 @router.get("/dashboard/updates", response_class=HTMLResponse)
-async def web_client_updates(request: Request, db: Session = Depends(get_db), user: Optional[str] = Depends(get_current_user_or_none)):
+async def web_client_updates(request: Request, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
     redirect = await check_auth(user)
     if redirect: return redirect
-        
-    all_laptops_db = crud.get_laptops(db=db, limit=10000)
+    return await _cached_dashboard_page(request, db, user, _render_client_updates)
+
+async def _render_client_updates(request: Request, db: AsyncSession, user: str, fleet_version: int) -> bytes:
+    # Cursor vor dem Laden bestimmen, damit währenddessen geänderte Laptops beim nächsten Delta mitkommen
+    change_cursor = _make_change_cursor(fleet_version, datetime.now(timezone.utc))
+    all_laptops_db = await crud_async.get_laptops(db=db, limit=10000)
     all_laptops_db = sorted(all_laptops_db, key=lambda x: (x.alias_name or "").lower())
     
     now_utc = datetime.now(timezone.utc)
-    laptops_with_status = []
+    laptops_with_status = [_build_updates_row(laptop, now_utc) for laptop in all_laptops_db]
+    rows_html = _render_rows_html("_client_updates_row.html", laptops_with_status, now_utc)
+    return templates.TemplateResponse("client_updates.html", {"request": request, "laptops_list": laptops_with_status, "rows_html": rows_html, "change_cursor": change_cursor, "title": "Client Updates", "user": user}).body
+
+@router.get("/dashboard/updates/rows", response_class=HTMLResponse)
+async def web_client_updates_rows(request: Request, ids: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), user: Optional[str] = Depends(get_current_user_or_none)):
+    """Rendert nur die Tabellenzeilen der angegebenen Laptops (für Live-Updates per SSE)."""
+    redirect = await check_auth(user)
+    if redirect: return redirect
+
+    now_utc = datetime.now(timezone.utc)
+    laptops_with_status = [_build_updates_row(laptop, now_utc) for laptop in await crud_async.get_laptops_by_ids(db, _parse_id_list(ids))]
+    return templates.TemplateResponse("_dashboard_rows.html", {"request": request, "rows_html": _render_rows_html("_client_updates_row.html", laptops_with_status, now_utc)})
+
+def _build_updates_row(laptop, now_utc: datetime) -> dict:
+    """Berechnet die Statusdaten einer Zeile der Update-Übersicht."""
+    heartbeat_buffer.apply(laptop) # noch nicht geschriebene Polls berücksichtigen
+    is_online = False
+    status_text = "Offline"
+    short_status_text = "Off"
+    color_class = "status-red"
     
-    for laptop in all_laptops_db:
-        is_online = False
-        status_text = "Offline"
-        short_status_text = "Off"
-        color_class = "status-red"
-        
-        if laptop.last_api_contact:
-            contact_aware = laptop.last_api_contact.replace(tzinfo=timezone.utc)
-            delta = now_utc - contact_aware
-            if delta <= timedelta(minutes=5):
-                is_online = True
-                status_text = "Online"
-                short_status_text = "Online"
-                color_class = "status-green"
+    if laptop.last_api_contact:
+        contact_aware = laptop.last_api_contact.replace(tzinfo=timezone.utc)
+        delta = now_utc - contact_aware
+        if delta <= timedelta(minutes=5):
+            is_online = True
+            status_text = "Online"
+            short_status_text = "Online"
+            color_class = "status-green"
+        else:
+            mins = int(delta.total_seconds() / 60)
+            if mins < 60:
+                status_text = f"Offline ({mins}m)"
+                short_status_text = f"{mins}m"
+            elif mins < 1440:
+                status_text = f"Offline ({mins//60}h)"
+                short_status_text = f"{mins//60}h"
             else:
-                mins = int(delta.total_seconds() / 60)
-                if mins < 60:
-                    status_text = f"Offline ({mins}m)"
-                    short_status_text = f"{mins}m"
-                elif mins < 1440:
-                    status_text = f"Offline ({mins//60}h)"
-                    short_status_text = f"{mins//60}h"
-                else:
-                    status_text = f"Offline ({mins//1440}d)"
-                    short_status_text = f"{mins//1440}d"
-                
-        has_error = False
-        has_threat = False
-        msg_lower = (laptop.last_scan_result_message or "").lower()
-        if "fehler" in msg_lower:
-            has_error = True
-        if "fund!" in msg_lower or "siehe bericht" in msg_lower or "bedrohung" in msg_lower:
-            has_threat = True
+                status_text = f"Offline ({mins//1440}d)"
+                short_status_text = f"{mins//1440}d"
             
-        hours_rounded = 999999
-        if laptop.last_scan_time is not None:
-            last_scan_time_aware = laptop.last_scan_time.replace(tzinfo=timezone.utc)
-            time_since_last_scan = now_utc - last_scan_time_aware
-            hours_since = time_since_last_scan.total_seconds() / 3600.0
-            hours_rounded = round(hours_since)
-
-        laptops_with_status.append({
-            "db_data": laptop,
-            "is_online": is_online,
-            "status_text": status_text,
-            "short_status_text": short_status_text,
-            "color_class": color_class,
-            "scan_hours": hours_rounded,
-            "has_error": has_error,
-            "has_threat": has_threat
-        })
+    has_error = laptop.last_scan_status == models.ScanStatus.ERROR
+    has_threat = laptop.last_scan_status == models.ScanStatus.THREAT
         
-    return templates.TemplateResponse("client_updates.html", {"request": request, "laptops_list": laptops_with_status, "title": "Client Updates", "user": user})
\ No newline at end of file
+    hours_rounded = 999999
+    if laptop.last_scan_time is not None:
+        last_scan_time_aware = laptop.last_scan_time.replace(tzinfo=timezone.utc)
+        time_since_last_scan = now_utc - last_scan_time_aware
+        hours_since = time_since_last_scan.total_seconds() / 3600.0
+        hours_rounded = round(hours_since)
+
+    return {
+        "db_data": laptop,
+        "is_online": is_online,
+        "status_text": status_text,
+        "short_status_text": short_status_text,
+        "color_class": color_class,
+        "scan_hours": hours_rounded,
+        "has_error": has_error,
+        "has_threat": has_threat
+    }
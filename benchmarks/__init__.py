@@ -0,0 +1,6 @@
+"""
+Reproduzierbare Benchmarks für ScanOp: erzeugt eine synthetische Flotte in einer eigenen
+SQLite-Datenbank und misst die wichtigsten Pfade im Prozess (ohne Netzwerk).
+
+    python -m benchmarks --scale 10k --output benchmark-10k.json
+"""
@@ -0,0 +1,124 @@
+# benchmarks/__main__.py
+"""
+Kommandozeile der Benchmarks:
+
+    python -m benchmarks --scale 10k --output benchmark-10k.json
+    python -m benchmarks --laptops 500 --reports-per-laptop 5 --only dashboard_laptops daily_report_past
+
+Die Datenbank wird in einem temporären Verzeichnis angelegt (oder unter --database), die
+übrigen Pflicht-Settings bekommen Platzhalter, sofern sie nicht gesetzt sind.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Anzahl Laptops je Stufe
+SCALES = {"1k": 1_000, "10k": 10_000, "50k": 50_000}
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Synthetische Flotte erzeugen und die heißen Pfade von ScanOp messen.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="Flottengröße (Anzahl Laptops)")
+    parser.add_argument("--laptops", type=int, help="Anzahl Laptops (überschreibt --scale)")
+    parser.add_argument("--reports-per-laptop", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30, help="Zeitraum, über den die Berichte verteilt werden")
+    parser.add_argument("--repeat", type=int, default=10, help="gemessene Durchläufe je Fall")
+    parser.add_argument("--warmup", type=int, default=2, help="ungemessene Durchläufe je Fall")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", metavar="CASE", help="nur diese Fälle messen")
+    parser.add_argument("--database", help="Pfad der SQLite-Datei (Standard: temporär, wird danach gelöscht)")
+    parser.add_argument("--output", help="Ergebnisse als JSON in diese Datei schreiben")
+    return parser.parse_args(argv)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    laptop_count = args.laptops or SCALES[args.scale]
+    tmp_dir = None
+    database_path = args.database
+    if database_path is None:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="scanop-bench-")
+        database_path = os.path.join(tmp_dir.name, "scanop.db")
+    elif os.path.exists(database_path):
+        print(f"Datenbank {database_path} existiert bereits; bitte eine neue Datei angeben.", file=sys.stderr)
+        return 2
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(database_path)}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("APP_USERNAME", "benchmark")
+    os.environ.setdefault("APP_PASSWORD", "benchmark")
+    os.environ.setdefault("SERVER_API_KEY", "benchmark")
+    # Langsame Abfragen sind hier gewollt, die Warnungen würden nur die Ausgabe füllen
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+    os.environ.setdefault("DB_REPEATED_QUERY_THRESHOLD", "0")
+
+    from app import models, snapshots
+    from app.database import SessionLocal, engine
+    from benchmarks.fleet import generate_fleet
+    from benchmarks.runner import run_benchmarks
+
+    try:
+        setup = {}
+        started = time.perf_counter()
+        models.Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            counts = generate_fleet(db, laptop_count, args.reports_per_laptop, days=args.days, seed=args.seed)
+        finally:
+            db.close()
+        setup["generate_seconds"] = round(time.perf_counter() - started, 3)
+        print(f"Flotte erzeugt: {counts['laptops']} Laptops, {counts['reports']} Berichte ({setup['generate_seconds']} s)")
+
+        started = time.perf_counter()
+        setup["snapshot_days_built"] = snapshots.build_missing_snapshots()
+        setup["snapshot_seconds"] = round(time.perf_counter() - started, 3)
+        print(f"Tages-Snapshots: {setup['snapshot_days_built']} ({setup['snapshot_seconds']} s)")
+
+        results = run_benchmarks(laptop_count, args.days, args.repeat, args.warmup, args.only)
+        engine.dispose()
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "parameters": {
+            "laptops": laptop_count,
+            "reports_per_laptop": args.reports_per_laptop,
+            "days": args.days,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "fleet": counts,
+        "setup": setup,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Ergebnisse geschrieben: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
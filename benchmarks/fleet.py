@@ -0,0 +1,123 @@
+# benchmarks/fleet.py
+"""Synthetische Flotte: Laptops mit Scan-Berichten, wie sie die Clients liefern."""
+import random
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.scan_classification import classify_scan_result
+
+CLIENT_VERSIONS = ("1.4.0", "1.5.2", "1.6.0", "2.0.0", "2.0.1", None)
+SCAN_TYPES = ("QuickScan", "QuickScan", "QuickScan", "FullScan")
+CLEAN_MESSAGES = (
+    "Scan erfolgreich abgeschlossen. Keine Bedrohungen gefunden.",
+    "Schnellüberprüfung abgeschlossen%nKeine Bedrohungen erkannt.",
+)
+ERROR_MESSAGES = (
+    "Event 1002: Microsoft Defender Antivirus scan has been stopped before completion.",
+    "FEHLER: Defender-Dienst nicht erreichbar (0x800106ba).",
+)
+THREATS = (
+    "Trojan:Win32/Wacatac.B!ml",
+    "PUA:Win32/Presenoker",
+    "HackTool:Win64/Mikatz!dha",
+    "Virus:DOS/EICAR_Test_File",
+)
+INSERT_CHUNK_SIZE = 5000
+
+
+def _scan_result(rng: random.Random) -> Dict:
+    """Überwiegend saubere Scans, einige Abbrüche (Event 1002) und Fehler, selten echte Funde."""
+    roll = rng.random()
+    if roll < 0.03:
+        threat = rng.choice(THREATS)
+        return {
+            "scan_result_message": f"Bedrohung gefunden:%n%t{threat}%nAktion: Quarantäne",
+            "threats_found": True,
+            "threat_details": f"{threat}%nPfad: C:\\Users\\user\\Downloads\\setup_{rng.randrange(1000)}.exe",
+        }
+    if roll < 0.10:
+        message = rng.choice(ERROR_MESSAGES)
+        # Alte Clients haben den Abbruch als Fund gemeldet
+        return {"scan_result_message": message, "threats_found": "Event 1002" in message and rng.random() < 0.5, "threat_details": None}
+    return {"scan_result_message": rng.choice(CLEAN_MESSAGES), "threats_found": False, "threat_details": None}
+
+
+def generate_fleet(db: Session, laptop_count: int, reports_per_laptop: int, days: int = 30, seed: int = 42, now: datetime = None) -> Dict[str, int]:
+    """
+    Schreibt laptop_count Laptops mit je reports_per_laptop Berichten, verteilt über die letzten
+    days Tage, in eine leere Datenbank. Gleicher seed -> gleiche Daten (bis auf den Bezugszeitpunkt now).
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    db.merge(models.FleetState(id=1, change_version=1))
+
+    laptop_rows: List[Dict] = []
+    report_rows: List[Dict] = []
+    report_count = 0
+    for laptop_id in range(1, laptop_count + 1):
+        # Etwa 60 % der Laptops haben sich in den letzten Minuten gemeldet (online)
+        if rng.random() < 0.6:
+            last_contact = now - timedelta(seconds=rng.uniform(0, 240))
+        else:
+            last_contact = now - timedelta(hours=rng.uniform(1, 24 * days))
+        scan_times = sorted(now - timedelta(days=rng.uniform(0, days)) for _ in range(reports_per_laptop))
+        last_report = None
+        for scan_time in scan_times:
+            result = _scan_result(rng)
+            classification = classify_scan_result(result["scan_result_message"], result["threats_found"])
+            last_report = {
+                "laptop_id": laptop_id,
+                "report_time_on_server": scan_time + timedelta(minutes=rng.uniform(1, 90)),
+                "client_scan_time": scan_time,
+                "scan_type": rng.choice(SCAN_TYPES),
+                **result,
+                "clean_result_message": classification.clean_message,
+                "is_error": classification.is_error,
+                "is_real_threat": classification.is_real_threat,
+                "scan_status": classification.status,
+            }
+            report_rows.append(last_report)
+
+        laptop = {
+            "id": laptop_id,
+            "hostname": f"PC-{laptop_id:06d}",
+            "alias_name": f"laptop-{laptop_id:06d}",
+            "first_seen": now - timedelta(days=days + rng.uniform(0, 365)),
+            "last_api_contact": last_contact,
+            "client_version": rng.choice(CLIENT_VERSIONS),
+            "change_version": 1,
+        }
+        if last_report is not None:
+            laptop.update({
+                "last_scan_time": last_report["client_scan_time"],
+                "last_scan_type": last_report["scan_type"],
+                "last_scan_result_message": last_report["scan_result_message"],
+                "last_scan_threats_found": last_report["threats_found"],
+                "last_scan_duration_minutes": int((last_report["report_time_on_server"] - last_report["client_scan_time"]).total_seconds() / 60),
+                "last_scan_clean_message": last_report["clean_result_message"],
+                "last_scan_is_error": last_report["is_error"],
+                "last_scan_is_real_threat": last_report["is_real_threat"],
+                "last_scan_status": last_report["scan_status"],
+            })
+        laptop_rows.append(laptop)
+
+        if len(report_rows) >= INSERT_CHUNK_SIZE:
+            report_count += _flush(db, laptop_rows, report_rows)
+            laptop_rows, report_rows = [], []
+    report_count += _flush(db, laptop_rows, report_rows)
+    db.commit()
+    return {"laptops": laptop_count, "reports": report_count}
+
+
+def _flush(db: Session, laptop_rows: List[Dict], report_rows: List[Dict]) -> int:
+    # Laptops zuerst (Fremdschlüssel), Spalten einheitlich halten für executemany
+    if laptop_rows:
+        columns = set().union(*laptop_rows)
+        db.execute(insert(models.Laptop.__table__), [{column: row.get(column) for column in columns} for row in laptop_rows])
+    if report_rows:
+        db.execute(insert(models.ScanReport.__table__), report_rows)
+    return len(report_rows)
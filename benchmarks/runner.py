@@ -0,0 +1,102 @@
+# benchmarks/runner.py
+"""Misst die heißen Pfade der Anwendung im Prozess über den TestClient (ohne Netzwerk und Login)."""
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.testclient import TestClient
+
+API_HEADERS = {"X-API-Key": None} # wird in run_benchmarks aus den Settings gesetzt
+
+
+@dataclass
+class Case:
+    """Ein Messfall: request() liefert die Antwort, cleanup() stellt den Ausgangszustand wieder her."""
+    name: str
+    request: Callable
+    expected_status: tuple = (200,)
+    cleanup: Optional[Callable] = None
+    timings: List[float] = field(default_factory=list)
+    response_bytes: int = 0
+
+    def run(self, repeat: int, warmup: int) -> Dict:
+        for iteration in range(warmup + repeat):
+            started = time.perf_counter()
+            response = self.request(iteration)
+            elapsed = time.perf_counter() - started
+            if response.status_code not in self.expected_status:
+                raise RuntimeError(f"{self.name}: Status {response.status_code} statt {self.expected_status}: {response.text[:200]}")
+            if iteration >= warmup:
+                self.timings.append(elapsed)
+                self.response_bytes = len(response.content)
+            if self.cleanup is not None:
+                self.cleanup()
+        return self.summary()
+
+    def summary(self) -> Dict:
+        timings_ms = sorted(t * 1000 for t in self.timings)
+        p95_index = min(len(timings_ms) - 1, int(round(0.95 * (len(timings_ms) - 1))))
+        return {
+            "runs": len(timings_ms),
+            "min_ms": round(timings_ms[0], 3),
+            "median_ms": round(statistics.median(timings_ms), 3),
+            "p95_ms": round(timings_ms[p95_index], 3),
+            "mean_ms": round(statistics.fmean(timings_ms), 3),
+            "max_ms": round(timings_ms[-1], 3),
+            "response_bytes": self.response_bytes,
+        }
+
+
+def build_cases(client: TestClient, laptop_count: int, days: int, now: datetime) -> List[Case]:
+    aliases = [f"laptop-{laptop_id:06d}" for laptop_id in range(1, laptop_count + 1)]
+
+    def alias(iteration: int) -> str:
+        # Über die Flotte verteilen, damit nicht immer dieselbe Zeile im Cache liegt
+        return aliases[(iteration * 7919) % len(aliases)]
+
+    def ingest_report(iteration: int):
+        return client.post("/api/v1/scanreports/", headers=API_HEADERS, json={
+            "laptop_identifier": alias(iteration),
+            "client_scan_time": (now + timedelta(seconds=iteration)).isoformat(),
+            "scan_type": "QuickScan",
+            "scan_result_message": "Scan erfolgreich abgeschlossen. Keine Bedrohungen gefunden.",
+            "threats_found": False,
+        })
+
+    def cancel_all():
+        response = client.post("/api/v1/clientcommands/cancel_command/all")
+        response.raise_for_status()
+
+    past_day = (now - timedelta(days=max(days // 2, 1))).date()
+    past_report = f"{past_day.isoformat()}T23:59"
+    return [
+        Case("client_poll", lambda i: client.get(f"/api/v1/clientcommands/{alias(i)}", headers=API_HEADERS)),
+        Case("report_ingest", ingest_report, expected_status=(201, 202)),
+        Case("trigger_scan_all", lambda i: client.post("/api/v1/clientcommands/trigger_scan/all", json={"scan_type": "QuickScan"}), expected_status=(202,), cleanup=cancel_all),
+        Case("dashboard_laptops", lambda i: client.get("/dashboard/laptops")),
+        Case("dashboard_updates", lambda i: client.get("/dashboard/updates")),
+        Case("daily_report_today", lambda i: client.get("/dashboard/daily_report")),
+        Case("daily_report_past", lambda i: client.get("/dashboard/daily_report", params={"report_date_str": past_report})),
+        Case("daily_report_csv", lambda i: client.get("/dashboard/daily_report/csv")),
+    ]
+
+
+def run_benchmarks(laptop_count: int, days: int, repeat: int, warmup: int, only: Optional[List[str]] = None) -> Dict[str, Dict]:
+    # Import erst hier: die Anwendung liest beim Import die Settings (DATABASE_URL der Benchmark-DB)
+    import main
+    from app.auth import get_current_user_or_none
+    from app.config import settings
+
+    API_HEADERS["X-API-Key"] = settings.server_api_key
+    main.app.dependency_overrides[get_current_user_or_none] = lambda: settings.app_username
+    results: Dict[str, Dict] = {}
+    with TestClient(main.app) as client:
+        for case in build_cases(client, laptop_count, days, datetime.now(timezone.utc)):
+            if only and case.name not in only:
+                continue
+            results[case.name] = case.run(repeat, warmup)
+            print(f"  {case.name:<20} median {results[case.name]['median_ms']:>10.2f} ms   p95 {results[case.name]['p95_ms']:>10.2f} ms")
+    main.app.dependency_overrides.pop(get_current_user_or_none, None)
+    return results
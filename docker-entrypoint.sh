@@ -2,9 +2,12 @@
 set -e
 
 echo "Starte Datenbank-Migrationen via Alembic..."
-# Wendet alle noch nicht ausgeführten Migrationen an
+# Wendet alle noch nicht ausgeführten Migrationen an (genau einmal, bevor die Worker starten)
 python -m alembic upgrade head
 
-echo "Starte Uvicorn Server..."
+# Anzahl Worker-Prozesse; die Anwendung liest denselben Wert (Settings.web_concurrency)
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+
+echo "Starte Uvicorn Server mit ${WEB_CONCURRENCY} Worker(n)..."
 # Startet FastAPI über Uvicorn
-exec uvicorn main:app --host 0.0.0.0 --port 8000
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "${WEB_CONCURRENCY}"
@@ -1,6 +1,6 @@
 # main.py
-from fastapi import FastAPI, Request, Form, status, APIRouter
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, status, APIRouter, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
@@ -8,15 +8,53 @@ from datetime import datetime, timezone
 from typing import Union, Optional # KORREKTUR: Union und Optional importieren
 
 from pathlib import Path
+from contextlib import asynccontextmanager
+import asyncio
 from app.config import settings
+from app.logging_setup import setup_logging
 from app.auth import verify_password
+from app.security import get_metrics_access
 from app.api.endpoints import laptops, reports, commands
 from app.web_routes import router as web_router
+from app.heartbeat import flush_loop as heartbeat_flush_loop, presence_loop, update_fleet_gauges
+from app.database import dispose_engines, log_engine_profile, QueryStatsMiddleware
+from app.ingest import report_ingest_queue
+from app.retention import retention_loop
+from app.snapshots import snapshot_loop
+from app.cluster import cluster_channel
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # --- App-Konfiguration ---
+setup_logging()
 PROJECT_ROOT_DIR = Path(__file__).resolve().parent
-app = FastAPI(title="ScanOp")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await log_engine_profile()
+    # Hintergrund-Tasks starten und beim Herunterfahren sauber beenden
+    background_tasks = [
+        asyncio.create_task(heartbeat_flush_loop()),
+        asyncio.create_task(presence_loop()),
+        asyncio.create_task(report_ingest_queue.writer_loop()),
+        asyncio.create_task(cluster_channel.run()),
+        # Nur im zuständigen Worker (bei mehreren Workern, siehe app/cluster.py)
+        asyncio.create_task(cluster_channel.run_as_leader(retention_loop)),
+        asyncio.create_task(cluster_channel.run_as_leader(snapshot_loop)),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await dispose_engines()
+
+app = FastAPI(title="ScanOp", lifespan=lifespan)
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size, gzip_level=settings.compression_gzip_level)
+app.add_middleware(QueryStatsMiddleware)
+if settings.metrics_enabled:
+    # Als äußerste Middleware, damit die gemessene Dauer auch die Komprimierung enthält
+    app.add_middleware(MetricsMiddleware)
 STATIC_FILES_DIR = PROJECT_ROOT_DIR / "static"
 TEMPLATES_DIR = PROJECT_ROOT_DIR / "templates"
 app.mount("/assets", StaticFiles(directory=STATIC_FILES_DIR), name="assets")
@@ -50,6 +88,14 @@ async def logout(request: Request):
     return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
 
 
+# --- Metriken (Prometheus-Textformat) ---
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(get_metrics_access)])
+    async def metrics():
+        await asyncio.to_thread(update_fleet_gauges) # DB-Abfragen im Threadpool
+        return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 # --- Einbinden der Router ---
 api_v1_router = APIRouter(prefix="/api/v1")
 api_v1_router.include_router(laptops.router)
@@ -876,6 +876,11 @@ document.addEventListener('DOMContentLoaded', () => {
     let pollingTimeoutId = null; 
 
     async function checkForUpdates() {
+        // Mit aktiven Live-Events kommen neue Reports bereits als Zeilen-Update an
+        if (liveEventsActive) {
+            scheduleNextCheck();
+            return;
+        }
         try {
             // KORREKTUR: Dies ist jetzt der endgültige, korrekte Pfad
             const response = await fetch('/api/v1/scanreports/last_update_timestamp');
@@ -913,100 +918,117 @@ document.addEventListener('DOMContentLoaded', () => {
         scheduleNextCheck();
     }
 
-    async function refreshTableSoft() {
-        try {
-            const response = await fetch(window.location.href);
-            const text = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(text, 'text/html');
-            
-            const newRows = doc.querySelectorAll('tbody tr');
-            const currentTbody = document.querySelector('tbody');
-            if (!currentTbody) return;
+    function mergeTableRows(newRows) {
+        const currentTbody = document.querySelector('tbody');
+        if (!currentTbody) return false;
+
+        newRows.forEach(newRow => {
+            const alias = newRow.id;
+            if (!alias) return;
+            const existingRow = document.getElementById(alias);
             
-            newRows.forEach(newRow => {
-                const alias = newRow.id;
-                if (!alias) return;
-                const existingRow = document.getElementById(alias);
+            if (existingRow) {
+                // Filter-relevante Zeilenattribute übernehmen
+                ['scanHours', 'threat', 'error'].forEach(key => {
+                    if (newRow.dataset[key] !== undefined) existingRow.dataset[key] = newRow.dataset[key];
+                });
+                const existingCells = Array.from(existingRow.querySelectorAll('td'));
+                const newCells = Array.from(newRow.querySelectorAll('td'));
                 
-                if (existingRow) {
-                    const existingCells = Array.from(existingRow.querySelectorAll('td'));
-                    const newCells = Array.from(newRow.querySelectorAll('td'));
-                    
-                    for (let i = 0; i < existingCells.length; i++) {
-                        // Skip checkbox cell to preserve checked state
-                        if (existingCells[i].querySelector('input[type="checkbox"]')) {
-                            const existingCb = existingCells[i].querySelector('input[type="checkbox"]');
-                            const newCb = newCells[i].querySelector('input[type="checkbox"]');
-                            if (existingCb && newCb && existingCb.dataset.version) {
-                                existingCb.dataset.version = newCb.dataset.version;
-                            }
-                            continue;
+                for (let i = 0; i < existingCells.length; i++) {
+                    // Skip checkbox cell to preserve checked state
+                    if (existingCells[i].querySelector('input[type="checkbox"]')) {
+                        const existingCb = existingCells[i].querySelector('input[type="checkbox"]');
+                        const newCb = newCells[i].querySelector('input[type="checkbox"]');
+                        if (existingCb && newCb && existingCb.dataset.version) {
+                            existingCb.dataset.version = newCb.dataset.version;
                         }
+                        continue;
+                    }
+                    
+                    // Update innerHTML if changed
+                    if (existingCells[i].innerHTML !== newCells[i].innerHTML) {
+                        const wasShimmering = existingCells[i].classList.contains('shimmer-cell');
+                        const isShimmeringNow = newCells[i].classList.contains('shimmer-cell');
                         
-                        // Update innerHTML if changed
-                        if (existingCells[i].innerHTML !== newCells[i].innerHTML) {
-                            const wasShimmering = existingCells[i].classList.contains('shimmer-cell');
-                            const isShimmeringNow = newCells[i].classList.contains('shimmer-cell');
-                            
-                            const oldPulsingBtn = existingCells[i].querySelector('.btn-pulsing');
-                            
-                            existingCells[i].innerHTML = newCells[i].innerHTML;
-                            
-                            if (oldPulsingBtn) {
-                                const newBtn = existingCells[i].querySelector('.update-client-btn') || existingCells[i].querySelector('.scan-button');
-                                if (newBtn) {
-                                    const pendingCellText = newRow.querySelector('.pending-command-cell')?.textContent.trim();
-                                    const isRowPendingNow = newRow.querySelector('.shimmer-cell') !== null || (pendingCellText && pendingCellText !== 'Kein' && pendingCellText !== 'N/A' && pendingCellText !== '');
-                                    
-                                    if (isRowPendingNow) {
-                                        newBtn.classList.add('btn-pulsing');
-                                        newBtn.style.display = ''; // force visible
-                                    } else {
-                                        newBtn.classList.add('btn-pop-out');
-                                        newBtn.style.display = ''; 
-                                    }
-                                }
-                            }
-                            
-                            // Success animation if shimmer was removed
-                            if (wasShimmering && !isShimmeringNow) {
-                                const vText = existingCells[i].querySelector('.version-text');
-                                if (vText) {
-                                    vText.classList.add('update-success');
-                                    setTimeout(() => vText.classList.remove('update-success'), 3000);
+                        const oldPulsingBtn = existingCells[i].querySelector('.btn-pulsing');
+                        
+                        existingCells[i].innerHTML = newCells[i].innerHTML;
+                        
+                        if (oldPulsingBtn) {
+                            const newBtn = existingCells[i].querySelector('.update-client-btn') || existingCells[i].querySelector('.scan-button');
+                            if (newBtn) {
+                                const pendingCellText = newRow.querySelector('.pending-command-cell')?.textContent.trim();
+                                const isRowPendingNow = newRow.querySelector('.shimmer-cell') !== null || (pendingCellText && pendingCellText !== 'Kein' && pendingCellText !== 'N/A' && pendingCellText !== '');
+                                
+                                if (isRowPendingNow) {
+                                    newBtn.classList.add('btn-pulsing');
+                                    newBtn.style.display = ''; // force visible
+                                } else {
+                                    newBtn.classList.add('btn-pop-out');
+                                    newBtn.style.display = ''; 
                                 }
                             }
-                            
-                            // Reattach listeners if needed
-                            existingCells[i].querySelectorAll('.cancel-command-button').forEach(attachCancelListener);
-                            existingCells[i].querySelectorAll('.delete-laptop-button').forEach(btn => attachDeleteListener(btn));
-                            existingCells[i].querySelectorAll('.update-client-btn').forEach(btn => attachUpdateClientListener(btn));
                         }
-                        // Update attributes
-                        if (newCells[i].hasAttribute('data-utc-time')) {
-                            existingCells[i].setAttribute('data-utc-time', newCells[i].getAttribute('data-utc-time'));
-                        } else {
-                            existingCells[i].removeAttribute('data-utc-time');
-                        }
-                        if (newCells[i].hasAttribute('data-value')) {
-                            existingCells[i].setAttribute('data-value', newCells[i].getAttribute('data-value'));
-                        } else {
-                            existingCells[i].removeAttribute('data-value');
+                        
+                        // Success animation if shimmer was removed
+                        if (wasShimmering && !isShimmeringNow) {
+                            const vText = existingCells[i].querySelector('.version-text');
+                            if (vText) {
+                                vText.classList.add('update-success');
+                                setTimeout(() => vText.classList.remove('update-success'), 3000);
+                            }
                         }
+                        
+                        // Reattach listeners if needed
+                        existingCells[i].querySelectorAll('.cancel-command-button').forEach(attachCancelListener);
+                        existingCells[i].querySelectorAll('.delete-laptop-button').forEach(btn => attachDeleteListener(btn));
+                        existingCells[i].querySelectorAll('.update-client-btn').forEach(btn => attachUpdateClientListener(btn));
+                    }
+                    // Update attributes
+                    if (newCells[i].hasAttribute('data-utc-time')) {
+                        existingCells[i].setAttribute('data-utc-time', newCells[i].getAttribute('data-utc-time'));
+                    } else {
+                        existingCells[i].removeAttribute('data-utc-time');
+                    }
+                    if (newCells[i].hasAttribute('data-value')) {
+                        existingCells[i].setAttribute('data-value', newCells[i].getAttribute('data-value'));
+                    } else {
+                        existingCells[i].removeAttribute('data-value');
+                    }
 
-                        // Update classes
-                        if (existingCells[i].className !== newCells[i].className) {
-                            existingCells[i].className = newCells[i].className;
-                        }
+                    // Update classes
+                    if (existingCells[i].className !== newCells[i].className) {
+                        existingCells[i].className = newCells[i].className;
                     }
-                } else {
-                    currentTbody.appendChild(newRow);
-                    // Attach listeners to new row
-                    newRow.querySelectorAll('.cancel-command-button').forEach(attachCancelListener);
-                    newRow.querySelectorAll('.update-client-btn').forEach(attachUpdateClientListener);
                 }
-            });
+            } else {
+                currentTbody.appendChild(newRow);
+                // Attach listeners to new row
+                newRow.querySelectorAll('.cancel-command-button').forEach(attachCancelListener);
+                newRow.querySelectorAll('.update-client-btn').forEach(attachUpdateClientListener);
+            }
+        });
+        
+        return true;
+    }
+
+    function afterTableRowsChanged() {
+        convertTableDateTimes();
+        updateButtonVisibilityBasedOnVersion();
+        if (typeof applyFilters === 'function') applyFilters();
+    }
+
+    async function refreshTableSoft() {
+        try {
+            const response = await fetch(window.location.href);
+            const text = await response.text();
+            const parser = new DOMParser();
+            const doc = parser.parseFromString(text, 'text/html');
+            
+            if (!mergeTableRows(doc.querySelectorAll('tbody tr'))) return;
+            const newCursor = doc.querySelector('tbody')?.dataset.changeCursor;
+            if (newCursor) changeCursor = newCursor;
             
             // Remove deleted rows
             const existingRows = document.querySelectorAll('tbody tr');
@@ -1016,9 +1038,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             });
             
-            convertTableDateTimes();
-            updateButtonVisibilityBasedOnVersion();
-            if (typeof applyFilters === 'function') applyFilters();
+            afterTableRowsChanged();
         } catch(e) {
             console.error("Soft refresh failed", e);
             window.location.reload(); // fallback
@@ -1033,8 +1053,114 @@ document.addEventListener('DOMContentLoaded', () => {
         pollingTimeoutId = setTimeout(checkForUpdates, POLLING_INTERVAL);
     }
 
-    // Replaced specific setInterval with the global smooth refresh
-    if (document.getElementById('updates-table') || document.querySelector('table')) {
+    // Nur die geänderten Zeilen neu laden (Live-Updates per Server-Sent Events)
+    async function refreshTableRows(laptopIds) {
+        try {
+            const response = await fetch(`${window.location.pathname}/rows?ids=${laptopIds.join(',')}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const doc = new DOMParser().parseFromString(await response.text(), 'text/html');
+            const newRows = doc.querySelectorAll('tbody tr');
+            if (!mergeTableRows(newRows)) return;
+
+            // Angefragte, aber nicht mehr gelieferte Laptops wurden gelöscht
+            const returnedIds = new Set(Array.from(newRows).map(row => row.dataset.laptopId));
+            laptopIds.forEach(id => {
+                if (!returnedIds.has(String(id))) {
+                    document.querySelectorAll(`tbody tr[data-laptop-id="${id}"]`).forEach(row => row.remove());
+                }
+            });
+            afterTableRowsChanged();
+        } catch (e) {
+            console.error('Row refresh failed', e);
+            refreshTableSoft();
+        }
+    }
+
+    // Nur die seit dem letzten Abruf geänderten Laptops holen (304, wenn sich nichts geändert hat)
+    let changeCursor = document.querySelector('tbody')?.dataset.changeCursor || null;
+
+    async function refreshTableDelta() {
+        if (!changeCursor) {
+            refreshTableSoft();
+            return;
+        }
+        try {
+            const response = await fetch(`${window.location.pathname}/delta?since=${encodeURIComponent(changeCursor)}`, {
+                headers: { 'If-None-Match': `"${changeCursor}"` }
+            });
+            if (response.status === 304) return;
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            changeCursor = data.cursor;
+            if (data.laptops.length) {
+                const rowsHtml = data.laptops.map(laptop => laptop.html).join('');
+                const doc = new DOMParser().parseFromString(`<table><tbody>${rowsHtml}</tbody></table>`, 'text/html');
+                mergeTableRows(doc.querySelectorAll('tbody tr'));
+                afterTableRowsChanged();
+            }
+            // Gelöschte Laptops tauchen im Delta nicht auf -> bei abweichender Anzahl komplett neu laden
+            if (document.querySelectorAll('tbody tr').length !== data.total) refreshTableSoft();
+        } catch (e) {
+            console.error('Delta refresh failed', e);
+        }
+    }
+
+    const LIVE_UPDATE_PAGES = ['/dashboard/laptops', '/dashboard/updates'];
+    const LIVE_RESYNC_INTERVAL = 300000; // Zeitabhängige Werte ("OK (5h)", "Offline (12m)") gelegentlich auffrischen
+    let liveEventsActive = false;
+
+    function connectLiveEvents() {
+        const source = new EventSource('/dashboard/events');
+        let pendingIds = new Set();
+        let pendingFullRefresh = false;
+        let flushTimer = null;
+        let hadError = false;
+
+        function queueRefresh(data) {
+            if (data.all) {
+                pendingFullRefresh = true;
+            } else {
+                (data.laptop_ids || []).forEach(id => pendingIds.add(id));
+            }
+            if (flushTimer) return;
+            flushTimer = setTimeout(() => {
+                const ids = Array.from(pendingIds);
+                const full = pendingFullRefresh;
+                pendingIds = new Set();
+                pendingFullRefresh = false;
+                flushTimer = null;
+                if (full) {
+                    refreshTableSoft();
+                } else if (ids.length) {
+                    refreshTableRows(ids);
+                }
+            }, 300);
+        }
+
+        ['report', 'command', 'presence', 'laptop'].forEach(type => {
+            source.addEventListener(type, event => queueRefresh(JSON.parse(event.data)));
+        });
+        source.addEventListener('resync', () => queueRefresh({ all: true }));
+        source.onopen = () => {
+            liveEventsActive = true;
+            // Nach einem Verbindungsabbruch könnten Events verpasst worden sein
+            if (hadError) queueRefresh({ all: true });
+            hadError = false;
+        };
+        source.onerror = () => {
+            liveEventsActive = false;
+            hadError = true;
+        };
+    }
+
+    const isLiveUpdatePage = LIVE_UPDATE_PAGES.includes(window.location.pathname) && document.querySelector('tbody');
+    if (isLiveUpdatePage) {
+        if (window.EventSource) connectLiveEvents();
+        setInterval(refreshTableSoft, LIVE_RESYNC_INTERVAL);
+        // Fallback ohne Live-Events: kleines Delta statt der ganzen Seite
+        setInterval(() => { if (!liveEventsActive) refreshTableDelta(); }, 5000);
+    } else if (document.getElementById('updates-table') || document.querySelector('table')) {
+        // Replaced specific setInterval with the global smooth refresh
         setInterval(refreshTableSoft, 5000);
     }
 
@@ -0,0 +1,123 @@
+# tests/test_query_budgets.py
+"""
+Abfrage-Budgets der heißen Pfade (app.database.assert_max_queries) auf einer synthetischen Flotte
+(benchmarks.fleet.generate_fleet) in einer temporären SQLite-Datei:
+
+    python -m pytest tests
+
+Die Budgets gelten unabhängig von der Flottengröße – steigt die Zahl der Abfragen mit der Anzahl
+Laptops, ist eine N+1-Abfrage entstanden.
+"""
+import os
+import tempfile
+from datetime import datetime, timezone, timedelta
+
+# Die Anwendung liest die Settings beim Import -> Umgebung vor dem ersten Import von app/main setzen
+_tmp_dir = tempfile.TemporaryDirectory(prefix="scanop-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'scanop.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("APP_USERNAME", "test")
+os.environ.setdefault("APP_PASSWORD", "test")
+os.environ.setdefault("SERVER_API_KEY", "test")
+os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+os.environ.setdefault("DB_REPEATED_QUERY_THRESHOLD", "0")
+# Client-Polls nicht während eines Tests in die DB schreiben (gebündelter Heartbeat-Flush)
+os.environ["HEARTBEAT_FLUSH_INTERVAL_SECONDS"] = "3600"
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app import heartbeat, models, snapshots
+from app.auth import get_current_user_or_none
+from app.config import settings
+from app.database import SessionLocal, engine, assert_max_queries, track_queries
+from app.fragment_cache import fragment_cache
+from app.response_cache import dashboard_cache
+from benchmarks.fleet import generate_fleet
+
+LAPTOP_COUNT = 200
+REPORTS_PER_LAPTOP = 5
+
+
+@pytest.fixture(scope="module")
+def client():
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        generate_fleet(db, LAPTOP_COUNT, REPORTS_PER_LAPTOP, days=30)
+    finally:
+        db.close()
+    snapshots.build_missing_snapshots()
+    presence_interval = heartbeat.PRESENCE_CHECK_INTERVAL_SECONDS
+    heartbeat.PRESENCE_CHECK_INTERVAL_SECONDS = 3600
+    main.app.dependency_overrides[get_current_user_or_none] = lambda: settings.app_username
+    with TestClient(main.app) as test_client:
+        _wait_until_idle()
+        yield test_client
+    main.app.dependency_overrides.pop(get_current_user_or_none, None)
+    heartbeat.PRESENCE_CHECK_INTERVAL_SECONDS = presence_interval
+    engine.dispose()
+    _tmp_dir.cleanup()
+
+
+def _wait_until_idle(timeout: float = 10.0) -> None:
+    """Wartet, bis die Hintergrund-Tasks nach dem Start (Snapshots, Online-Status) keine Abfragen mehr ausführen."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with track_queries() as stats:
+            time.sleep(0.2)
+        if stats.count == 0:
+            return
+    raise RuntimeError("Hintergrund-Tasks kommen nicht zur Ruhe")
+
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    # Budgets gelten für den ungecachten Pfad
+    dashboard_cache.clear()
+    fragment_cache.clear()
+
+
+def api_headers():
+    return {"X-API-Key": settings.server_api_key}
+
+
+def test_dashboard_laptops(client):
+    with assert_max_queries(2):
+        response = client.get("/dashboard/laptops")
+    assert response.status_code == 200
+
+
+def test_daily_report_today(client):
+    with assert_max_queries(3):
+        response = client.get("/dashboard/daily_report")
+    assert response.status_code == 200
+
+
+def test_daily_report_past(client):
+    past_day = (datetime.now(timezone.utc) - timedelta(days=10)).date()
+    with assert_max_queries(3):
+        response = client.get("/dashboard/daily_report", params={"report_date_str": f"{past_day.isoformat()}T23:59"})
+    assert response.status_code == 200
+
+
+def test_client_poll(client):
+    with assert_max_queries(1):
+        response = client.get("/api/v1/clientcommands/laptop-000007", headers=api_headers())
+    assert response.status_code == 200
+
+
+def test_report_ingest(client):
+    with assert_max_queries(6):
+        response = client.post("/api/v1/scanreports/", headers=api_headers(), json={
+            "laptop_identifier": "laptop-000011",
+            "client_scan_time": datetime.now(timezone.utc).isoformat(),
+            "scan_type": "QuickScan",
+            "scan_result_message": "Scan erfolgreich abgeschlossen. Keine Bedrohungen gefunden.",
+            "threats_found": False,
+        })
+    assert response.status_code in (201, 202)